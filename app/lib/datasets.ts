@@ -4,24 +4,44 @@ export interface DatasetEntry {
   id: string;
   label: string;
   file: string;
+  /** v1.3：同題庫的欄位導向壓縮檔（questions_<id>.pack.json），有則優先載入 */
+  packed?: string;
 }
 
+/** 匯入腳本 pack_questions 產出的欄位導向格式；字典編碼欄位為 { s: 字串表索引[] }。 */
+interface PackedQuestions {
+  format: "mlh-questions-pack";
+  version: number;
+  count: number;
+  shapes: string[][];
+  shape?: number[];
+  strings: string[];
+  columns: Record<string, unknown[] | { s: number[] }>;
+}
+
+const PACK_FORMAT = "mlh-questions-pack";
+const PACK_VERSION = 1;
+
 export interface IndexData {
   datasets: DatasetEntry[];
   default_dataset: string;
+  /** v1.3：匯入時預先合併的「全部題庫」（已依 id 去重、每題帶 dedupe_key / stratum） */
+  bundle?: { file: string; count: number; datasets: string[] };
 }
 
 export interface DataMeta {
   data_version: string;
   generated_at?: string;
+  /** 版本目錄（相對 /data/，如 v/2026-01-01-1200）：匯入時整批寫好才換 meta.json，從這裡讀不會混到兩版；舊資料無此欄時讀 /data/ 平面檔 */
+  dir?: string;
 }
 
-const INDEX_URL = "/data/index.json";
 const META_URL = "/data/meta.json";
 let cachedIndex: IndexData | null = null;
 let cachedDataVersion: string | null = null;
+let cachedDataBase = "/data/";
 
-/** 取得資料版本號，供 ?v= 原子更新用；若 meta.json 不存在則回傳 "0"。 */
+/** 取得資料版本號，供 ?v= 原子更新用；若 meta.json 不存在則回傳 "0"。同時記下版本目錄供 index / 題庫檔使用。 */
 export async function fetchMeta(): Promise<string> {
   if (cachedDataVersion !== null) return cachedDataVersion;
   try {
@@ -32,6 +52,7 @@ export async function fetchMeta(): Promise<string> {
     }
     const data = (await res.json()) as DataMeta | null;
     cachedDataVersion = data?.data_version ?? "0";
+    cachedDataBase = data?.dir ? `/data/${data.dir}/` : "/data/";
     return cachedDataVersion;
   } catch {
     cachedDataVersion = "0";
@@ -52,7 +73,7 @@ export function getDataVersionSync(): string | null {
 export async function fetchIndex(): Promise<IndexData> {
   if (cachedIndex) return cachedIndex;
   const v = await fetchMeta();
-  const res = await fetch(INDEX_URL + "?v=" + encodeURIComponent(v), { cache: "no-store" });
+  const res = await fetch(`${cachedDataBase}index.json?v=${encodeURIComponent(v)}`, { cache: "no-store" });
   if (!res.ok) {
     throw new Error(
       `題庫索引載入失敗：index.json (HTTP ${res.status})。請按「資料更新」清快取；若仍失敗代表部署缺檔。`
@@ -66,15 +87,35 @@ export async function fetchIndex(): Promise<IndexData> {
   return cachedIndex;
 }
 
+/** 解開壓縮題庫，結果與 questions_<id>.json 相同（鍵順序亦同）。 */
+export function unpackQuestions(packed: PackedQuestions, file = "pack"): Question[] {
+  if (packed.version !== PACK_VERSION) throw new Error(`題庫格式版本不支援: ${file} (v${packed.version})`);
+  const { count, shapes, strings } = packed;
+  const columns: Record<string, unknown[]> = {};
+  for (const [key, col] of Object.entries(packed.columns)) {
+    columns[key] = Array.isArray(col) ? col : col.s.map((i) => strings[i]);
+  }
+  const out: Question[] = new Array(count);
+  for (let i = 0; i < count; i++) {
+    const q: Record<string, unknown> = {};
+    for (const key of shapes[packed.shape ? packed.shape[i] : 0]) q[key] = columns[key][i];
+    out[i] = q as unknown as Question;
+  }
+  return out;
+}
+
 export async function fetchDatasetFile(file: string): Promise<Question[]> {
   const v = await fetchMeta();
-  const res = await fetch(`/data/${file}?v=${encodeURIComponent(v)}`, { cache: "no-store" });
+  const res = await fetch(`${cachedDataBase}${file}?v=${encodeURIComponent(v)}`, { cache: "no-store" });
   if (!res.ok) {
     throw new Error(
       `題庫載入失敗：${file} (HTTP ${res.status})。請按「資料更新」清快取；若仍失敗代表部署缺檔。`
     );
   }
   const data = (await res.json()) as unknown;
+  if (data && typeof data === "object" && (data as PackedQuestions).format === PACK_FORMAT) {
+    return unpackQuestions(data as PackedQuestions, file);
+  }
   if (!Array.isArray(data)) throw new Error(`題庫格式錯誤: ${file}`);
   return data as Question[];
 }
@@ -82,10 +123,12 @@ export async function fetchDatasetFile(file: string): Promise<Question[]> {
 export async function fetchAllQuestions(datasetId: string): Promise<Question[]> {
   const index = await fetchIndex();
   if (datasetId === "ALL" || !datasetId) {
+    // 有預先合併檔時只需一個請求；內容與下方逐檔合併結果相同
+    if (index.bundle) return fetchDatasetFile(index.bundle.file);
     const all: Question[] = [];
     const seen = new Set<string>();
     for (const ds of index.datasets) {
-      const list = await fetchDatasetFile(ds.file);
+      const list = await fetchDatasetFile(ds.packed ?? ds.file);
       for (const q of list) {
         if (q.type !== "single") continue;
         if (seen.has(q.id)) continue;
@@ -97,5 +140,5 @@ export async function fetchAllQuestions(datasetId: string): Promise<Question[]>
   }
   const entry = index.datasets.find((d) => d.id === datasetId);
   if (!entry) throw new Error(`未知題庫: ${datasetId}`);
-  return fetchDatasetFile(entry.file);
+  return fetchDatasetFile(entry.packed ?? entry.file);
 }
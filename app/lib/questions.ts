@@ -43,8 +43,10 @@ function normalizeText(s: string): string {
     .trim();
 }
 
-/** 每題唯一鍵：同一題幹+選項視為同一題，避免 20 題內重複 */
+/** 每題唯一鍵：同一題幹+選項視為同一題，避免 20 題內重複。
+ *  全部題庫合併檔已預先算好 dedupe_key（scripts/import_pdfs_to_datasets.py 的 dedupe_key，算法須與此相同）。 */
 export function getDedupeKey(q: Question): string {
+  if (q.dedupe_key) return q.dedupe_key;
   const text = normalizeText(q.question_text);
   const opts = (q.options || []).map((o) => normalizeText(o)).join("|");
   const raw = text + "|" + opts;
@@ -55,6 +57,7 @@ export function getDedupeKey(q: Question): string {
 
 /** 題目所屬科目/題庫鍵（用於分層抽樣與易錯統計） */
 export function getStratumKey(q: Question): string {
+  if (q.stratum) return q.stratum;
   const id = q.id || "";
   const idx = id.lastIndexOf("_");
   return idx >= 0 ? id.slice(0, idx) : id;
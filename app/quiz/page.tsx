@@ -138,25 +138,31 @@ function QuizContent() {
               .filter((a) => a.type === "image" && a.src)
               .map((a, idx) => {
                 const v = getDataVersionSync();
-                const src = a.src + (v ? (a.src.includes("?") ? "&" : "?") + "v=" + encodeURIComponent(v) : "");
+                const withV = (u: string) => u + (v ? (u.includes("?") ? "&" : "?") + "v=" + encodeURIComponent(v) : "");
+                const src = withV(a.src);
                 return (
                   <div key={idx}>
-                    <img
-                      src={src}
-                      alt={a.alt || "題目圖"}
-                      className="max-w-full h-auto rounded-lg border border-gray-200"
-                      onError={(e) => {
-                        const path = (e.target as HTMLImageElement)?.src ?? a.src;
-                        try {
-                          const key = "debug_missing_images";
-                          const arr = JSON.parse(localStorage.getItem(key) ?? "[]");
-                          arr.push({ path: a.src, qId: currentQ?.id, t: Date.now() });
-                          localStorage.setItem(key, JSON.stringify(arr.slice(-50)));
-                        } catch { /* ignore */ }
-                        (e.target as HTMLImageElement).style.display = "none";
-                        (e.target as HTMLImageElement).nextElementSibling?.classList.remove("hidden");
-                      }}
-                    />
+                    <picture>
+                      {a.webp && <source srcSet={withV(a.webp)} type="image/webp" />}
+                      <img
+                        src={src}
+                        alt={a.alt || "題目圖"}
+                        className="max-w-full h-auto rounded-lg border border-gray-200"
+                        onError={(e) => {
+                          const path = (e.target as HTMLImageElement)?.src ?? a.src;
+                          try {
+                            const key = "debug_missing_images";
+                            const arr = JSON.parse(localStorage.getItem(key) ?? "[]");
+                            arr.push({ path: a.src, qId: currentQ?.id, t: Date.now() });
+                            localStorage.setItem(key, JSON.stringify(arr.slice(-50)));
+                          } catch { /* ignore */ }
+                          // img 包在 <picture> 內，隱藏整個 picture 並顯示其後的缺圖提示
+                          const pic = (e.target as HTMLImageElement).parentElement as HTMLElement;
+                          pic.style.display = "none";
+                          pic.nextElementSibling?.classList.remove("hidden");
+                        }}
+                      />
+                    </picture>
                     <span className="hidden text-sm text-amber-600">本題圖檔缺失：{a.src}</span>
                   </div>
                 );
@@ -104,22 +104,25 @@ function ResultContent() {
                       .filter((a) => a.type === "image" && a.src)
                       .map((a, idx) => {
                         const v = getDataVersionSync();
-                        const src = a.src + (v ? (a.src.includes("?") ? "&" : "?") + "v=" + encodeURIComponent(v) : "");
+                        const withV = (u: string) => u + (v ? (u.includes("?") ? "&" : "?") + "v=" + encodeURIComponent(v) : "");
+                        const src = withV(a.src);
                         return (
-                          <img
-                            key={idx}
-                            src={src}
-                            alt={a.alt || "題目圖"}
-                            className="max-w-full h-auto rounded border border-gray-200"
-                            onError={(e) => {
-                              try {
-                                const key = "debug_missing_images";
-                                const arr = JSON.parse(localStorage.getItem(key) ?? "[]");
-                                arr.push({ path: a.src, qId: q.id, t: Date.now() });
-                                localStorage.setItem(key, JSON.stringify(arr.slice(-50)));
-                              } catch { /* ignore */ }
-                            }}
-                          />
+                          <picture key={idx}>
+                            {a.webp && <source srcSet={withV(a.webp)} type="image/webp" />}
+                            <img
+                              src={src}
+                              alt={a.alt || "題目圖"}
+                              className="max-w-full h-auto rounded border border-gray-200"
+                              onError={(e) => {
+                                try {
+                                  const key = "debug_missing_images";
+                                  const arr = JSON.parse(localStorage.getItem(key) ?? "[]");
+                                  arr.push({ path: a.src, qId: q.id, t: Date.now() });
+                                  localStorage.setItem(key, JSON.stringify(arr.slice(-50)));
+                                } catch { /* ignore */ }
+                              }}
+                            />
+                          </picture>
                         );
                       })}
                   </div>
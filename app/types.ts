@@ -4,6 +4,8 @@ export interface QuestionAsset {
   type: string;
   src: string;
   alt?: string;
+  /** v1.3：同圖的 WebP 版（匯入加 --webp 時產出），前端以 <picture> 優先載入 */
+  webp?: string;
 }
 
 export interface Question {
@@ -21,6 +23,9 @@ export interface Question {
   source_display?: string;
   /** v1.2.1：圖題裁切圖，若有則顯示在題幹區 */
   assets?: QuestionAsset[];
+  /** v1.3：全部題庫合併檔預先算好的去重鍵 / 分層鍵（同 getDedupeKey / getStratumKey） */
+  dedupe_key?: string;
+  stratum?: string;
 }
 
 export interface QuizState {
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比較題塊切分新舊實作：_split_blocks_single_pass（單次掃描）vs _split_blocks_with_fallback_legacy（A/B/C/D 各跑一次 + 長塊重跑 D）。
+對 raw_pdfs（或 raw_pdfs:）內每份 PDF 的全文、去頁首全文與各頁文字計時並比對 (blocks, pattern_counts, spans)，
+結果寫入 scripts/bench_block_splitter.json。
+
+執行：
+  python3 scripts/bench_block_splitter.py [--input-dir "raw_pdfs:"] [--pdf 綜合A.pdf] [--repeat 5]
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from import_pdfs_to_datasets import (
+    PdfSession,
+    _split_blocks_single_pass,
+    _split_blocks_with_fallback_legacy,
+    _strip_header_footer,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+OUT_PATH = ROOT / "scripts" / "bench_block_splitter.json"
+
+
+def get_pdf_dir(input_dir=None):
+    if input_dir:
+        d = ROOT / input_dir
+        return d if d.is_dir() else None
+    for name in ("raw_pdfs", "raw_pdfs:"):
+        d = ROOT / name
+        if d.is_dir():
+            return d
+    return None
+
+
+def texts_for_pdf(pdf_path):
+    """匯入時實際會切分的文字：全文、去頁首全文、各頁去頁首文字。"""
+    with PdfSession(pdf_path) as session:
+        pages_text = session.pages_text()
+    full_text = "\n".join(t for _, t in pages_text)
+    texts = [full_text, _strip_header_footer(full_text)]
+    texts.extend(_strip_header_footer(t) for _, t in pages_text)
+    return [t for t in texts if t]
+
+
+def _time(fn, texts, repeat):
+    best = None
+    results = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        results = [fn(t) for t in texts]
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def bench_one(pdf_path, repeat):
+    texts = texts_for_pdf(pdf_path)
+    legacy_s, old = _time(_split_blocks_with_fallback_legacy, texts, repeat)
+    single_s, new = _time(_split_blocks_single_pass, texts, repeat)
+    diffs = [i for i, (a, b) in enumerate(zip(old, new)) if a != b]
+    return {
+        "file": pdf_path.name,
+        "texts": len(texts),
+        "chars": sum(len(t) for t in texts),
+        "blocks": len(new[0][0]) if new else 0,
+        "legacy_seconds": round(legacy_s, 4),
+        "single_pass_seconds": round(single_s, 4),
+        "speedup": round(legacy_s / single_s, 2) if single_s > 0 else None,
+        "identical": not diffs,
+        "diff_text_indexes": diffs[:20],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="題塊切分 benchmark：單次掃描 vs 舊版多 regex")
+    parser.add_argument("--input-dir", default=None, help="PDF 目錄（相對專案根，預設 raw_pdfs 或 raw_pdfs:）")
+    parser.add_argument("--pdf", default=None, help="只測指定檔名的單一 PDF")
+    parser.add_argument("--repeat", type=int, default=5, help="每種實作重跑次數，取最快一次（預設 5）")
+    args = parser.parse_args()
+
+    pdf_dir = get_pdf_dir(args.input_dir)
+    if not pdf_dir:
+        print("找不到 PDF 目錄（raw_pdfs 或 raw_pdfs:）", file=sys.stderr)
+        return 1
+    pdf_files = sorted(pdf_dir.glob("*.pdf"))
+    if args.pdf:
+        pdf_files = [p for p in pdf_files if p.name == args.pdf]
+    if not pdf_files:
+        print("在 {} 下沒有找到 .pdf 檔案".format(pdf_dir), file=sys.stderr)
+        return 1
+
+    items = []
+    for pdf_path in pdf_files:
+        item = bench_one(pdf_path, max(1, args.repeat))
+        items.append(item)
+        print("  {}: legacy {:.4f}s / single-pass {:.4f}s (x{}) {}".format(
+            item["file"], item["legacy_seconds"], item["single_pass_seconds"], item["speedup"],
+            "OK" if item["identical"] else "DIFF({})".format(len(item["diff_text_indexes"])),
+        ), flush=True)
+
+    legacy_total = sum(i["legacy_seconds"] for i in items)
+    single_total = sum(i["single_pass_seconds"] for i in items)
+    result = {
+        "generatedAt": datetime.now().isoformat(),
+        "count": len(items),
+        "legacy_seconds_total": round(legacy_total, 4),
+        "single_pass_seconds_total": round(single_total, 4),
+        "speedup": round(legacy_total / single_total, 2) if single_total > 0 else None,
+        "all_identical": all(i["identical"] for i in items),
+        "items": items,
+    }
+    OUT_PATH.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print("Wrote:", str(OUT_PATH))
+    return 0 if result["all_identical"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比較圖題裁切：批次模式（同頁整頁渲染一次再切出各題）vs 逐題 clip 渲染。
+對指定 PDF（預設 a / b 題庫；找不到則全部）各跑一次 process_pdf，計時並逐張比對 PNG 像素，結果寫入 scripts/bench_crop_render.json。
+輸出寫到暫存目錄，不動 public/ 與 scripts/parser_debug。
+
+執行：
+  python3 scripts/bench_crop_render.py [--input-dir "raw_pdfs:"] [--pdf a.pdf --pdf b.pdf]
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import import_pdfs_to_datasets as importer
+
+ROOT = Path(__file__).resolve().parent.parent
+OUT_PATH = ROOT / "scripts" / "bench_crop_render.json"
+DEFAULT_SLUGS = ("a", "b")
+
+
+def get_pdf_dir(input_dir=None):
+    if input_dir:
+        d = ROOT / input_dir
+        return d if d.is_dir() else None
+    for name in ("raw_pdfs", "raw_pdfs:"):
+        d = ROOT / name
+        if d.is_dir():
+            return d
+    return None
+
+
+def run_once(pdf_path, work_root, batch_render):
+    """在 work_root 下跑一次 process_pdf，回傳 (秒數, report entry, 圖檔目錄)。"""
+    importer.ROOT = work_root
+    assets_root = work_root / "public" / "assets"
+    report = []
+    t0 = time.perf_counter()
+    slug, _ = importer.process_pdf(None, None, pdf_path, report, assets_root=str(assets_root), batch_render=batch_render)
+    elapsed = time.perf_counter() - t0
+    return elapsed, report[0], assets_root / "q" / slug
+
+
+def compare_pngs(dir_a, dir_b):
+    """逐張比對兩目錄下同名 PNG 的尺寸與像素，回傳 (比對張數, 不同檔名清單)。"""
+    fitz = importer.fitz
+    names = sorted(set(p.name for p in dir_a.glob("*.png")) | set(p.name for p in dir_b.glob("*.png")))
+    different = []
+    for name in names:
+        pa, pb = dir_a / name, dir_b / name
+        if not pa.exists() or not pb.exists():
+            different.append(name)
+            continue
+        a, b = fitz.Pixmap(str(pa)), fitz.Pixmap(str(pb))
+        if (a.width, a.height, a.n) != (b.width, b.height, b.n) or a.samples != b.samples:
+            different.append(name)
+    return len(names), different
+
+
+def bench_one(pdf_path):
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        direct_s, direct_report, direct_dir = run_once(pdf_path, tmp / "direct", False)
+        batch_s, batch_report, batch_dir = run_once(pdf_path, tmp / "batch", True)
+        compared, different = compare_pngs(direct_dir, batch_dir)
+    return {
+        "file": pdf_path.name,
+        "dataset_id": batch_report["dataset_id"],
+        "direct_seconds": round(direct_s, 4),
+        "batch_seconds": round(batch_s, 4),
+        "speedup": round(direct_s / batch_s, 2) if batch_s > 0 else None,
+        "crop_render": batch_report.get("crop_render", {}),
+        "pngs_compared": compared,
+        "pixel_identical": not different,
+        "different": different[:20],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="圖題裁切 benchmark：批次整頁渲染 vs 逐題 clip 渲染")
+    parser.add_argument("--input-dir", default=None, help="PDF 目錄（相對專案根，預設 raw_pdfs 或 raw_pdfs:）")
+    parser.add_argument("--pdf", action="append", default=[], help="指定 PDF 檔名（可重複）；預設 a / b 題庫")
+    args = parser.parse_args()
+
+    if importer.fitz is None:
+        print("需安裝 PyMuPDF：pip install pymupdf", file=sys.stderr)
+        return 1
+    pdf_dir = get_pdf_dir(args.input_dir)
+    if not pdf_dir:
+        print("找不到 PDF 目錄（raw_pdfs 或 raw_pdfs:）", file=sys.stderr)
+        return 1
+    pdf_files = sorted(pdf_dir.glob("*.pdf"))
+    if args.pdf:
+        pdf_files = [p for p in pdf_files if p.name in args.pdf]
+    else:
+        ab = [p for p in pdf_files if importer.to_ascii_slug(importer.slug_from_filename(p.name)) in DEFAULT_SLUGS]
+        pdf_files = ab or pdf_files
+    if not pdf_files:
+        print("在 {} 下沒有找到 .pdf 檔案".format(pdf_dir), file=sys.stderr)
+        return 1
+
+    items = []
+    for pdf_path in pdf_files:
+        item = bench_one(pdf_path)
+        items.append(item)
+        print("  {}: direct {:.2f}s / batch {:.2f}s (x{}) sliced={} {}".format(
+            item["file"], item["direct_seconds"], item["batch_seconds"], item["speedup"],
+            item["crop_render"].get("sliced_crops", 0),
+            "pixel-identical" if item["pixel_identical"] else "DIFF({})".format(len(item["different"])),
+        ), flush=True)
+
+    direct_total = sum(i["direct_seconds"] for i in items)
+    batch_total = sum(i["batch_seconds"] for i in items)
+    result = {
+        "generatedAt": datetime.now().isoformat(),
+        "count": len(items),
+        "direct_seconds_total": round(direct_total, 4),
+        "batch_seconds_total": round(batch_total, 4),
+        "speedup": round(direct_total / batch_total, 2) if batch_total > 0 else None,
+        "all_pixel_identical": all(i["pixel_identical"] for i in items),
+        "items": items,
+    }
+    OUT_PATH.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print("Wrote:", str(OUT_PATH))
+    return 0 if result["all_pixel_identical"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
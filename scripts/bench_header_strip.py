@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比較去頁首/頁尾新舊實作：_strip_header_footer（合併成單一 regex、同份文字內重複行只判斷一次）vs
+_strip_header_footer_legacy（每行逐條比對 HEADER_FOOTER_PATTERNS，行與 strip 後各一次，約 16 次 regex）。
+對 raw_pdfs（或 raw_pdfs:）內每份 PDF 的全文與各頁文字計時並比對輸出，結果寫入 scripts/bench_header_strip.json。
+新版的結果快取在計時時每輪清空，量的是實際逐行判斷的時間。
+
+執行：
+  python3 scripts/bench_header_strip.py [--input-dir "raw_pdfs:"] [--pdf 綜合A.pdf] [--repeat 5]
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import import_pdfs_to_datasets as importer
+
+ROOT = Path(__file__).resolve().parent.parent
+OUT_PATH = ROOT / "scripts" / "bench_header_strip.json"
+
+
+def get_pdf_dir(input_dir=None):
+    if input_dir:
+        d = ROOT / input_dir
+        return d if d.is_dir() else None
+    for name in ("raw_pdfs", "raw_pdfs:"):
+        d = ROOT / name
+        if d.is_dir():
+            return d
+    return None
+
+
+def texts_for_pdf(pdf_path):
+    """匯入時實際會去頁首的文字：全文與各頁文字（經抽字快取）。"""
+    pages_text = importer.cached_pages_text(pdf_path, cache_dir=importer.text_cache_dir())
+    texts = ["\n".join(t for _, t in pages_text)]
+    texts.extend(t for _, t in pages_text)
+    return [t for t in texts if t]
+
+
+def _time(fn, texts, repeat):
+    best = None
+    results = None
+    for _ in range(repeat):
+        importer._HEADER_STRIP_CACHE.clear()
+        t0 = time.perf_counter()
+        results = [fn(t) for t in texts]
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def bench_one(pdf_path, repeat):
+    texts = texts_for_pdf(pdf_path)
+    legacy_s, old = _time(importer._strip_header_footer_legacy, texts, repeat)
+    new_s, new = _time(importer._strip_header_footer, texts, repeat)
+    diffs = [i for i, (a, b) in enumerate(zip(old, new)) if a != b]
+    return {
+        "file": pdf_path.name,
+        "texts": len(texts),
+        "lines": sum(t.count("\n") + 1 for t in texts),
+        "lines_removed": sum(a.count("\n") - b.count("\n") for a, b in zip(texts, new)),
+        "legacy_seconds": round(legacy_s, 4),
+        "combined_seconds": round(new_s, 4),
+        "speedup": round(legacy_s / new_s, 2) if new_s > 0 else None,
+        "identical": not diffs,
+        "diff_text_indexes": diffs[:20],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="去頁首 benchmark：合併 regex vs 舊版逐條比對")
+    parser.add_argument("--input-dir", default=None, help="PDF 目錄（相對專案根，預設 raw_pdfs 或 raw_pdfs:）")
+    parser.add_argument("--pdf", default=None, help="只測指定檔名的單一 PDF")
+    parser.add_argument("--repeat", type=int, default=5, help="每種實作重跑次數，取最快一次（預設 5）")
+    args = parser.parse_args()
+
+    pdf_dir = get_pdf_dir(args.input_dir)
+    if not pdf_dir:
+        print("找不到 PDF 目錄（raw_pdfs 或 raw_pdfs:）", file=sys.stderr)
+        return 1
+    pdf_files = sorted(pdf_dir.glob("*.pdf"))
+    if args.pdf:
+        pdf_files = [p for p in pdf_files if p.name == args.pdf]
+    if not pdf_files:
+        print("在 {} 下沒有找到 .pdf 檔案".format(pdf_dir), file=sys.stderr)
+        return 1
+
+    items = []
+    for pdf_path in pdf_files:
+        item = bench_one(pdf_path, max(1, args.repeat))
+        items.append(item)
+        print("  {}: legacy {:.4f}s / combined {:.4f}s (x{}) {}".format(
+            item["file"], item["legacy_seconds"], item["combined_seconds"], item["speedup"],
+            "OK" if item["identical"] else "DIFF({})".format(len(item["diff_text_indexes"])),
+        ), flush=True)
+
+    legacy_total = sum(i["legacy_seconds"] for i in items)
+    new_total = sum(i["combined_seconds"] for i in items)
+    result = {
+        "generatedAt": datetime.now().isoformat(),
+        "count": len(items),
+        "legacy_seconds_total": round(legacy_total, 4),
+        "combined_seconds_total": round(new_total, 4),
+        "speedup": round(legacy_total / new_total, 2) if new_total > 0 else None,
+        "all_identical": all(i["identical"] for i in items),
+        "items": items,
+    }
+    OUT_PATH.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print("Wrote:", str(OUT_PATH))
+    return 0 if result["all_identical"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
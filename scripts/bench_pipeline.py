@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF → JSON 管線 benchmark：以 synth_exam_pdf 產生 100 / 1,000 / 10,000 題的合成考卷（固定 seed，不需 raw_pdfs），
+分別計時 _split_blocks_with_fallback、parse_questions_from_text、build_question_index 與裁切產圖（process_pdf 的
+graphic_detect / render / encode / write 階段），並對照答案表統計解析正確題數。結果寫入 scripts/bench_pipeline.json，
+--baseline 指定先前的結果檔時另列各項耗時比值（> 1 代表變慢），方便跨版本比較。
+合成 PDF 快取在 scripts/.cache/synth/，同參數重跑不重產。
+
+執行：
+  python3 scripts/bench_pipeline.py [--sizes 100,1000,10000] [--layout mixed] [--repeat 3] [--no-crop] [--tight-crop] [--baseline old.json]
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+import import_pdfs_to_datasets as importer
+from synth_exam_pdf import LAYOUTS, build_exam_pdf
+
+ROOT = Path(__file__).resolve().parent.parent
+OUT_PATH = ROOT / "scripts" / "bench_pipeline.json"
+SYNTH_DIR = ROOT / "scripts" / ".cache" / "synth"
+# 產生器內容有變動時加一，讓快取的合成 PDF 重產
+SYNTH_VERSION = 1
+CROP_STAGES = ("graphic_detect", "tight_probe", "render", "encode", "write", "encode_wait", "quality", "calibrate")
+
+
+def synth_pdf(n_questions, layout, seed):
+    """回傳 (pdf_path, key, gen_seconds)；快取命中時 gen_seconds 為 0。"""
+    SYNTH_DIR.mkdir(parents=True, exist_ok=True)
+    stem = "synth_v{}_{}_{}_s{}".format(SYNTH_VERSION, layout, n_questions, seed)
+    pdf_path = SYNTH_DIR / (stem + ".pdf")
+    key_path = SYNTH_DIR / (stem + ".json")
+    if pdf_path.is_file() and key_path.is_file():
+        with open(str(key_path), "r", encoding="utf-8") as f:
+            return pdf_path, json.load(f), 0.0
+    t0 = time.perf_counter()
+    key = build_exam_pdf(pdf_path, n_questions, layout=layout, seed=seed)
+    elapsed = time.perf_counter() - t0
+    with open(str(key_path), "w", encoding="utf-8") as f:
+        json.dump(key, f, ensure_ascii=False)
+    return pdf_path, key, elapsed
+
+
+def _best_of(fn, repeat):
+    """重跑 repeat 次取最快一次，回傳 (秒數, 最後一次結果)。每次前清題塊切分快取，量的是冷切分。"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        importer._BLOCK_SPLIT_CACHE.clear()
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def score_questions(questions, key):
+    """依出現順序對照答案表：answers_matched＝題號與答案皆同；options_matched＝四個選項的首行皆同
+    （最後一個選項會帶上解析 / 頁尾等後續行，只比首行）。"""
+    answers = options = 0
+    for q, k in zip(questions, key):
+        if q["id"].split("_")[-1] == str(k["qno"]) and q["answer_index"] == k["answer"] - 1:
+            answers += 1
+        if [o.split("\n")[0].strip() for o in q["options"]] == k["options"]:
+            options += 1
+    return {"parsed": len(questions), "expected": len(key), "answers_matched": answers, "options_matched": options}
+
+
+def bench_crop(pdf_path, engine, encode_workers=None, crop_settings=None):
+    """在暫存根目錄跑一次 process_pdf（不動 public/ 與 scripts/parser_debug，進度訊息不印出），取報表的裁切相關階段秒數。
+    編碼管線開啟時 encode / write 只含主執行緒的部分，工作執行緒的秒數與吞吐量見 encode_pipeline。"""
+    saved_root = importer.ROOT
+    with tempfile.TemporaryDirectory() as tmp:
+        importer.ROOT = Path(tmp)
+        try:
+            report = []
+            t0 = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                importer.process_pdf(None, None, pdf_path, report, assets_root=str(Path(tmp) / "public" / "assets"),
+                                     text_cache=False, text_engine=engine, encode_workers=encode_workers,
+                                     crop_settings=crop_settings)
+            elapsed = time.perf_counter() - t0
+        finally:
+            importer.ROOT = saved_root
+    entry = report[0]
+    timings = entry.get("timings", {})
+    decisions = [d.get("image_decision") for d in entry.get("image_decisions", [])]
+    crop_seconds = sum(timings.get(k, 0.0) for k in CROP_STAGES)
+    rendered = sum(1 for d in decisions if d in ("rendered", "forced_by_keywords"))
+    return {
+        "process_pdf_seconds": round(elapsed, 4),
+        "crop_seconds": round(crop_seconds, 4),
+        "stages": {k: timings[k] for k in CROP_STAGES if k in timings},
+        "image_questions": entry.get("image_questions_count", 0),
+        "rendered": rendered,
+        "skipped_no_graphic": decisions.count("skipped_no_graphic"),
+        "failed": decisions.count("failed"),
+        "ms_per_crop": round(crop_seconds * 1000.0 / rendered, 2) if rendered else None,
+        "crop_render": entry.get("crop_render", {}),
+        "encode_pipeline": entry.get("encode_pipeline", {}),
+        "crop_quality": entry.get("crop_quality", {}),
+        "tight_crop": entry.get("tight_crop", {}),
+        "files_written": entry.get("counters", {}).get("files_written", 0),
+    }
+
+
+def bench_size(n_questions, layout, seed, repeat, engine, crop, encode_workers=None, crop_settings=None):
+    pdf_path, key, gen_seconds = synth_pdf(n_questions, layout, seed)
+    t0 = time.perf_counter()
+    with importer.PdfSession(pdf_path, text_engine=engine) as session:
+        pages_text = session.pages_text()
+        text_engine = session.text_stats.get("engine")
+    extract_seconds = time.perf_counter() - t0
+    full_text = "\n".join(t for _, t in pages_text)
+
+    split_s, split = _best_of(lambda: importer._split_blocks_with_fallback(full_text), repeat)
+    parse_s, parsed = _best_of(lambda: importer.parse_questions_from_text(full_text, "synth"), repeat)
+
+    def _index():
+        with importer.PdfSession(pdf_path) as s:
+            return importer.build_question_index(s)
+    index_s, index = _best_of(_index, repeat)
+
+    item = {
+        "questions": n_questions,
+        "pages": len(pages_text),
+        "pdf_bytes": pdf_path.stat().st_size,
+        "text_chars": len(full_text),
+        "text_engine": text_engine,
+        "generate_seconds": round(gen_seconds, 4),
+        "extract_seconds": round(extract_seconds, 4),
+        "split_seconds": round(split_s, 4),
+        "blocks": len(split[0]),
+        "parse_seconds": round(parse_s, 4),
+        "index_seconds": round(index_s, 4),
+        "index_entries": len(index),
+    }
+    item.update(score_questions(parsed[0], key))
+    if crop:
+        item["crop"] = bench_crop(pdf_path, engine, encode_workers, crop_settings)
+    return item
+
+
+def _seconds_ratios(new, old):
+    """同鍵的 *_seconds 比值 new / old（含 crop 子項）。"""
+    out = {}
+    for k, v in new.items():
+        if k.endswith("_seconds") and k != "generate_seconds" and old.get(k):
+            out[k] = round(v / old[k], 3)
+    if isinstance(new.get("crop"), dict) and isinstance(old.get("crop"), dict):
+        for k, v in _seconds_ratios(new["crop"], old["crop"]).items():
+            out["crop." + k] = v
+    return out
+
+
+def compare_baseline(result, baseline_path):
+    """與先前結果比對同題數的項目；合成參數（版面 / seed / 產生器版本）不同時 comparable 為 False，比值僅供參考。"""
+    with open(str(baseline_path), "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    old_items = {i["questions"]: i for i in baseline.get("items", [])}
+    out = {
+        "file": str(baseline_path),
+        "generatedAt": baseline.get("generatedAt"),
+        "parser_version": baseline.get("parser_version"),
+        "comparable": all(baseline.get(k) == result[k] for k in ("layout", "seed", "synth_version", "engine")),
+        "ratios": {},
+    }
+    for item in result["items"]:
+        old = old_items.get(item["questions"])
+        if old:
+            out["ratios"][str(item["questions"])] = _seconds_ratios(item, old)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF → JSON 管線 benchmark（合成考卷）")
+    parser.add_argument("--sizes", default="100,1000,10000", help="題數，逗號分隔（預設 100,1000,10000）")
+    parser.add_argument("--layout", choices=("mixed",) + LAYOUTS, default="mixed", help="選項版面（預設 mixed：每回輪替）")
+    parser.add_argument("--seed", type=int, default=1, help="合成考卷亂數種子（預設 1）")
+    parser.add_argument("--repeat", type=int, default=3, help="切分 / 解析 / 題號索引重跑次數，取最快一次（預設 3）")
+    parser.add_argument("--engine", choices=("auto",) + importer.TEXT_ENGINES, default=None, help="抽字引擎（預設 pdfplumber，未安裝時 fitz，同匯入腳本；auto＝逐份試抽挑最快的合格引擎）")
+    parser.add_argument("--no-crop", action="store_true", help="不跑裁切產圖（最花時間的一段）")
+    parser.add_argument("--encode-workers", type=int, default=None, help="裁切產圖的編碼管線執行緒數（預設同匯入腳本自動決定；0＝主執行緒逐張）")
+    parser.add_argument("--tight-crop", action="store_true", help="裁切產圖改用緊貼裁切（同匯入腳本 --tight-crop）")
+    parser.add_argument("--baseline", default=None, help="先前的 bench_pipeline.json，另列耗時比值")
+    parser.add_argument("--out", default=None, help="結果檔路徑（預設 scripts/bench_pipeline.json）")
+    args = parser.parse_args()
+
+    if importer.fitz is None:
+        print("需要 PyMuPDF（產生合成考卷、題號索引與裁切皆用到）：pip install pymupdf", file=sys.stderr)
+        return 1
+    try:
+        sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    except ValueError:
+        print("--sizes 需為逗號分隔的整數：{}".format(args.sizes), file=sys.stderr)
+        return 1
+    engine = args.engine
+    crop_settings = dict(importer.CROP_SETTINGS, tight=bool(args.tight_crop))
+
+    items = []
+    for n in sizes:
+        print("  {} 題 ...".format(n), end=" ", flush=True)
+        item = bench_size(n, args.layout, args.seed, max(1, args.repeat), engine, not args.no_crop, args.encode_workers,
+                           crop_settings)
+        items.append(item)
+        line = "split {:.4f}s / parse {:.4f}s / index {:.4f}s，解析 {}/{}（答案對 {}）".format(
+            item["split_seconds"], item["parse_seconds"], item["index_seconds"],
+            item["parsed"], item["expected"], item["answers_matched"])
+        if "crop" in item:
+            line += " / crop {:.4f}s（{} 張）".format(item["crop"]["crop_seconds"], item["crop"]["rendered"])
+        print(line, flush=True)
+
+    result = {
+        "generatedAt": datetime.now().isoformat(),
+        "parser_version": importer.PARSER_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "engines": [importer._text_engine_id(e) for e in importer.available_text_engines()],
+        "engine": engine,
+        "layout": args.layout,
+        "seed": args.seed,
+        "synth_version": SYNTH_VERSION,
+        "repeat": max(1, args.repeat),
+        "tight_crop": bool(args.tight_crop),
+        "encode_workers": args.encode_workers if args.encode_workers is not None else importer.default_encode_workers(),
+        "items": items,
+    }
+    if args.baseline:
+        result["baseline"] = compare_baseline(result, Path(args.baseline))
+        for n, ratios in sorted(result["baseline"]["ratios"].items(), key=lambda kv: int(kv[0])):
+            print("  vs baseline {} 題: {}".format(n, ", ".join("{} x{}".format(k, v) for k, v in sorted(ratios.items()))))
+    out_path = Path(args.out) if args.out else OUT_PATH
+    out_path.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print("Wrote:", str(out_path))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比較題號索引新舊實作：build_question_index（每頁單次掃描）vs build_question_index_legacy（每頁 600 次 search_for）。
+對 raw_pdfs（或 raw_pdfs:）內每份 PDF 計時並逐筆比對 (page, qno) -> (y0, y1, rect)，結果寫入 scripts/bench_question_index.json。
+另對索引內每一題比較裁切左緣：_x0_after_answer（每頁答案標記掃一次、二分搜尋）vs _x0_after_answer_legacy（每題 4 次 search_for）。
+
+執行：
+  python3 scripts/bench_question_index.py [--input-dir "raw_pdfs:"] [--pdf 綜合A.pdf]
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from import_pdfs_to_datasets import (
+    PdfSession, _x0_after_answer, _x0_after_answer_legacy, build_question_index, build_question_index_legacy,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+OUT_PATH = ROOT / "scripts" / "bench_question_index.json"
+
+
+def get_pdf_dir(input_dir=None):
+    if input_dir:
+        d = ROOT / input_dir
+        return d if d.is_dir() else None
+    for name in ("raw_pdfs", "raw_pdfs:"):
+        d = ROOT / name
+        if d.is_dir():
+            return d
+    return None
+
+
+def _index_key(value):
+    y0, y1, rect = value
+    return (round(y0, 3), round(y1, 3), tuple(round(v, 3) for v in rect))
+
+
+def diff_indexes(old, new):
+    """回傳差異清單（最多 20 筆），空清單代表兩者相同。"""
+    diffs = []
+    for key in sorted(set(old) | set(new)):
+        a = old.get(key)
+        b = new.get(key)
+        if a is None or b is None or _index_key(a) != _index_key(b):
+            diffs.append({
+                "page": key[0],
+                "qno": key[1],
+                "legacy": list(_index_key(a)) if a else None,
+                "single_pass": list(_index_key(b)) if b else None,
+            })
+            if len(diffs) >= 20:
+                break
+    return diffs
+
+
+def bench_x0(pdf_path, index):
+    """索引內每題各算一次裁切左緣（新舊各用新 session，新版含每頁掃答案標記的時間），回傳 (舊秒數, 新秒數, 不同題數)。"""
+    results = []
+    for fn in (_x0_after_answer_legacy, _x0_after_answer):
+        with PdfSession(pdf_path) as session:
+            pages = {p: session.page(p) for p, _ in index}
+            t0 = time.perf_counter()
+            if fn is _x0_after_answer_legacy:
+                xs = [fn(pages[p], rect, pages[p].rect.width) for (p, _), (_, _, rect) in sorted(index.items())]
+            else:
+                xs = [fn(session, p, rect, pages[p].rect.width) for (p, _), (_, _, rect) in sorted(index.items())]
+            results.append((time.perf_counter() - t0, xs))
+    (old_s, old), (new_s, new) = results
+    return old_s, new_s, sum(1 for a, b in zip(old, new) if a != b)
+
+
+def bench_one(pdf_path):
+    # 各自開新 session，避免新版吃到舊版已載入的頁面快取
+    t0 = time.perf_counter()
+    with PdfSession(pdf_path) as session:
+        old = build_question_index_legacy(session)
+    t1 = time.perf_counter()
+    with PdfSession(pdf_path) as session:
+        new = build_question_index(session)
+    t2 = time.perf_counter()
+    diffs = diff_indexes(old, new)
+    legacy_s = t1 - t0
+    single_s = t2 - t1
+    x0_legacy_s, x0_new_s, x0_diffs = bench_x0(pdf_path, new)
+    return {
+        "file": pdf_path.name,
+        "entries": len(new),
+        "legacy_seconds": round(legacy_s, 4),
+        "single_pass_seconds": round(single_s, 4),
+        "speedup": round(legacy_s / single_s, 1) if single_s > 0 else None,
+        "identical": not diffs and not x0_diffs,
+        "diffs": diffs,
+        "x0_legacy_seconds": round(x0_legacy_s, 4),
+        "x0_seconds": round(x0_new_s, 4),
+        "x0_diff_count": x0_diffs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="題號索引 benchmark：單次掃描 vs 舊版 search_for")
+    parser.add_argument("--input-dir", default=None, help="PDF 目錄（相對專案根，預設 raw_pdfs 或 raw_pdfs:）")
+    parser.add_argument("--pdf", default=None, help="只測指定檔名的單一 PDF")
+    args = parser.parse_args()
+
+    pdf_dir = get_pdf_dir(args.input_dir)
+    if not pdf_dir:
+        print("找不到 PDF 目錄（raw_pdfs 或 raw_pdfs:）", file=sys.stderr)
+        return 1
+    pdf_files = sorted(pdf_dir.glob("*.pdf"))
+    if args.pdf:
+        pdf_files = [p for p in pdf_files if p.name == args.pdf]
+    if not pdf_files:
+        print("在 {} 下沒有找到 .pdf 檔案".format(pdf_dir), file=sys.stderr)
+        return 1
+
+    items = []
+    for pdf_path in pdf_files:
+        item = bench_one(pdf_path)
+        items.append(item)
+        print("  {}: legacy {:.2f}s / single-pass {:.2f}s (x{})，裁切左緣 {:.3f}s -> {:.3f}s {}".format(
+            item["file"], item["legacy_seconds"], item["single_pass_seconds"], item["speedup"],
+            item["x0_legacy_seconds"], item["x0_seconds"],
+            "OK" if item["identical"] else "DIFF({}/{})".format(len(item["diffs"]), item["x0_diff_count"]),
+        ), flush=True)
+
+    legacy_total = sum(i["legacy_seconds"] for i in items)
+    single_total = sum(i["single_pass_seconds"] for i in items)
+    result = {
+        "generatedAt": datetime.now().isoformat(),
+        "count": len(items),
+        "legacy_seconds_total": round(legacy_total, 4),
+        "single_pass_seconds_total": round(single_total, 4),
+        "speedup": round(legacy_total / single_total, 1) if single_total > 0 else None,
+        "all_identical": all(i["identical"] for i in items),
+        "items": items,
+    }
+    OUT_PATH.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print("Wrote:", str(OUT_PATH))
+    return 0 if result["all_identical"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
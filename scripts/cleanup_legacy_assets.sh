@@ -1,6 +1,6 @@
 #!/usr/bin/env bash
 # v1.2.2: 清除 public/data 與 public/assets/q 下非 slug 規格的舊檔（中文/亂碼）
-# 僅保留：index.json、questions_<slug>.json（slug 僅含 [a-z0-9_]）、assets/q/<slug>/
+# 僅保留：index.json、questions_<slug>.json / questions_<slug>.pack.json（slug 僅含 [a-z0-9_]）、assets/q/<slug>/
 # 用法：在專案根目錄執行 bash scripts/cleanup_legacy_assets.sh
 
 set -e
@@ -17,6 +17,7 @@ if [ -d "$DATA" ]; then
     base=$(basename "$f" .json)
     # questions_ 後若含非 ASCII 或非 [a-z0-9_] 則視為殘留
     rest=${base#questions_}
+    rest=${rest%.pack}  # questions_<slug>.pack.json 為同題庫的壓縮格式
     # 僅保留 [a-z0-9_] 組成的檔名（v1, y105, zonghe_a 等）
     if [ -z "$rest" ] || echo "$rest" | grep -qE '[^a-z0-9_]'; then
       echo "刪除 data 殘留: $f"
@@ -2,17 +2,21 @@
 # -*- coding: utf-8 -*-
 """
 只針對 105-126002工程管理學科.pdf 抽取每頁文字，輸出所有「疑似題號」前後文到 105_markers.txt。
-用於觀測題號實際長相，再升級題號檢測 regex。
+用於觀測題號實際長相，再升級題號檢測 regex。各頁文字經 scripts/.cache 抽字快取（與匯入腳本共用）。
+
+執行：
+  python3 scripts/dump_question_markers.py [--engine auto|pdfplumber|fitz]
 """
 from __future__ import print_function, unicode_literals
 
+import argparse
 import re
 from pathlib import Path
 
-try:
-    import pdfplumber
-except ImportError:
-    print("pip install pdfplumber", __import__("sys").stderr)
+from import_pdfs_to_datasets import TEXT_ENGINES, available_text_engines, cached_pages_text, text_cache_dir
+
+if not available_text_engines():
+    print("pip install pdfplumber", file=__import__("sys").stderr)
     __import__("sys").exit(1)
 
 ROOT = Path(__file__).resolve().parent.parent
@@ -31,6 +35,9 @@ def get_pdf_path():
     return None
 
 def main():
+    parser = argparse.ArgumentParser(description="105 PDF 題號觀測樣本")
+    parser.add_argument("--engine", choices=("auto",) + TEXT_ENGINES, default=None, help="抽字引擎（預設 pdfplumber，未安裝時 fitz，同匯入腳本；auto＝逐份試抽挑最快的合格引擎）")
+    args = parser.parse_args()
     pdf_path = get_pdf_path()
     if not pdf_path:
         print("找不到 105 PDF", file=__import__("sys").stderr)
@@ -41,20 +48,21 @@ def main():
     lines.append("")
     pattern_counts = {}  # 題號實際長相統計
     pat = re.compile(r"\d{1,3}")
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_idx, page in enumerate(pdf.pages):
-            text = page.extract_text() or ""
-            lines.append("=== 第 {} 頁 (len={}) ===".format(page_idx + 1, len(text)))
-            for m in pat.finditer(text):
-                start, end = m.span()
-                qno = m.group(0)
-                before = text[max(0, start - CONTEXT):start]
-                after = text[end:min(len(text), end + CONTEXT)]
-                snippet = "|{}|{}|".format(before.replace("\n", " "), after.replace("\n", " "))
-                lines.append("  qno={} -> {}".format(qno, snippet))
-                key = repr(before[-3:] if len(before) >= 3 else before) + "|" + repr(after[:3] if len(after) >= 3 else after)
-                pattern_counts[key] = pattern_counts.get(key, 0) + 1
-            lines.append("")
+    stats = {}
+    pages_text = cached_pages_text(pdf_path, cache_dir=text_cache_dir(ROOT), engine=args.engine, stats=stats)
+    lines[0] += "（抽字引擎 {}）".format(stats.get("engine"))
+    for page_no, text in pages_text:
+        lines.append("=== 第 {} 頁 (len={}) ===".format(page_no, len(text)))
+        for m in pat.finditer(text):
+            start, end = m.span()
+            qno = m.group(0)
+            before = text[max(0, start - CONTEXT):start]
+            after = text[end:min(len(text), end + CONTEXT)]
+            snippet = "|{}|{}|".format(before.replace("\n", " "), after.replace("\n", " "))
+            lines.append("  qno={} -> {}".format(qno, snippet))
+            key = repr(before[-3:] if len(before) >= 3 else before) + "|" + repr(after[:3] if len(after) >= 3 else after)
+            pattern_counts[key] = pattern_counts.get(key, 0) + 1
+        lines.append("")
     lines.append("--- top patterns（題號前 3 字 / 後 3 字 出現次數）---")
     for k, v in sorted(pattern_counts.items(), key=lambda x: -x[1])[:30]:
         lines.append("  {} : {}".format(k, v))
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 """
 從 raw_pdfs 內每份 PDF 的前兩頁擷取「題數宣告」文字，輸出 JSON 陣列到 stdout。
+前兩頁文字經 scripts/.cache 抽字快取（與匯入腳本共用）。
 供 pdf_expected_count.mjs 呼叫；若本機無 PDF 則由 Node 改讀 import_report.json。
 """
 from __future__ import print_function, unicode_literals
@@ -12,20 +13,7 @@ import re
 import sys
 from pathlib import Path
 
-try:
-    import pdfplumber
-    PDF_ENGINE = "pdfplumber"
-except ImportError:
-    pdfplumber = None
-    PDF_ENGINE = None
-
-if PDF_ENGINE is None:
-    try:
-        import fitz
-        PDF_ENGINE = "fitz"
-    except ImportError:
-        fitz = None
-        PDF_ENGINE = None
+from import_pdfs_to_datasets import TEXT_ENGINES, available_text_engines, cached_pages_text, text_cache_dir
 
 ROOT = Path(__file__).resolve().parent.parent
 
@@ -44,26 +32,12 @@ DECLARE_PATTERNS = [
 ]
 
 
-def extract_text_first_pages(pdf_path, max_pages=2):
-    out = []
-    path = Path(pdf_path)
-    if PDF_ENGINE == "pdfplumber" and pdfplumber:
-        try:
-            with pdfplumber.open(path) as pdf:
-                for i in range(min(max_pages, len(pdf.pages))):
-                    t = pdf.pages[i].extract_text()
-                    out.append(t if t else "")
-        except Exception:
-            return []
-    elif PDF_ENGINE == "fitz" and fitz:
-        try:
-            doc = fitz.open(str(path))
-            for i in range(min(max_pages, len(doc))):
-                out.append(doc[i].get_text() or "")
-            doc.close()
-        except Exception:
-            return []
-    return out
+def extract_text_first_pages(pdf_path, max_pages=2, cache_dir=None, engine=None, stats=None):
+    """前 max_pages 頁文字；cache_dir 給定時經抽字快取（與匯入腳本共用，只抽過前兩頁者存部分快取）。"""
+    try:
+        return [t for _, t in cached_pages_text(Path(pdf_path), max_pages=max_pages, cache_dir=cache_dir, engine=engine, stats=stats)]
+    except Exception:
+        return []
 
 
 def find_expected_and_evidence(text):
@@ -87,11 +61,13 @@ def main():
     parser = argparse.ArgumentParser(description="PDF 題數宣告 → JSON")
     parser.add_argument("--input-dir", default="raw_pdfs", help="PDF 目錄（相對專案根）")
     parser.add_argument("--root", default=None, help="專案根目錄")
+    parser.add_argument("--engine", choices=("auto",) + TEXT_ENGINES, default=None, help="抽字引擎（預設 pdfplumber，未安裝時 fitz，同匯入腳本；auto＝逐份試抽挑最快的合格引擎）")
+    parser.add_argument("--no-cache", action="store_true", help="不讀寫 scripts/.cache 抽字快取")
     args = parser.parse_args()
     root = Path(args.root).resolve() if args.root else ROOT
     input_dir = root / args.input_dir
 
-    if PDF_ENGINE is None:
+    if not available_text_engines():
         print(json.dumps({"error": "no PDF engine (pip install pdfplumber or pymupdf)"}), file=sys.stderr)
         sys.exit(1)
 
@@ -104,15 +80,18 @@ def main():
         print(json.dumps({"error": "no PDF files in " + str(input_dir)}), file=sys.stderr)
         sys.exit(1)
 
+    cache_dir = None if args.no_cache else text_cache_dir(root)
     result = []
     for pdf_path in pdf_files:
-        pages_text = extract_text_first_pages(pdf_path)
+        stats = {}
+        pages_text = extract_text_first_pages(pdf_path, cache_dir=cache_dir, engine=args.engine, stats=stats)
         combined = "\n".join(pages_text)
         expected, evidence = find_expected_and_evidence(combined)
         result.append({
             "file": pdf_path.name,
             "expected": expected,
             "evidence": evidence or None,
+            "engine": stats.get("engine"),
         })
 
     print(json.dumps(result, ensure_ascii=False))
@@ -17,10 +17,19 @@ MLH Quiz v1.2 — 將 raw_pdfs/ 內 PDF 轉成 public/data/questions_<id>.json
 from __future__ import print_function, unicode_literals
 
 import argparse
+import bisect
+import gzip
+import hashlib
+import io
 import json
+import os
 import re
 import shutil
 import sys
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
 
@@ -35,21 +44,27 @@ def write_text(path, text, encoding="utf-8"):
     with open(path, "w", encoding=encoding) as f:
         f.write(text)
 
-# 優先 pdfplumber（純 Python，Python 3.6 可用）
+# 抽字引擎：pdfplumber（純 Python，Python 3.6 可用）與 PyMuPDF 擇一或並存；--engine auto 依速度與題號密度逐份挑選（見 resolve_text_engine）
 try:
     import pdfplumber
-    PDF_ENGINE = "pdfplumber"
 except ImportError:
     pdfplumber = None
-    PDF_ENGINE = None
-
-if PDF_ENGINE is None:
+try:
+    import pymupdf as fitz  # PyMuPDF ≥ 1.24 的名稱；舊名 fitz 在新版匯入時會把棄用警告印到 stdout
+except ImportError:
     try:
         import fitz  # PyMuPDF，需 Python 3.7+ 且可編譯
-        PDF_ENGINE = "fitz"
     except ImportError:
         fitz = None
-        PDF_ENGINE = None
+
+# 未指定引擎時的預設順序（舊版行為：有 pdfplumber 就用 pdfplumber）
+TEXT_ENGINES = ("pdfplumber", "fitz")
+PDF_ENGINE = "pdfplumber" if pdfplumber else ("fitz" if fitz else None)
+
+
+def available_text_engines():
+    return [e for e in TEXT_ENGINES if (pdfplumber if e == "pdfplumber" else fitz) is not None]
+
 
 # 專案根目錄 = 本腳本所在目錄的上一層（可用 --root 覆寫，供 Colab 用）
 ROOT = Path(__file__).resolve().parent.parent
@@ -91,30 +106,428 @@ def to_ascii_slug(raw_id):
     return out[:32] if out else "dataset"
 
 
-def extract_text_from_pdf(path):
-    """回傳 (page_1based, text) 列表。"""
-    path = Path(path)
-    out = []
-    if PDF_ENGINE == "pdfplumber" and pdfplumber:
+# 抽字快取：scripts/.cache/page_text/<PDF sha256>.<引擎>-<版本>.jsonl.gz，第一行 header，之後一行一頁 {"page", "text"}。
+# 匯入、--debug、pdf_text_diagnostics.py、extract_pdf_expected.py、dump_question_markers.py 共用；
+# 內容與引擎版本相同的 PDF 文字只抽一次（pdfplumber 抽字是這些腳本最慢的一步）。
+TEXT_CACHE_FORMAT = "mlh-page-text"
+TEXT_CACHE_VERSION = 2
+
+
+def text_cache_dir(root=None):
+    return Path(root or ROOT) / "scripts" / ".cache" / "page_text"
+
+
+def _text_engine_id(engine):
+    """抽字引擎與版本（版本不同抽出的文字可能不同，快取分開存）；未安裝回傳 None。"""
+    if engine == "pdfplumber" and pdfplumber:
+        return "pdfplumber-{}".format(getattr(pdfplumber, "__version__", "0"))
+    if engine == "fitz" and fitz:
+        return "fitz-{}".format(getattr(fitz, "VersionBind", "0"))
+    return None
+
+
+class PageTextCache:
+    """單一 PDF、單一引擎的抽字快取檔。header 記 page_count（總頁數）、pages（已存頁數）、complete（是否全部頁面）；
+    每頁另記當初的抽字秒數（auto 選引擎時比速度用）。只抽前幾頁的呼叫寫的是部分快取，要全部頁面時會重抽並覆寫。"""
+
+    def __init__(self, pdf_path, cache_dir, engine=None, sha256=None):
+        self.sha256 = sha256 or _file_sha256(pdf_path)
+        self.engine_id = _text_engine_id(engine or PDF_ENGINE)
+        self.path = Path(cache_dir) / "{}.{}.jsonl.gz".format(self.sha256, self.engine_id)
+        self._tmp = None
+        self._out = None
+
+    def header(self):
+        """快取 header（dict）；沒有、格式不符或讀不到回傳 None。"""
+        if not self.path.is_file():
+            return None
         try:
-            with pdfplumber.open(path) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    t = page.extract_text()
-                    out.append((i + 1, t if t else ""))
-        except Exception as e:
-            print("  pdfplumber 讀取失敗: {}".format(e), file=sys.stderr)
-            return []
-    elif PDF_ENGINE == "fitz" and fitz:
+            with gzip.open(str(self.path), "rt", encoding="utf-8") as f:
+                head = json.loads(f.readline())
+        except (IOError, OSError, EOFError, ValueError):
+            return None
+        if head.get("format") != TEXT_CACHE_FORMAT or head.get("version") != TEXT_CACHE_VERSION:
+            return None
+        return head
+
+    def covers(self, head, max_pages=None):
+        if not head:
+            return False
+        if head.get("complete"):
+            return True
+        return max_pages is not None and head.get("pages", 0) >= min(max_pages, head.get("page_count", 0))
+
+    def iter_pages(self, max_pages=None):
+        """產出 (page_1based, text, 抽字秒數)。"""
+        with gzip.open(str(self.path), "rt", encoding="utf-8") as f:
+            f.readline()
+            for line in f:
+                rec = json.loads(line)
+                if max_pages is not None and rec["page"] > max_pages:
+                    break
+                yield rec["page"], rec["text"], rec.get("seconds", 0.0)
+
+    def begin(self, page_count, max_pages=None):
+        """開始寫入（先寫暫存檔，commit 時才換上）；max_pages 為 None 表示會寫入全部頁面。"""
+        pages = page_count if max_pages is None else min(page_count, max_pages)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.path.with_name("{}.{}.tmp".format(self.path.name, os.getpid()))
+        self._out = gzip.open(str(self._tmp), "wt", encoding="utf-8", compresslevel=6)
+        self._out.write(json.dumps({
+            "format": TEXT_CACHE_FORMAT,
+            "version": TEXT_CACHE_VERSION,
+            "sha256": self.sha256,
+            "engine": self.engine_id,
+            "page_count": page_count,
+            "pages": pages,
+            "complete": pages == page_count,
+        }) + "\n")
+
+    def add(self, page_no, text, seconds=0.0):
+        self._out.write(json.dumps({"page": page_no, "text": text, "seconds": round(seconds, 5)}, ensure_ascii=False) + "\n")
+
+    def commit(self):
+        if self._out is None:
+            return
+        self._out.close()
+        self._out = None
+        os.replace(str(self._tmp), str(self.path))
+
+    def abort(self):
+        if self._out is None:
+            return
+        self._out.close()
+        self._out = None
+        try:
+            os.remove(str(self._tmp))
+        except OSError:
+            pass
+
+
+def _iter_extract_pages(pdf_path, engine, max_pages=None, doc=None):
+    """用指定引擎逐頁抽文字，產出 (page_count, page_1based, text)；pdfplumber 每頁抽完即 close。
+    doc：已開啟的 PyMuPDF Document（PdfSession 共用，不在此關閉）。失敗時拋出例外。"""
+    if engine == "pdfplumber":
+        with pdfplumber.open(str(pdf_path)) as pdf:
+            page_count = len(pdf.pages)
+            for i in range(page_count if max_pages is None else min(page_count, max_pages)):
+                page = pdf.pages[i]
+                t = page.extract_text()
+                page.close()
+                yield page_count, i + 1, t if t else ""
+    elif engine == "fitz":
+        own = doc is None
+        if own:
+            doc = fitz.open(str(pdf_path))
         try:
-            doc = fitz.open(str(path))
-            for i in range(len(doc)):
-                page = doc[i]
-                out.append((i + 1, page.get_text() or ""))
-            doc.close()
+            page_count = len(doc)
+            for i in range(page_count if max_pages is None else min(page_count, max_pages)):
+                t = doc.load_page(i).get_text() or ""
+                # get_text 每行（含最後一行）都以 \n 結尾，pdfplumber 沒有；去掉頁尾換行，兩引擎的頁與頁相接方式才一致
+                yield page_count, i + 1, t[:-1] if t.endswith("\n") else t
+        finally:
+            if own:
+                doc.close()
+
+
+def iter_cached_pages_text(pdf_path, max_pages=None, cache_dir=None, doc=None, engine=None, stats=None):
+    """逐頁產出 (page_1based, text)，max_pages 只取前幾頁；engine 預設 PDF_ENGINE，auto 先經 resolve_text_engine 挑選。
+    cache_dir 給定時先讀抽字快取，未命中才抽字並邊抽邊寫快取。stats（dict）記 engine（auto 另有 probe），並累計
+    seconds（本次耗時）、extract_seconds（抽字耗時；命中快取時為當初抽字的秒數）、pages 與 cached。
+    抽取失敗時拋出例外（不寫快取）；引擎未安裝時不產出任何頁。"""
+    if stats is None:
+        stats = {}
+    engine = engine or PDF_ENGINE
+    if engine == "auto":
+        engine, probe = resolve_text_engine(pdf_path, "auto", cache_dir)
+        if probe:
+            stats["probe"] = probe
+    stats["engine"] = engine
+    if _text_engine_id(engine) is None:
+        return
+    for k in ("seconds", "extract_seconds"):
+        stats.setdefault(k, 0.0)
+    stats.setdefault("pages", 0)
+    stats["cached"] = False
+    cache = None
+    if cache_dir is not None:
+        cache = PageTextCache(pdf_path, cache_dir, engine)
+        if cache.covers(cache.header(), max_pages):
+            stats["cached"] = True
+            t0 = time.perf_counter()
+            for page_no, text, seconds in cache.iter_pages(max_pages):
+                stats["seconds"] += time.perf_counter() - t0
+                stats["extract_seconds"] += seconds
+                stats["pages"] += 1
+                yield page_no, text
+                t0 = time.perf_counter()
+            return
+    done = False
+    pages = _iter_extract_pages(pdf_path, engine, max_pages, doc)
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                page_count, page_no, text = next(pages)
+            except StopIteration:
+                break
+            seconds = time.perf_counter() - t0
+            stats["seconds"] += seconds
+            stats["extract_seconds"] += seconds
+            stats["pages"] += 1
+            if cache is not None:
+                if page_no == 1:
+                    cache.begin(page_count, max_pages)
+                cache.add(page_no, text, seconds)
+            yield page_no, text
+        done = True
+    finally:
+        pages.close()
+        if cache is not None:
+            if done:
+                cache.commit()
+            else:
+                cache.abort()
+
+
+def cached_pages_text(pdf_path, max_pages=None, cache_dir=None, engine=None, stats=None):
+    """iter_cached_pages_text 的列表版，供診斷腳本使用。"""
+    return list(iter_cached_pages_text(pdf_path, max_pages=max_pages, cache_dir=cache_dir, engine=engine, stats=stats))
+
+
+# --engine auto：各引擎先抽前幾頁比較。題塊數與非空白字數都達最佳者的 90%（且至少切出 1 個題塊）才算合格，
+# 合格者取每頁抽字最快的；都不合格（掃描檔、無題號文件）時依 TEXT_ENGINES 順序取第一個已安裝的引擎
+ENGINE_PROBE_PAGES = 3
+ENGINE_MIN_RATIO = 0.9
+
+
+def _engine_probe(pdf_path, engine, cache_dir=None):
+    stats = {}
+    try:
+        pages = cached_pages_text(pdf_path, max_pages=ENGINE_PROBE_PAGES, cache_dir=cache_dir, engine=engine, stats=stats)
+    except Exception as e:
+        return {"ok": False, "error": str(e)[:200]}
+    text = "\n".join(t for _, t in pages)
+    blocks = _split_blocks_single_pass(text)[1]["detected_question_count"] if text.strip() else 0
+    return {
+        "ok": True,
+        "pages": len(pages),
+        "blocks": blocks,
+        "chars": len("".join(text.split())),
+        "seconds_per_page": round(stats["extract_seconds"] / len(pages), 5) if pages else None,
+    }
+
+
+def resolve_text_engine(pdf_path, engine="auto", cache_dir=None):
+    """回傳 (具體引擎或 None, probe)。engine 指定引擎時直接使用（未安裝回傳 None）；auto 規則見 ENGINE_PROBE_PAGES。
+    probe 為各引擎試抽結果（auto 才有），寫進報表供比對。試抽走抽字快取，重跑時結果相同且不再抽字。"""
+    if engine and engine != "auto":
+        return (engine if _text_engine_id(engine) else None), None
+    engines = available_text_engines()
+    if len(engines) <= 1:
+        return (engines[0] if engines else None), None
+    probe = dict((e, _engine_probe(pdf_path, e, cache_dir)) for e in engines)
+    best_blocks = max(p.get("blocks", 0) for p in probe.values())
+    best_chars = max(p.get("chars", 0) for p in probe.values())
+    passed = [
+        e for e in engines
+        if probe[e]["ok"] and probe[e]["pages"] and best_blocks > 0
+        and probe[e]["blocks"] >= best_blocks * ENGINE_MIN_RATIO and probe[e]["chars"] >= best_chars * ENGINE_MIN_RATIO
+    ]
+    for e in engines:
+        probe[e]["passed"] = e in passed
+    if passed:
+        return min(passed, key=lambda e: (probe[e]["seconds_per_page"], engines.index(e))), probe
+    return engines[0], probe
+
+
+def _add_seconds(timings, stage, t0):
+    """把 perf_counter() 自 t0 起的秒數累計到 timings[stage]（timings 為 None 時不記），回傳現在時間供下一段當起點。"""
+    now = time.perf_counter()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + now - t0
+    return now
+
+
+class PdfSession:
+    """單一 PDF 的開檔工作階段：每份文件只開一次，頁面、文字、字元框、圖元資訊皆快取。
+
+    process_pdf 的各階段（抽文字、建題號索引、圖元偵測、裁切）一律傳 session，不再各自 open。
+    文字抽取用 text_engine（預設 PDF_ENGINE；auto 逐份挑選，pdfplumber 抽完即關），text_cache_dir 給定時先查抽字快取；
+    索引/裁切用 PyMuPDF，doc 於 close() 才關。
+    """
+
+    def __init__(self, path, text_cache_dir=None, text_engine=None):
+        self.path = Path(path)
+        self.text_cache_dir = text_cache_dir
+        self.text_engine = text_engine or PDF_ENGINE
+        # 實際抽字引擎與耗時（寫入報表 text_engine）
+        self.text_stats = {}
+        # 各階段秒數與計數器（寫入報表 timings / counters，見 _stage_report）
+        self.stage_seconds = {}
+        self.counters = {"files_written": 0, "bytes_written": 0}
+        self._pages_text = None
+        self._doc = None
+        self._doc_failed = False
+        self._pages = {}
+        self._chars = {}
+        self._drawings = {}
+        self._image_info = {}
+        self._graphic_index = {}
+        self._answer_marks = {}
+        # 批次裁切：batch_pages 內的頁面整頁渲染一次，各題從整頁點陣切出（見 _crop_pixmap）
+        self.batch_render = False
+        self.batch_pages = set()
+        self.render_stats = {"page_pixmaps": 0, "sliced_crops": 0, "direct_crops": 0}
+        # 裁切參數（見 CROP_SETTINGS）；tight 開啟時另累計探測裁切前後面積（pt²）
+        self.crop_settings = dict(CROP_SETTINGS)
+        self.tight_stats = {"crops": 0, "area_before": 0.0, "area_after": 0.0}
+        self._page_pix = (None, None)
+        # 圖檔最佳化參數（見 ASSET_SETTINGS）與累計位元組
+        self.asset_settings = dict(ASSET_SETTINGS)
+        self.asset_stats = {"images": 0, "bytes_before": 0, "bytes_after": 0, "webp_bytes": 0, "over_budget": 0}
+        # 點陣品質檢查的累計（見 _crop_quality、_record_crop_quality）
+        self.quality_stats = {"images": 0, "blank_crop": 0, "edge_cut": 0, "answer_leak": 0, "seconds": 0.0}
+        # 圖檔編碼管線（見 EncodePipeline）；None 時在主執行緒逐張編碼寫檔
+        self.encode_pipeline = None
+        # 串流解析（--stream）：逐頁抽文字、逐頁切題，不組全文（見 _parse_pages_streaming）
+        self.stream_parse = False
+        self.text_failed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self.encode_pipeline is not None:
+            self.encode_pipeline.close()
+        self._page_pix = (None, None)
+        if self._doc is not None:
+            try:
+                self._doc.close()
+            except Exception:
+                pass
+        self._doc = None
+        self._pages = {}
+
+    def pages_text(self):
+        """回傳 (page_1based, text) 列表；只抽一次。"""
+        if self._pages_text is not None:
+            return self._pages_text
+        out = list(self.iter_pages_text())
+        if self.text_failed:
+            out = []
+        self._pages_text = out
+        return out
+
+    def iter_pages_text(self):
+        """逐頁產出 (page_1based, text)，不快取在 session：pdfplumber 每頁抽完即 close 釋放字元物件，PyMuPDF 頁面不放進 page() 快取。
+        text_cache_dir 有設時經 scripts/.cache 抽字快取（見 PageTextCache）。
+        抽取失敗時印出錯誤並停止，text_failed 設為 True（呼叫端比照 pages_text() 回傳空列表處理）。"""
+        if self._pages_text is not None:
+            for item in self._pages_text:
+                yield item
+            return
+        self.text_failed = False
+        t0 = time.perf_counter()
+        engine, probe = resolve_text_engine(self.path, self.text_engine, self.text_cache_dir)
+        _add_seconds(self.stage_seconds, "engine_probe", t0)
+        self.text_stats = {"engine": engine, "requested": self.text_engine}
+        if probe:
+            self.text_stats["probe"] = probe
+        if engine is None:
+            return
+        doc = None
+        if engine == "fitz":
+            doc = self.fitz_doc()
+            if doc is None:
+                self.text_failed = True
+                return
+        try:
+            for item in iter_cached_pages_text(self.path, cache_dir=self.text_cache_dir, doc=doc, engine=engine, stats=self.text_stats):
+                yield item
         except Exception as e:
-            print("  PyMuPDF 讀取失敗: {}".format(e), file=sys.stderr)
-            return []
-    return out
+            print("  {} 讀取失敗: {}".format("PyMuPDF" if engine == "fitz" else "pdfplumber", e), file=sys.stderr)
+            self.text_failed = True
+
+    def fitz_doc(self):
+        """PyMuPDF Document（只開一次）；未安裝或開檔失敗回傳 None。"""
+        if self._doc is None and not self._doc_failed:
+            if fitz is None:
+                self._doc_failed = True
+                return None
+            try:
+                self._doc = fitz.open(str(self.path))
+            except Exception as e:
+                self._doc_failed = True
+                print("  PyMuPDF 讀取失敗: {}".format(e), file=sys.stderr)
+        return self._doc
+
+    def page_count(self):
+        doc = self.fitz_doc()
+        return len(doc) if doc is not None else 0
+
+    def page(self, page_idx):
+        """快取的 fitz Page，避免重複 doc[page_idx] 解析頁面。"""
+        page = self._pages.get(page_idx)
+        if page is None:
+            page = self.fitz_doc()[page_idx]
+            self._pages[page_idx] = page
+        return page
+
+    def char_boxes(self, page_idx):
+        """依 search_for haystack 順序的字元框 [(c, bbox or None), ...]。"""
+        if page_idx not in self._chars:
+            self._chars[page_idx] = _page_search_chars(self.page(page_idx))
+        return self._chars[page_idx]
+
+    def answer_marks(self, page_idx):
+        """該頁「(1)」~「(4)」標記 (ys, marks)：marks 為依 y0 排序的 [(y0, x1, x0, y1), ...]、ys 為其 y0（二分搜尋用）；
+        由 char_boxes 掃一次，與題號索引共用同一份字元版面。"""
+        if page_idx not in self._answer_marks:
+            marks = _scan_page_answer_marks(self.char_boxes(page_idx))
+            self._answer_marks[page_idx] = ([m[0] for m in marks], marks)
+        return self._answer_marks[page_idx]
+
+    def drawings(self, page_idx):
+        if page_idx not in self._drawings:
+            try:
+                self._drawings[page_idx] = self.page(page_idx).get_drawings()
+            except Exception:
+                self._drawings[page_idx] = []
+        return self._drawings[page_idx]
+
+    def graphic_index(self, page_idx):
+        """該頁圖元索引（PageGraphicIndex），每頁只建一次。"""
+        if page_idx not in self._graphic_index:
+            self._graphic_index[page_idx] = _build_page_graphic_index(self, page_idx)
+        return self._graphic_index[page_idx]
+
+    def page_pixmap(self, page_idx, zoom):
+        """整頁點陣（只保留最近一頁，題目依頁序處理時每頁只渲染一次）。"""
+        key = (page_idx, zoom)
+        if self._page_pix[0] != key:
+            pix = self.page(page_idx).get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            self._page_pix = (key, pix)
+            self.render_stats["page_pixmaps"] += 1
+        return self._page_pix[1]
+
+    def image_info(self, page_idx):
+        if page_idx not in self._image_info:
+            try:
+                self._image_info[page_idx] = self.page(page_idx).get_image_info()
+            except Exception:
+                self._image_info[page_idx] = []
+        return self._image_info[page_idx]
+
+
+def extract_text_from_pdf(path, cache_dir=None, engine=None):
+    """回傳 (page_1based, text) 列表；cache_dir 給定時經抽字快取，engine 見 PdfSession.text_engine。"""
+    with PdfSession(path, text_cache_dir=cache_dir, text_engine=engine) as session:
+        return session.pages_text()
 
 
 # 實際 PDF 格式：題號.  (答案數字)  題幹 ①選項1②選項2③選項3④選項4 [解析：...]
@@ -170,8 +583,46 @@ CROSS_QUESTION_HEADER_KEYWORDS = (
 )
 
 
+# HEADER_FOOTER_PATTERNS 與兩條整行規則合併成一條：錨定行首者（年度 / 題號開頭的 2 位數字、「N 建築物室內裝修工程管理」）
+# 用 ^，其餘為行內任意處；對 strip 後的行 search 一次，結果與逐條比對相同（見 _strip_header_footer_legacy）
+_HEADER_FOOTER_LINE = re.compile(
+    r"^(?:\d{2}|\d+\s*建築物室內裝修工程管理)"
+    r"|建築物室內裝修工程管理\s*[甲乙]?\s*\d+-\d+\s*\(\s*序\s*\d+\s*\)"
+    r"|准考證號碼|姓名|單選題"
+    r"|序\s*\d+\s*\)?\s*$"
+)
+# 去頁首結果依文字快取：單頁 PDF 的全文與該頁文字相同，fallback 與題塊統計也會再用到同一份
+_HEADER_STRIP_CACHE = {}
+_HEADER_STRIP_CACHE_MAX = 8
+
+
 def _strip_header_footer(page_text):
-    """移除頁首/頁尾常見模式，回傳清理後文字（行為單位過濾）。"""
+    """移除頁首/頁尾常見模式，回傳清理後文字（行為單位過濾）。
+    每行只比對一次 _HEADER_FOOTER_LINE；同份文字內重複出現的行（每頁相同的頁首）只判斷一次。"""
+    if not page_text or not page_text.strip():
+        return page_text
+    hit = _HEADER_STRIP_CACHE.get(page_text)
+    if hit is not None:
+        return hit
+    search = _HEADER_FOOTER_LINE.search
+    drop = {}
+    out = []
+    for line in page_text.split("\n"):
+        skip = drop.get(line)
+        if skip is None:
+            s = line.strip()
+            skip = drop[line] = bool(s) and search(s) is not None
+        if not skip:
+            out.append(line)
+    result = "\n".join(out)
+    if len(_HEADER_STRIP_CACHE) >= _HEADER_STRIP_CACHE_MAX:
+        _HEADER_STRIP_CACHE.clear()
+    _HEADER_STRIP_CACHE[page_text] = result
+    return result
+
+
+def _strip_header_footer_legacy(page_text):
+    """舊版：每行逐條比對 HEADER_FOOTER_PATTERNS（行與 strip 後各一次）再加兩條整行規則；保留供 benchmark 與結果比對。"""
     if not page_text or not page_text.strip():
         return page_text
     lines = page_text.split("\n")
@@ -327,8 +778,9 @@ def _split_blocks_pattern_d(full_text):
     return blocks
 
 
-def _split_blocks_with_fallback(full_text):
-    """A/B/C/D 合併去重；D 為高信號。若 D 已很多（≥40）則僅用 D 避免 A/B 誤檢。"""
+def _split_blocks_with_fallback_legacy(full_text):
+    """舊版題塊切分（A/B/C/D 各跑一次 finditer，長塊內再跑 Pattern D）；僅供 bench_block_splitter.py 比對。
+    A/B/C/D 合併去重；D 為高信號。若 D 已很多（≥40）則僅用 D 避免 A/B 誤檢。"""
     a_list = _split_blocks_pattern_a(full_text)
     b_list = _split_blocks_pattern_b(full_text)
     c_list = _split_blocks_pattern_c(full_text)
@@ -415,6 +867,321 @@ def _split_blocks_with_fallback(full_text):
     return out, counts, spans
 
 
+# 單次掃描：一個 regex 走過全文，每個 1~3 位數字串開頭或「第」產生一筆候選；A/B/D 的尾巴與 C 用 lookahead 判斷，不吃字，
+# 因此同一位置可同時是 A、B、D 候選，數字後的內容（如「(3)」）仍會被掃到。各型與舊版各自 finditer 的結果相同。
+_MARKER_SCAN = re.compile(
+    r"(?<!\d)(?P<num>\d{1,3})(?!\d)"
+    r"(?=(?P<a>[\.．\、\)）]\s*(?:\([1-4]\))?\s*)?)"
+    r"(?=(?P<b>\s)?)"
+    r"(?=(?P<d>\s*[\.．]\s*[（(]\s*[1-4]\s*[)）])?)"
+    r"|第(?=\s*(?P<c>\d{1,3})\s*題)"
+)
+# kind：A/B/C/D；pos：題塊起點；end：該型 regex 比對終點（A 判斷不重疊、D 判斷是否落在塊內用）
+MarkerCandidate = namedtuple("MarkerCandidate", "kind qno pos end")
+
+
+def _scan_marker_candidates(full_text):
+    """依位置順序產出題號候選。A 依舊版 finditer 不重疊規則（起點須在上一筆 A 結尾之後）；
+    B/C/D 的比對本身不可能重疊，全部產出（B 的頁首/答案括號條件、D 的題號範圍由呼叫端判斷）。"""
+    a_end = 0
+    for m in _MARKER_SCAN.finditer(full_text):
+        num = m.group("num")
+        if num is None:
+            yield MarkerCandidate("C", m.group("c"), m.start(), m.end("c"))
+            continue
+        pos = m.start()
+        if m.group("a") is not None and pos >= a_end:
+            a_end = m.end("a")
+            yield MarkerCandidate("A", num, pos, a_end)
+        if m.group("b") is not None:
+            yield MarkerCandidate("B", num, pos, m.end("b"))
+        if m.group("d") is not None:
+            yield MarkerCandidate("D", num, pos, m.end("d"))
+
+
+def _split_blocks_single_pass(full_text):
+    """單次掃描版題塊切分，輸出與 _split_blocks_with_fallback_legacy 相同。
+    長塊（> 280 字）的二次切分直接取全文掃描到、落在該塊內的 D 候選，不再對每塊重跑 regex。"""
+    a_list = []
+    b_list = []
+    c_list = []
+    d_all = []
+    for cand in _scan_marker_candidates(full_text):
+        if cand.kind == "A":
+            a_list.append((cand.qno, cand.pos))
+        elif cand.kind == "B":
+            start = cand.pos
+            if start < 300 and cand.qno in ("80", "60", "20", "100", "2", "1") and "題" in full_text[start:start + 30]:
+                continue
+            if not _ANSWER_BRACKET_NEAR.search(full_text, start, start + 35):
+                continue
+            b_list.append((cand.qno, start))
+        elif cand.kind == "C":
+            c_list.append((cand.qno, cand.pos))
+        else:
+            d_all.append(cand)
+    if not a_list and len(full_text) > 100:
+        for m in LINE_START_QUESTION.finditer(full_text):
+            qno = (m.group(1) or "").strip()
+            if qno and qno.isdigit():
+                a_list.append((qno, m.start()))
+    d_list = [(c.qno, c.pos) for c in d_all if 1 <= int(c.qno) <= 99]
+
+    pos_to_qno = {}
+    for qno, pos in d_list:
+        pos_to_qno[pos] = qno
+    if len(d_list) < 40:
+        for lst in (a_list, b_list, c_list):
+            for qno, pos in lst:
+                if pos not in pos_to_qno:
+                    pos_to_qno[pos] = qno
+
+    # 過濾頁首誤檢：僅前 280 字內
+    def _is_header_noise(pos, qno):
+        if pos >= 280:
+            return False
+        snippet = full_text[pos:pos + 35]
+        if qno in ("80", "60", "20", "100") and ("題" in snippet or "選擇題" in snippet or "分】" in snippet):
+            return True
+        if qno == "2" and "分】" in snippet:
+            return True
+        return False
+    union_blocks = [(pos_to_qno[s], s) for s in sorted(pos_to_qno) if not _is_header_noise(s, pos_to_qno[s])]
+    # 二次切分：block 字數 > 280 時，塊內（距塊首 ≥ 5 字、整段比對落在塊內）的 D 候選也切開，不限題號範圍
+    d_positions = [c.pos for c in d_all]
+    extra_starts = []
+    for i, (qno, start) in enumerate(union_blocks):
+        end = union_blocks[i + 1][1] if i + 1 < len(union_blocks) else len(full_text)
+        if end - start <= 280:
+            continue
+        lo = bisect.bisect_left(d_positions, start + 5)
+        hi = bisect.bisect_left(d_positions, end)
+        for cand in d_all[lo:hi]:
+            if cand.end <= end and cand.pos not in pos_to_qno:
+                extra_starts.append((cand.qno, cand.pos))
+    for qno, pos in extra_starts:
+        pos_to_qno[pos] = qno
+    union_blocks = [(pos_to_qno[s], s) for s in sorted(pos_to_qno) if not _is_header_noise(s, pos_to_qno[s])]
+    out = []
+    spans = []
+    for i, (qno, start) in enumerate(union_blocks):
+        end = union_blocks[i + 1][1] if i + 1 < len(union_blocks) else len(full_text)
+        block_text = full_text[start:end].strip()
+        if len(block_text) >= 5:
+            out.append((qno, block_text))
+            spans.append((qno, start, end))
+    counts = {
+        "detected_question_count_A": len(a_list),
+        "detected_question_count_B": len(b_list),
+        "detected_question_count_C": len(c_list),
+        "detected_question_count_D": len(d_list),
+        "detected_question_count": len(out),
+        "detection_method": "union",
+    }
+    return out, counts, spans
+
+
+# 同一份文字在 parse_questions_from_text 與 debug 報表各要切一次，結果依文字快取，只切一次
+_BLOCK_SPLIT_CACHE = {}
+_BLOCK_SPLIT_CACHE_MAX = 8
+# 行程內累計：passes＝題號 regex 掃過整份文字的次數（含串流切分），chars＝掃過的字數；報表取每份 PDF 前後差值
+_BLOCK_SPLIT_STATS = {"passes": 0, "cache_hits": 0, "chars": 0}
+
+
+def _split_blocks_with_fallback(full_text):
+    """回傳 (blocks, pattern_counts, spans)：blocks 為 [(qno, block_text)]，spans 為 [(qno, start, end)]。
+    A/B/C/D 合併去重；D 為高信號。若 D 已很多（≥40）則僅用 D 避免 A/B 誤檢。同一文字只切一次。"""
+    hit = _BLOCK_SPLIT_CACHE.get(full_text)
+    if hit is None:
+        if len(_BLOCK_SPLIT_CACHE) >= _BLOCK_SPLIT_CACHE_MAX:
+            _BLOCK_SPLIT_CACHE.clear()
+        hit = _split_blocks_single_pass(full_text)
+        _BLOCK_SPLIT_CACHE[full_text] = hit
+        _BLOCK_SPLIT_STATS["passes"] += 1
+        _BLOCK_SPLIT_STATS["chars"] += len(full_text)
+    else:
+        _BLOCK_SPLIT_STATS["cache_hits"] += 1
+    out, counts, spans = hit
+    return list(out), dict(counts), list(spans)
+
+
+# 串流切分定案條件：候選之後至少還有這麼多非空白字元（A/B/D 的 lookahead 最多看 9 個非空白字元，中間空白長度不限），
+# 且距目前文字尾端至少這麼多字（B 的答案括號與頁首判斷看 35 字）；符合者再多讀幾頁結果也不會變
+_STREAM_FINAL_NON_WS = 12
+_STREAM_FINAL_TAIL = 40
+
+
+class _StreamingBlockSplitter(object):
+    """逐頁餵文字的題塊切分，結果與 _split_blocks_single_pass 對「各頁以 \\n 相接的全文」相同。
+
+    位置一律為全文位置。D 候選（題號 1~99）滿 40 後只用 D 切分，題塊在下一個題塊起點定案時即產出，
+    緩衝只留目前未結束題塊起點之後的文字；未滿 40 前還無法決定是否併用 A/B/C，整份文字留到 finish()。
+    A 在無其他 A 時的 LINE_START_QUESTION 補救必為空（行首「N.」本身就是 A 候選），串流版不做。"""
+
+    def __init__(self):
+        self.spans = []  # 全部題塊的 (qno, start, end)，只存整數供 debug 報表
+        self.counts = {"A": 0, "B": 0, "C": 0, "D": 0}
+        self._ready = []  # 已定案、尚未被 take() 取走的 (qno, block_text, start, end)
+        self._buf = ""
+        self._buf_start = 0
+        self._total = 0
+        self._pages = 0
+        self._scan_pos = 0
+        self._a_end = 0
+        self._d_only = False
+        self._pending = {"A": [], "B": [], "C": [], "D": []}  # 未決定是否只用 D 前的 (qno, pos)
+        self._d_cands = []  # 目前題塊之後的 D 候選（不限題號），二次切分用
+        self._open = None  # 目前未結束的題塊 (qno, start)
+        self._open_noise = set()  # 目前題塊內的頁首誤檢位置：不當題塊起點，也不可被二次切分撿回
+
+    def feed(self, page_text):
+        if self._pages:
+            page_text = "\n" + page_text
+        self._pages += 1
+        self._buf += page_text
+        self._total += len(page_text)
+        self._scan(self._final_limit())
+        if self._d_only:
+            keep = self._scan_pos - 1  # 留一字給 (?<!\d)
+            if self._open is not None:
+                keep = min(keep, self._open[1])
+            if keep > self._buf_start:
+                self._buf = self._buf[keep - self._buf_start:]
+                self._buf_start = keep
+
+    def finish(self):
+        self._scan(self._total)
+        _BLOCK_SPLIT_STATS["passes"] += 1
+        _BLOCK_SPLIT_STATS["chars"] += self._total
+        if not self._d_only:
+            pos_to_qno = {}
+            for qno, pos in self._pending["D"]:
+                pos_to_qno[pos] = qno
+            for kind in ("A", "B", "C"):
+                for qno, pos in self._pending[kind]:
+                    if pos not in pos_to_qno:
+                        pos_to_qno[pos] = qno
+            for pos in sorted(pos_to_qno):
+                self._add_marker(pos_to_qno[pos], pos)
+        if self._open is not None:
+            self._close_block(self._total)
+            self._open = None
+
+    def take(self):
+        """取走目前已定案的題塊。"""
+        out = self._ready
+        self._ready = []
+        return out
+
+    def pattern_counts(self):
+        return {
+            "detected_question_count_A": self.counts["A"],
+            "detected_question_count_B": self.counts["B"],
+            "detected_question_count_C": self.counts["C"],
+            "detected_question_count_D": self.counts["D"],
+            "detected_question_count": len(self.spans),
+            "detection_method": "union",
+        }
+
+    def _text(self, start, end):
+        return self._buf[start - self._buf_start:end - self._buf_start]
+
+    def _final_limit(self):
+        buf = self._buf
+        i = len(buf)
+        n = 0
+        while i > 0 and n < _STREAM_FINAL_NON_WS:
+            i -= 1
+            if not buf[i].isspace():
+                n += 1
+        if n < _STREAM_FINAL_NON_WS:
+            return self._scan_pos
+        return max(self._scan_pos, min(self._buf_start + i, self._total - _STREAM_FINAL_TAIL))
+
+    def _scan(self, limit):
+        """處理起點 < limit 的候選（同 _scan_marker_candidates 的規則），之後從 limit 接著掃。"""
+        if limit <= self._scan_pos:
+            return
+        off = self._buf_start
+        for m in _MARKER_SCAN.finditer(self._buf, self._scan_pos - off):
+            pos = m.start() + off
+            if pos >= limit:
+                break
+            num = m.group("num")
+            if num is None:
+                self._candidate("C", m.group("c"), pos, m.end("c") + off)
+                continue
+            if m.group("a") is not None and pos >= self._a_end:
+                self._a_end = m.end("a") + off
+                self._candidate("A", num, pos, self._a_end)
+            if m.group("b") is not None:
+                self._candidate("B", num, pos, m.end("b") + off)
+            if m.group("d") is not None:
+                self._candidate("D", num, pos, m.end("d") + off)
+        self._scan_pos = limit
+
+    def _candidate(self, kind, qno, pos, end):
+        if kind == "B":
+            if pos < 300 and qno in ("80", "60", "20", "100", "2", "1") and "題" in self._text(pos, pos + 30):
+                return
+            if not _ANSWER_BRACKET_NEAR.search(self._buf, pos - self._buf_start, pos - self._buf_start + 35):
+                return
+        elif kind == "D":
+            self._d_cands.append((qno, pos, end))
+            if not 1 <= int(qno) <= 99:
+                return
+        self.counts[kind] += 1
+        if self._d_only:
+            if kind == "D":
+                self._add_marker(qno, pos)
+            return
+        self._pending[kind].append((qno, pos))
+        if kind == "D" and self.counts["D"] >= 40:
+            self._d_only = True
+            markers = self._pending["D"]
+            self._pending = None
+            for d_qno, d_pos in markers:
+                self._add_marker(d_qno, d_pos)
+
+    def _is_header_noise(self, pos, qno):
+        if pos >= 280:
+            return False
+        snippet = self._text(pos, pos + 35)
+        if qno in ("80", "60", "20", "100") and ("題" in snippet or "選擇題" in snippet or "分】" in snippet):
+            return True
+        if qno == "2" and "分】" in snippet:
+            return True
+        return False
+
+    def _add_marker(self, qno, pos):
+        """依位置順序加入一個題號標記；非頁首誤檢者結束上一題塊、開始新題塊。"""
+        if self._is_header_noise(pos, qno):
+            if self._open is not None:
+                self._open_noise.add(pos)
+            return
+        if self._open is not None:
+            self._close_block(pos)
+        self._open = (qno, pos)
+        self._open_noise = set()
+        self._d_cands = [c for c in self._d_cands if c[1] > pos]
+
+    def _close_block(self, end):
+        qno, start = self._open
+        starts = [(qno, start)]
+        if end - start > 280:
+            for c_qno, c_pos, c_end in self._d_cands:
+                if c_pos >= end:
+                    break
+                if c_pos >= start + 5 and c_end <= end and c_pos not in self._open_noise and not self._is_header_noise(c_pos, c_qno):
+                    starts.append((c_qno, c_pos))
+        for i, (b_qno, b_start) in enumerate(starts):
+            b_end = starts[i + 1][1] if i + 1 < len(starts) else end
+            block_text = self._text(b_start, b_end).strip()
+            if len(block_text) >= 5:
+                self._ready.append((b_qno, block_text, b_start, b_end))
+                self.spans.append((b_qno, b_start, b_end))
+
+
 def _split_blocks_by_line_start_question(full_text):
     """【必修1】用題號邊界建立題塊；含 fallback 模式 B/C，與 summary 一致。"""
     blocks, _, _ = _split_blocks_with_fallback(full_text)
@@ -479,97 +1246,293 @@ def _split_options_numbered(block):
     return None, None
 
 
-def parse_questions_from_text(full_text, slug, page_no=None, drop_reasons=None):
-    """【必修1】切分用 LINE_START_QUESTION；【必修2】選項支援 ①②③④、A/B/C/D、(1)(2)(3)(4)。選項失敗時保留題目並用 placeholder。"""
+# 選項切分的嘗試順序（_parse_question_block）；numbered 為最後手段，一律保留
+OPTION_STYLES = ("circled", "abcd", "numbered")
+# 版面輪廓取樣頁數：由前幾頁判斷選項樣式與有無解析
+LAYOUT_PROFILE_PAGES = 3
+# 取樣題塊中同一樣式佔比達此值才視為單一樣式，否則為 mixed
+LAYOUT_PROFILE_MIN_SHARE = 0.8
+
+
+def _block_option_style(block):
+    """依 _parse_question_block 的順序試切選項，回傳成功的樣式（OPTION_STYLES 之一）或 None。"""
+    if "①" in block or "②" in block or "③" in block or "④" in block:
+        if _split_options_circled(block)[1] is not None:
+            return "circled"
+    if _split_options_abcd(block)[1] is not None:
+        return "abcd"
+    if _split_options_numbered(block)[1] is not None:
+        return "numbered"
+    return None
+
+
+def detect_layout_profile(pages_text):
+    """由前 LAYOUT_PROFILE_PAGES 頁判斷版面輪廓：選項樣式、有無解析。
+    只是取樣結果，實際套用前由 _validate_layout_profile 對全文驗證。題號切分本來就單次掃描同時判斷 A/B/C/D，不在輪廓內。"""
+    sample = "\n".join(t for _, t in pages_text[:LAYOUT_PROFILE_PAGES])
+    blocks = _split_blocks_single_pass(sample)[0]
+    n = len(blocks)
+    styles = {}
+    explained = 0
+    for _, block in blocks:
+        style = _block_option_style(block) or "none"
+        styles[style] = styles.get(style, 0) + 1
+        if EXPLANATION_START.search(block):
+            explained += 1
+    option_style = None
+    if styles:
+        top, top_n = max(styles.items(), key=lambda kv: kv[1])
+        option_style = top if top != "none" and top_n >= n * LAYOUT_PROFILE_MIN_SHARE else "mixed"
+    return {
+        "sample_pages": min(len(pages_text), LAYOUT_PROFILE_PAGES),
+        "sample_blocks": n,
+        "option_style": option_style,
+        "option_styles_sampled": styles,
+        "explanations": explained > 0,
+        "validated": None,
+        "fast_path": None,
+    }
+
+
+def _validate_layout_profile(layout, full_text):
+    """以全文驗證版面輪廓，回傳 (option_styles, explanations) 供 _parse_question_block 使用，並記入 layout。
+    只有能證明整份文字都不會成立的步驟才略過：其他選項樣式的標記（①~④、行首 A./A、/A)）全文皆無，
+    且取樣無解析時全文也沒有「解析」；任一不符即驗證失敗，走完整的選項切分順序，結果與不套用輪廓相同。"""
+    style = layout.get("option_style")
+    present = {"circled": OPTION_MARK.search(full_text) is not None, "abcd": OPTION_ABCD.search(full_text) is not None}
+    validated = style in OPTION_STYLES and not any(v for k, v in present.items() if k != style)
+    if validated and not layout.get("explanations") and "解析" in full_text:
+        validated = False
+    if validated:
+        option_styles = tuple(k for k in OPTION_STYLES if k == style or k == "numbered")
+        explanations = bool(layout.get("explanations"))
+    else:
+        option_styles = OPTION_STYLES
+        explanations = True
+    layout["validated"] = validated
+    layout["fast_path"] = {"option_styles": list(option_styles), "explanations": explanations} if validated else None
+    return option_styles, explanations
+
+
+def parse_questions_from_text(full_text, slug, page_no=None, drop_reasons=None, timings=None, layout=None):
+    """【必修1】切分用 LINE_START_QUESTION；【必修2】選項支援 ①②③④、A/B/C/D、(1)(2)(3)(4)。選項失敗時保留題目並用 placeholder。
+    timings（dict）有傳入時累計 block_split / block_parse 秒數；layout（detect_layout_profile 的結果）有傳入時先對全文驗證，
+    通過則每題只試輪廓對應的選項樣式。"""
     if drop_reasons is None:
         drop_reasons = {}
     questions = []
     parse_failed = []
     cross_question_suspects = []
+    option_styles, explanations = OPTION_STYLES, True
+    t0 = time.perf_counter()
+    if layout is not None:
+        option_styles, explanations = _validate_layout_profile(layout, full_text)
+        t0 = _add_seconds(timings, "layout_profile", t0)
     blocks = _split_blocks_by_line_start_question(full_text)
+    t0 = _add_seconds(timings, "block_split", t0)
     for q_num, block in blocks:
-        if not q_num.isdigit():
-            drop_reasons["qno_not_digit"] = drop_reasons.get("qno_not_digit", 0) + 1
-            continue
-        if len(block) < 5:
-            drop_reasons["block_too_short"] = drop_reasons.get("block_too_short", 0) + 1
-            continue
-        answer_idx = _extract_answer_from_block(block)
-        if answer_idx is None:
-            answer_idx = 0
-        if answer_idx < 0 or answer_idx > 3:
-            answer_idx = 0
-
-        question_text = None
-        ordered = None
-        if "①" in block or "②" in block or "③" in block or "④" in block:
-            question_text, ordered = _split_options_circled(block)
-        if ordered is None:
-            question_text, ordered = _split_options_abcd(block)
-        if ordered is None:
-            question_text, ordered = _split_options_numbered(block)
-        if ordered is None or len(ordered) != 4 or not all(ordered):
-            question_text = (block[:2000].strip() or "（題幹略）")
-            ordered = ["(選項未辨識)", "(選項未辨識)", "(選項未辨識)", "(選項未辨識)"]
-            drop_reasons["options_placeholder"] = drop_reasons.get("options_placeholder", 0) + 1
-        else:
-            ordered = [o or "(選項未辨識)" for o in ordered]
+        q = _parse_question_block(q_num, block, slug, page_no, drop_reasons, cross_question_suspects, option_styles, explanations)
+        if q is not None:
+            questions.append(q)
+    _add_seconds(timings, "block_parse", t0)
+    return questions, parse_failed, cross_question_suspects
 
-        question_text = question_text or "（題幹解析略）"
-        # 題幹顯示時移除行首「題號.(答案)」，避免答案黏在題目開頭（支援 .．、））
-        question_text = re.sub(r"^\s*\d+[\.．\、\)）]?\s*\([1-4]\)\s*", "", question_text).strip() or question_text
 
-        # A) 跨題尾巴截斷：題幹與選項尾端若出現下一題題號或頁首科目詞則截斷
-        cross_suspects_here = []
-        q_trimmed, snip = _trim_tail_at_next_question_or_header(question_text)
+def _parse_question_block(q_num, block, slug, page_no, drop_reasons, cross_question_suspects,
+                          option_styles=OPTION_STYLES, explanations=True):
+    """單一題塊 → 題目 dict（無法成題回傳 None 並記入 drop_reasons）；跨題尾巴疑慮附加到 cross_question_suspects。
+    option_styles / explanations 為已驗證的版面輪廓快速路徑（見 _validate_layout_profile），預設全部嘗試。"""
+    if not q_num.isdigit():
+        drop_reasons["qno_not_digit"] = drop_reasons.get("qno_not_digit", 0) + 1
+        return None
+    if len(block) < 5:
+        drop_reasons["block_too_short"] = drop_reasons.get("block_too_short", 0) + 1
+        return None
+    answer_idx = _extract_answer_from_block(block)
+    if answer_idx is None:
+        answer_idx = 0
+    if answer_idx < 0 or answer_idx > 3:
+        answer_idx = 0
+
+    question_text = None
+    ordered = None
+    if "circled" in option_styles and ("①" in block or "②" in block or "③" in block or "④" in block):
+        question_text, ordered = _split_options_circled(block)
+    if ordered is None and "abcd" in option_styles:
+        question_text, ordered = _split_options_abcd(block)
+    if ordered is None:
+        question_text, ordered = _split_options_numbered(block)
+    if ordered is None or len(ordered) != 4 or not all(ordered):
+        question_text = (block[:2000].strip() or "（題幹略）")
+        ordered = ["(選項未辨識)", "(選項未辨識)", "(選項未辨識)", "(選項未辨識)"]
+        drop_reasons["options_placeholder"] = drop_reasons.get("options_placeholder", 0) + 1
+    else:
+        ordered = [o or "(選項未辨識)" for o in ordered]
+
+    question_text = question_text or "（題幹解析略）"
+    # 題幹顯示時移除行首「題號.(答案)」，避免答案黏在題目開頭（支援 .．、））
+    question_text = re.sub(r"^\s*\d+[\.．\、\)）]?\s*\([1-4]\)\s*", "", question_text).strip() or question_text
+
+    # A) 跨題尾巴截斷：題幹與選項尾端若出現下一題題號或頁首科目詞則截斷
+    cross_suspects_here = []
+    q_trimmed, snip = _trim_tail_at_next_question_or_header(question_text)
+    if snip:
+        cross_suspects_here.append({"slug": slug, "qno": q_num, "reason": "next_question_or_header_in_stem", "snippet": snip[:80]})
+    question_text = q_trimmed or question_text
+    for i, opt in enumerate(ordered):
+        opt_trimmed, snip = _trim_tail_at_next_question_or_header(opt)
         if snip:
-            cross_suspects_here.append({"slug": slug, "qno": q_num, "reason": "next_question_or_header_in_stem", "snippet": snip[:80]})
-        question_text = q_trimmed or question_text
-        for i, opt in enumerate(ordered):
-            opt_trimmed, snip = _trim_tail_at_next_question_or_header(opt)
-            if snip:
-                cross_suspects_here.append({"slug": slug, "qno": q_num, "reason": "next_question_or_header_in_option", "snippet": snip[:80]})
-            ordered[i] = opt_trimmed or opt
-
-        explanation = _extract_explanation(block)
-        if page_no is not None:
-            source = "{}#p{}#Q{}".format(slug, page_no, q_num)
-            source_display = "{} 第{}頁 第{}題".format(slug_to_label(slug), page_no, q_num)
-        else:
-            source = "{}#Q{}".format(slug, q_num)
-            source_display = "{} 第{}題".format(slug_to_label(slug), q_num)
-
-        questions.append({
-            "id": q_num,
-            "subject": "室內裝修工程管理",
-            "year": int(q_num) if q_num.isdigit() and len(q_num) <= 4 else None,
-            "chapter": "ALL",
-            "type": "single",
-            "question_text": question_text,
-            "options": ordered,
-            "answer_index": answer_idx,
-            "explanation": explanation or "",
-            "source": source,
-            "source_display": source_display,
-        })
-        for s in cross_suspects_here:
-            cross_question_suspects.append({"dataset_id": slug, "qno": q_num, "reason": s["reason"], "snippet": s["snippet"]})
-    return questions, parse_failed, cross_question_suspects
+            cross_suspects_here.append({"slug": slug, "qno": q_num, "reason": "next_question_or_header_in_option", "snippet": snip[:80]})
+        ordered[i] = opt_trimmed or opt
+
+    explanation = _extract_explanation(block) if explanations else ""
+    if page_no is not None:
+        source = "{}#p{}#Q{}".format(slug, page_no, q_num)
+        source_display = "{} 第{}頁 第{}題".format(slug_to_label(slug), page_no, q_num)
+    else:
+        source = "{}#Q{}".format(slug, q_num)
+        source_display = "{} 第{}題".format(slug_to_label(slug), q_num)
+
+    question = {
+        "id": q_num,
+        "subject": "室內裝修工程管理",
+        "year": int(q_num) if q_num.isdigit() and len(q_num) <= 4 else None,
+        "chapter": "ALL",
+        "type": "single",
+        "question_text": question_text,
+        "options": ordered,
+        "answer_index": answer_idx,
+        "explanation": explanation or "",
+        "source": source,
+        "source_display": source_display,
+    }
+    for s in cross_suspects_here:
+        cross_question_suspects.append({"dataset_id": slug, "qno": q_num, "reason": s["reason"], "snippet": s["snippet"]})
+    return question
 
 
 # v1.2.2: 題號索引（【必修1】不依答案定位，用「題號. 」建立邊界）
-def build_question_index(pdf_path, max_qno=600):
-    """掃描 PDF 每頁，用「題號. 」建立 (page_0based, qno) -> (y0, y1, rect_qno)。"""
+# search_for 預設 flags；單次掃描用同一組 flags 建 textpage，字元序與座標才會一致
+_SEARCH_TEXT_FLAGS = (
+    fitz.TEXT_DEHYPHENATE | fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP
+) if fitz is not None else 0
+# MuPDF 搜尋時視為空白的字元（canon 後皆為 ' '）
+_SEARCH_WHITESPACE = (" ", "\t", "\n", "\r", "\u00a0", "\u2028", "\u2029")
+
+
+def _page_search_chars(page):
+    """依 search_for 的 haystack 順序攤平頁面字元：[(c, bbox or None), ...]；行尾補 \\n（無 bbox）。"""
+    tp = page.get_textpage(flags=_SEARCH_TEXT_FLAGS)
+    raw = tp.extractRAWDICT()
+    chars = []
+    for block in raw.get("blocks", []):
+        if block.get("type", 0) != 0:
+            continue
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                for ch in span.get("chars", []):
+                    chars.append((ch.get("c", ""), ch.get("bbox")))
+            chars.append(("\n", None))
+        chars.append(("\n", None))
+    return chars
+
+
+def _scan_page_question_markers(chars, max_qno=600):
+    """單次線性掃描一頁字元（_page_search_chars 結果），回傳 [(qno, rect), ...]，每個 qno 取頁內第一次出現（等同 search_for("N. ")[0]）。
+    search_for 為子字串比對，「112. 」同時命中 112、12、2，故對數字串每個不以 0 開頭的後綴都記一次。"""
+    first_hit = {}
+    n = len(chars)
+    i = 0
+    while i < n:
+        if not ("0" <= chars[i][0] <= "9"):
+            i += 1
+            continue
+        j = i
+        while j < n and "0" <= chars[j][0] <= "9":
+            j += 1
+        # 數字串 chars[i:j] 後須緊接「.」與至少一個空白
+        if j + 1 < n and chars[j][0] == "." and chars[j + 1][0] in _SEARCH_WHITESPACE:
+            digits = "".join(c for c, _ in chars[i:j])
+            for k in range(i, j):
+                if chars[k][0] == "0":
+                    continue
+                qno = int(digits[k - i:])
+                if qno > max_qno or qno in first_hit:
+                    continue
+                boxes = [b for _, b in chars[k:j + 2] if b]
+                rect = fitz.Rect(boxes[0])
+                for b in boxes[1:]:
+                    rect |= fitz.Rect(b)
+                first_hit[qno] = rect
+        i = j
+    return list(first_hit.items())
+
+
+def _scan_page_answer_marks(chars):
+    """一頁字元內所有「(1)」~「(4)」（等同對四個字串各跑一次 search_for），回傳依 y0 排序的 [(y0, x1, x0, y1), ...]
+    （x1 供裁切左緣、完整外框供點陣品質檢查的露答案判斷）。"""
+    marks = []
+    for i in range(len(chars) - 2):
+        if chars[i][0] != "(" or chars[i + 2][0] != ")" or chars[i + 1][0] not in ("1", "2", "3", "4"):
+            continue
+        boxes = [b for _, b in chars[i:i + 3] if b]
+        rect = fitz.Rect(boxes[0])
+        for b in boxes[1:]:
+            rect |= fitz.Rect(b)
+        marks.append((rect.y0, rect.x1, rect.x0, rect.y1))
+    marks.sort()
+    return marks
+
+
+class QuestionIndex(dict):
+    """題號索引 (page_0based, qno) -> (y0, y1, rect_qno)，另維護反查 by_qno：qno -> [(page_0based, span), ...]（依頁序）
+    與 by_page：page_0based -> [rect_qno, ...]（該頁各題題號框，點陣品質檢查找答案標記用）。
+    裁切時由題號直接取頁面，不必逐頁試 (p, qno) in index。"""
+
+    def __init__(self):
+        dict.__init__(self)
+        self.by_qno = {}
+        self.by_page = {}
+
+    def add(self, page_idx, qno, span):
+        """依頁序加入（建索引時頁面由小到大），by_qno 各清單因此已依頁排序。"""
+        self[(page_idx, qno)] = span
+        self.by_qno.setdefault(qno, []).append((page_idx, span))
+        self.by_page.setdefault(page_idx, []).append(span[2])
+
+    def first_page(self, qno):
+        """題號第一次出現的 (page_0based, span)，沒有則 None（同舊版由第 0 頁往後找第一個命中）。"""
+        hits = self.by_qno.get(qno)
+        return hits[0] if hits else None
+
+
+def build_question_index(session, max_qno=600):
+    """掃描 PDF 每頁，用「題號. 」建立 QuestionIndex：(page_0based, qno) -> (y0, y1, rect_qno)。
+    每頁只讀一次字元版面並線性找出所有題號標記，結果與 build_question_index_legacy 相同。"""
+    index = QuestionIndex()
+    if session.fitz_doc() is None:
+        return index
     try:
-        import fitz
-    except ImportError:
-        return {}
-    path = Path(pdf_path)
-    index = {}
+        for page_idx in range(session.page_count()):
+            page = session.page(page_idx)
+            entries = _scan_page_question_markers(session.char_boxes(page_idx), max_qno)
+            entries.sort(key=lambda x: (x[1].y0, x[1].x0, x[0]))
+            for i, (qno, rect) in enumerate(entries):
+                y_end = entries[i + 1][1].y0 if i + 1 < len(entries) else page.rect.height
+                index.add(page_idx, qno, (rect.y0, y_end, rect))
+    except Exception:
+        pass
+    return index
+
+
+def build_question_index_legacy(session, max_qno=600):
+    """舊版：每頁對 1..max_qno 各呼叫一次 search_for（每頁 600 次全文搜尋）；保留供 benchmark 與結果比對。"""
+    index = QuestionIndex()
+    if session.fitz_doc() is None:
+        return index
     try:
-        doc = fitz.open(str(path))
-        for page_idx in range(len(doc)):
-            page = doc[page_idx]
+        for page_idx in range(session.page_count()):
+            page = session.page(page_idx)
             entries = []
             for qno in range(1, max_qno + 1):
                 needle = str(qno) + ". "
@@ -581,18 +1544,28 @@ def build_question_index(pdf_path, max_qno=600):
             entries.sort(key=lambda x: (x[1].y0, x[1].x0))
             for i, (qno, rect) in enumerate(entries):
                 y_end = entries[i + 1][1].y0 if i + 1 < len(entries) else page.rect.height
-                index[(page_idx, qno)] = (rect.y0, y_end, rect)
-        doc.close()
+                index.add(page_idx, qno, (rect.y0, y_end, rect))
     except Exception:
         pass
     return index
 
 
-def _x0_after_answer(page, rect_qno, page_width, default_ratio=0.14):
-    """裁切左緣：同一行找 (1)(2)(3)(4) 任一 bbox，x0=其右側；找不到則 x0=page_width*default_ratio。"""
-    try:
-        import fitz
-    except ImportError:
+def _x0_after_answer(session, page_idx, rect_qno, page_width, default_ratio=0.14):
+    """裁切左緣：同一行（y0 相差 < 25）找 (1)(2)(3)(4) 任一 bbox，x0=其右側；找不到則 x0=page_width*default_ratio。
+    答案標記取自 session.answer_marks（每頁掃一次），以二分搜尋找出 y0 附近的候選，結果與 _x0_after_answer_legacy 相同。"""
+    ys, marks = session.answer_marks(page_idx)
+    # 範圍多放 1pt 再逐筆用原條件判斷，避免浮點邊界差異
+    lo = bisect.bisect_left(ys, rect_qno.y0 - 26)
+    hi = bisect.bisect_right(ys, rect_qno.y0 + 26)
+    x1_candidates = [m[1] for m in marks[lo:hi] if abs(m[0] - rect_qno.y0) < 25]
+    if x1_candidates:
+        return min(page_width, max(x1_candidates) + 4)
+    return page_width * default_ratio
+
+
+def _x0_after_answer_legacy(page, rect_qno, page_width, default_ratio=0.14):
+    """舊版：每題對 (1)~(4) 各跑一次整頁 search_for；保留供 bench_question_index.py 比對。"""
+    if fitz is None:
         return page_width * default_ratio
     x1_candidates = []
     for ans in ["(1)", "(2)", "(3)", "(4)"]:
@@ -605,99 +1578,866 @@ def _x0_after_answer(page, rect_qno, page_width, default_ratio=0.14):
     return page_width * default_ratio
 
 
-def _rect_has_graphic(page, clip_rect):
-    """題區間 rect 內是否含圖元（images 或 drawings），有才需產圖。"""
-    try:
-        import fitz
-    except ImportError:
+class PageGraphicIndex:
+    """單頁圖元（images + drawings）的 y 區間格網索引：每頁建一次，之後每個 clip 只檢查重疊格內的圖元。
+
+    相交判斷與 fitz.Rect.intersects 相同（空矩形、無限大矩形一律不相交）。
+    """
+
+    BUCKET_HEIGHT = 24.0  # pt；約兩行文字高
+
+    def __init__(self, rects, page_height):
+        # 零寬/零高（如水平線）不算「相交」，但裁切邊緣檢查仍需要，故全部保留並標記
+        self.rects = []
+        self.empty = []
+        for r in rects:
+            x0, y0, x1, y1 = float(r[0]), float(r[1]), float(r[2]), float(r[3])
+            if _is_infinite_rect(x0, y0, x1, y1) or x0 > x1 or y0 > y1:
+                continue
+            self.rects.append((x0, y0, x1, y1))
+            self.empty.append(x0 >= x1 or y0 >= y1)
+        self.n_buckets = max(1, int(page_height // self.BUCKET_HEIGHT) + 1)
+        self.buckets = [[] for _ in range(self.n_buckets)]
+        for i, (_, y0, _, y1) in enumerate(self.rects):
+            b0, b1 = self._bucket_range(y0, y1)
+            for b in range(b0, b1 + 1):
+                self.buckets[b].append(i)
+
+    def _bucket_range(self, y0, y1):
+        # 超出頁面的部分併入首/末格，任何 y 區間重疊的 rect 與 clip 必落在同一格
+        last = self.n_buckets - 1
+        b0 = min(last, max(0, int(y0 // self.BUCKET_HEIGHT)))
+        b1 = min(last, max(0, int(y1 // self.BUCKET_HEIGHT)))
+        return b0, b1
+
+    def _candidates(self, y0, y1):
+        b0, b1 = self._bucket_range(y0, y1)
+        seen = set()
+        for b in range(b0, b1 + 1):
+            for i in self.buckets[b]:
+                if i not in seen:
+                    seen.add(i)
+                    yield i
+
+    def _hits(self, clip):
+        cx0, cy0, cx1, cy1 = float(clip[0]), float(clip[1]), float(clip[2]), float(clip[3])
+        if cx0 >= cx1 or cy0 >= cy1 or _is_infinite_rect(cx0, cy0, cx1, cy1):
+            return
+        for i in self._candidates(cy0, cy1):
+            if self.empty[i]:
+                continue
+            x0, y0, x1, y1 = self.rects[i]
+            if x0 < cx1 and cx0 < x1 and y0 < cy1 and cy0 < y1:
+                yield self.rects[i]
+
+    def crosses_edge(self, clip, margin=2.0):
+        """是否有圖元（含零寬線段）跨越 clip 邊緣 ±margin pt 的帶狀區。
+        MuPDF 對跨越 clip 邊緣的路徑/影像，clip 渲染與整頁渲染的反鋸齒不同；完全在內或在外則逐像素相同。"""
+        cx0, cy0, cx1, cy1 = float(clip[0]), float(clip[1]), float(clip[2]), float(clip[3])
+        for i in self._candidates(cy0 - margin, cy1 + margin):
+            x0, y0, x1, y1 = self.rects[i]
+            if x1 < cx0 - margin or x0 > cx1 + margin or y1 < cy0 - margin or y0 > cy1 + margin:
+                continue
+            if x0 >= cx0 + margin and y0 >= cy0 + margin and x1 <= cx1 - margin and y1 <= cy1 - margin:
+                continue
+            return True
         return False
-    # 與 clip 相交的 image bbox
+
+    def crossed_edges(self, clip, margin=2.0):
+        """與 crosses_edge 同一判斷，但回傳被圖元跨越的邊（"top" / "bottom" / "left" / "right"）集合，
+        供 _crop_quality_settings 判斷預設裁切的下緣 / 右緣是否切過圖。"""
+        cx0, cy0, cx1, cy1 = float(clip[0]), float(clip[1]), float(clip[2]), float(clip[3])
+        sides = set()
+        for i in self._candidates(cy0 - margin, cy1 + margin):
+            x0, y0, x1, y1 = self.rects[i]
+            if x1 < cx0 - margin or x0 > cx1 + margin or y1 < cy0 - margin or y0 > cy1 + margin:
+                continue
+            if y0 < cy0 + margin:
+                sides.add("top")
+            if y1 > cy1 - margin:
+                sides.add("bottom")
+            if x0 < cx0 + margin:
+                sides.add("left")
+            if x1 > cx1 - margin:
+                sides.add("right")
+        return sides
+
+    def has_graphic(self, clip):
+        for _ in self._hits(clip):
+            return True
+        return False
+
+    def stats(self, clip):
+        """clip 內圖元統計：graphic_count、graphic_bbox（與 clip 交集的聯集外框）、graphic_bbox_area（該外框面積）、
+        graphic_bbox_coverage（外框占 clip 面積比）。量的是外框而非圖元實際覆蓋的面積：一條斜線也可能接近 1。"""
+        cx0, cy0, cx1, cy1 = float(clip[0]), float(clip[1]), float(clip[2]), float(clip[3])
+        count = 0
+        bbox = None
+        for x0, y0, x1, y1 in self._hits(clip):
+            count += 1
+            ix0, iy0, ix1, iy1 = max(x0, cx0), max(y0, cy0), min(x1, cx1), min(y1, cy1)
+            if bbox is None:
+                bbox = [ix0, iy0, ix1, iy1]
+            else:
+                bbox = [min(bbox[0], ix0), min(bbox[1], iy0), max(bbox[2], ix1), max(bbox[3], iy1)]
+        clip_area = max(0.0, cx1 - cx0) * max(0.0, cy1 - cy0)
+        area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1]) if bbox else 0.0
+        return {
+            "graphic_count": count,
+            "graphic_bbox": [round(v, 1) for v in bbox] if bbox else None,
+            "graphic_bbox_area": round(area, 1),
+            "graphic_bbox_coverage": round(area / clip_area, 3) if clip_area > 0 else 0.0,
+        }
+
+
+_FZ_MIN_INF = -2147483648
+_FZ_MAX_INF = 2147483520
+
+
+def _is_infinite_rect(x0, y0, x1, y1):
+    return x0 == y0 == _FZ_MIN_INF and x1 == y1 == _FZ_MAX_INF
+
+
+def _build_page_graphic_index(session, page_idx):
+    """由 session 快取的 image info 與 drawings 建該頁 PageGraphicIndex。"""
+    rects = []
+    for info in session.image_info(page_idx):
+        bbox = info.get("bbox")
+        if bbox and len(bbox) >= 4:
+            rects.append(tuple(bbox[:4]))
+    for path in session.drawings(page_idx):
+        r = path.get("rect")
+        if r is None:
+            continue
+        if isinstance(r, (list, tuple)) and len(r) < 4:
+            continue
+        rects.append((r[0], r[1], r[2], r[3]))
+    return PageGraphicIndex(rects, session.page(page_idx).rect.height)
+
+
+def _rect_has_graphic(session, page_idx, clip_rect):
+    """題區間 rect 內是否含圖元（images 或 drawings），有才需產圖；查 session 的每頁圖元索引。"""
     try:
-        for info in page.get_image_info():
-            bbox = info.get("bbox")
-            if bbox and len(bbox) >= 4:
-                r = fitz.Rect(bbox[0], bbox[1], bbox[2], bbox[3])
-                if r.intersects(clip_rect):
-                    return True
+        return session.graphic_index(page_idx).has_graphic(clip_rect)
     except Exception:
-        pass
+        return False
+
+
+def _tight_clip(session, page_idx, clip, y_limit, settings):
+    """--tight-crop：以 tight_probe_zoom 的灰階點陣探測本題完整範圍：clip 的上緣與左右，下緣延伸到 y_limit
+    （下一題題號；本題是頁面最後一題時為頁底），不受 clip 固定的 pad_bottom 限制，題目較長時不會截在半行。
+    由列 / 欄投影找出墨水範圍，外擴 tight_margin 後回傳 fitz.Rect（左緣不小於 clip.x0，維持防露答案；下緣可超出 clip）。
+    下緣截在下一題時，貼著探測下緣、與上方隔著空白的墨水段是下一題題號行的上半（字形墨水略高於文字框），不算；
+    本題是頁面最後一題時，footer_zone 內、與上方內容隔著 footer_gap 以上空白帶的墨水（頁碼、頁尾）也不算。
+    探測不到墨水或未安裝 Pillow 時回傳 None（沿用 clip）。"""
     try:
-        for path in page.get_drawings():
-            r = path.get("rect")
-            if r is None:
-                continue
-            if hasattr(r, "intersects"):
-                if r.intersects(clip_rect):
-                    return True
-            elif isinstance(r, (list, tuple)) and len(r) >= 4:
-                rect = fitz.Rect(r[0], r[1], r[2], r[3])
-                if rect.intersects(clip_rect):
-                    return True
-    except Exception:
-        pass
-    return False
+        from PIL import Image
+    except ImportError:
+        _warn_no_pillow()
+        return None
+    page_h = session.page(page_idx).rect.height
+    probe = fitz.Rect(clip.x0, clip.y0, clip.x1, min(page_h, y_limit))
+    if probe.is_empty:
+        return None
+    zoom = settings["tight_probe_zoom"]
+    pix = session.page(page_idx).get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=probe, colorspace=fitz.csGRAY, alpha=False)
+    if not pix.width or not pix.height:
+        return None
+    white = settings["tight_probe_white"]
+    ink = Image.frombytes("L", (pix.width, pix.height), pix.samples).point([255 if v < white else 0 for v in range(256)])
+    # 列投影：寬度每 block 像素併一格（見 CROP_QUALITY["projection_block"]），任一格非 0 即該列有墨水
+    block = CROP_QUALITY["projection_block"]
+    cols_w = (pix.width + block - 1) // block
+    rows_raw = ink.reduce((block, 1)).tobytes()
+    rows = [i // cols_w for i in range(0, len(rows_raw), cols_w) if any(rows_raw[i:i + cols_w])]
+    if not rows:
+        return None
+    # 下緣截在下一題時，剔除貼著探測下緣的墨水段（下一題題號行），並記下它的起始列
+    cut_row = pix.height
+    if probe.y1 < page_h and rows[-1] == pix.height - 1:
+        start = len(rows) - 1
+        while start > 0 and rows[start] - rows[start - 1] == 1:
+            start -= 1
+        if start > 0:
+            cut_row = rows[start]
+            rows = rows[:start]
+    footer_y = page_h * settings["footer_zone"]
+    gap_px = settings["footer_gap"] * zoom
+    # 由下往上剔除頁尾帶內、上方隔著大空白的墨水列
+    while len(rows) > 1:
+        start = len(rows) - 1
+        while start > 0 and rows[start] - rows[start - 1] <= gap_px:
+            start -= 1
+        if start == 0 or probe.y0 + rows[start] / zoom < footer_y:
+            break
+        rows = rows[:start]
+    top, bottom = rows[0], rows[-1] + 1
+    # 欄投影只看保留下來的列
+    band = ink.crop((0, top, pix.width, bottom))
+    bbox = band.getbbox()
+    if not bbox:
+        return None
+    m = settings["tight_margin"]
+    # 下緣外擴不越過與下一題題號行之間空白帶的中線
+    y1 = probe.y0 + min(bottom / zoom + m, (bottom + cut_row) / 2.0 / zoom)
+    tight = fitz.Rect(max(clip.x0, probe.x0 + bbox[0] / zoom - m), max(clip.y0, probe.y0 + top / zoom - m),
+                      min(clip.x1, probe.x0 + bbox[2] / zoom + m), min(probe.y1, y1))
+    return tight if not tight.is_empty else None
+
+
+def _crop_pixmap(session, page_idx, clip, zoom):
+    """題區點陣。批次模式下該頁有多題要裁時，從整頁點陣切出（MuPDF 原生逐列複製，不再逐題光柵化）；
+    有圖元跨越 clip 邊緣時改回直接 clip 渲染，確保與原本裁切逐像素相同。"""
+    mat = fitz.Matrix(zoom, zoom)
+    if (session.batch_render and page_idx in session.batch_pages
+            and not session.graphic_index(page_idx).crosses_edge(clip)):
+        full = session.page_pixmap(page_idx, zoom)
+        irect = (clip * mat).irect & full.irect
+        if not irect.is_empty:
+            pix = fitz.Pixmap(full.colorspace, irect, False)
+            pix.copy(full, irect)
+            session.render_stats["sliced_crops"] += 1
+            return pix
+    session.render_stats["direct_crops"] += 1
+    return session.page(page_idx).get_pixmap(matrix=mat, clip=clip, alpha=False)
+
+
+# 裁切參數：渲染倍率、題區上/下留白（pt）、左緣比例；記錄於 import_cache.json，變更即視為需重新產圖
+CROP_SETTINGS = {
+    "zoom": 2.0,
+    "pad_top": 10,
+    "pad_bottom": 80,
+    "min_height": 150,
+    "x0_ratio": 0.14,
+    "x0_ratio_forced": 0.08,
+    # --tight-crop：先低解析探測題區，依墨水投影只渲染實際內容框（見 _tight_clip）
+    "tight": False,
+    "tight_probe_zoom": 0.5,
+    "tight_probe_white": 250,  # 探測點陣亮度 < 此值即算墨水（低解析下細線反鋸齒後很淡，門檻比 white_point 寬）
+    "tight_margin": 6,         # 內容框外擴（pt）
+    "footer_zone": 0.92,       # 頁面下方此比例以下、與題目隔著空白帶的墨水視為頁尾（頁碼），不納入內容框
+    "footer_gap": 24,          # 上述空白帶的最小高度（pt）
+}
+
+# 圖檔最佳化：題圖會進 PWA 離線快取，產圖後轉調色盤 PNG、裁白邊、可選 WebP，並限制單張位元組；記錄於 import_cache.json
+ASSET_SETTINGS = {
+    "optimize": True,
+    "gray_colors": 16,       # 灰階題圖的色階數（≤16 時 PNG 為 4-bit）
+    "color_colors": 64,      # 含彩色圖元時的調色盤色數
+    "white_point": 232,      # 亮度 ≥ 此值視為紙白（含淡色浮水印）
+    "chroma_threshold": 48,  # 非白像素 RGB 差 > 此值即視為彩色題圖
+    "trim_margin": 8,        # 裁白邊後保留的留白（px）
+    "max_bytes": 64 * 1024,  # 單張上限；超過先減色再縮圖
+    "min_scale": 0.5,
+    "webp": False,           # 另存同名 .webp（無損），題目 assets 會帶 webp 欄位
+    "store": "hash",         # hash：public/assets/h/<內容雜湊>.png 跨題庫共用；slug：舊版 public/assets/q/<slug>/Qxxx.png
+}
+ASSET_HASH_LENGTH = 16
+
+
+_PILLOW_WARNED = []
+_PILLOW_WARN_LOCK = threading.Lock()
+
+
+def _warn_no_pillow():
+    """未安裝 Pillow 時只提示一次（編碼管線的工作執行緒也會呼叫）：圖檔改寫 MuPDF 原始 PNG，緊貼裁切與點陣品質檢查略過。"""
+    with _PILLOW_WARN_LOCK:
+        if _PILLOW_WARNED:
+            return
+        _PILLOW_WARNED.append(True)
+    print("（未安裝 Pillow：圖題改寫 MuPDF 原始 PNG，不減色壓縮，緊貼裁切與點陣品質檢查略過；pip install Pillow）",
+          file=sys.stderr, flush=True)
+
+
+def _quantize_crop(gray, rgb, is_color, colors, white_point):
+    """灰階：亮度 ≥ white_point 歸白，其餘均分 colors-1 階，直接建調色盤（結果固定、不抖色）；彩色：Pillow median cut。"""
+    from PIL import Image
+    if is_color:
+        dither = getattr(Image, "Dither", Image).NONE
+        return rgb.quantize(colors=colors, dither=dither)
+    steps = colors - 1
+    lut = [steps if v >= white_point else min(steps - 1, v * steps // white_point) for v in range(256)]
+    idx = gray.point(lut)
+    pimg = Image.frombytes("P", idx.size, idx.tobytes())
+    palette = []
+    for i in range(colors):
+        level = 255 if i == steps else int(round(i * white_point / float(steps)))
+        palette.extend([level, level, level])
+    pimg.putpalette(palette)
+    return pimg
+
+
+def _optimize_crop_image(pix, settings):
+    """把裁切 Pixmap 轉成精簡 PNG（必要時另出 WebP）。回傳 (png_bytes, webp_bytes or None, info)。
+    未安裝 Pillow 時回傳 MuPDF 原始 PNG。info 含 bytes_before / bytes_after / colors / scale / over_budget。"""
+    return _optimize_crop_samples(pix.tobytes("png"), pix.width, pix.height, pix.samples, settings)
+
+
+def _optimize_crop_samples(raw_png, width, height, samples, settings):
+    """_optimize_crop_image 的本體，只吃 MuPDF 原始 PNG 與 RGB 點陣位元組，不碰 Pixmap；
+    編碼管線的工作執行緒呼叫這個（PyMuPDF 不支援多執行緒，Pixmap 相關呼叫都留在主執行緒）。"""
+    info = {"bytes_before": len(raw_png)}
+    try:
+        from PIL import Image, ImageChops
+    except ImportError:
+        _warn_no_pillow()
+        info.update({"bytes_after": len(raw_png), "optimized": False})
+        return raw_png, None, info
+
+    rgb = Image.frombytes("RGB", (width, height), samples)
+    gray = rgb.convert("L")
+    white_point = settings["white_point"]
+    ink = gray.point(lambda v: 255 if v < white_point else 0)
+    r, g, b = rgb.split()
+    chroma = ImageChops.lighter(ImageChops.lighter(ImageChops.difference(r, g), ImageChops.difference(g, b)), ImageChops.difference(r, b))
+    chroma = chroma.point(lambda v: 255 if v > settings["chroma_threshold"] else 0)
+    is_color = ImageChops.multiply(chroma, ink).getbbox() is not None
+
+    bbox = ink.getbbox()
+    if bbox:
+        m = settings["trim_margin"]
+        box = (max(0, bbox[0] - m), max(0, bbox[1] - m), min(rgb.width, bbox[2] + m), min(rgb.height, bbox[3] + m))
+        rgb, gray, ink = rgb.crop(box), gray.crop(box), ink.crop(box)
+    if is_color:
+        # 淡色浮水印/紙色一律歸白，避免吃掉調色盤
+        rgb = rgb.copy()
+        rgb.paste((255, 255, 255), mask=ImageChops.invert(ink))
+
+    colors = settings["color_colors"] if is_color else settings["gray_colors"]
+    min_colors = 16 if is_color else 4
+    scale = 1.0
+    while True:
+        if scale < 1.0:
+            size = (max(1, int(rgb.width * scale)), max(1, int(rgb.height * scale)))
+            src_gray, src_rgb = gray.resize(size, Image.LANCZOS), rgb.resize(size, Image.LANCZOS)
+        else:
+            src_gray, src_rgb = gray, rgb
+        out = _quantize_crop(src_gray, src_rgb, is_color, colors, white_point)
+        buf = io.BytesIO()
+        out.save(buf, "PNG", optimize=True)
+        png = buf.getvalue()
+        if len(png) <= settings["max_bytes"]:
+            break
+        if colors > min_colors:
+            colors //= 2
+        elif scale * 0.85 >= settings["min_scale"]:
+            scale = round(scale * 0.85, 4)
+        else:
+            break
+    over_budget = len(png) > settings["max_bytes"]
+    if len(png) >= len(raw_png) and not bbox:
+        png = raw_png
+    webp = None
+    if settings.get("webp"):
+        buf = io.BytesIO()
+        out.convert("RGB" if is_color else "L").save(buf, "WEBP", lossless=True)
+        webp = buf.getvalue()
+    info.update({
+        "bytes_after": len(png),
+        "optimized": True,
+        "colors": colors,
+        "scale": scale,
+        "over_budget": over_budget,
+    })
+    if webp is not None:
+        info["webp_bytes"] = len(webp)
+    return png, webp, info
+
+
+def _write_file_atomic(path, data):
+    """先寫同目錄暫存檔再 os.replace；--jobs 多行程同時寫同一雜湊檔時不會讀到半個檔。"""
+    tmp = path.with_name("{}.{}.tmp".format(path.name, os.getpid()))
+    with open(str(tmp), "wb") as f:
+        f.write(data)
+    os.replace(str(tmp), str(path))
+
+
+def _store_asset(assets_root, slug, out_name, png, webp=None, store="hash", counters=None):
+    """寫入圖檔並回傳 (src, webp_src)。
+    store="hash"：內容定址 public/assets/h/<sha256 前 16 碼>.png，相同裁切圖跨題庫只存一份（已存在則不重寫）；
+    store="slug"：舊版 public/assets/q/<slug>/Qxxx.png。
+    counters（dict）有傳入時累計實際寫出的 files_written / bytes_written。"""
+    if store == "hash":
+        name = hashlib.sha256(png).hexdigest()[:ASSET_HASH_LENGTH]
+        out_dir = Path(assets_root) / "h"
+        rel_dir = "/assets/h/"
+        stem = name
+    else:
+        out_dir = Path(assets_root) / "q" / slug
+        rel_dir = "/assets/q/" + slug + "/"
+        stem = out_name[:-len(".png")]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    png_path = out_dir / (stem + ".png")
+    webp_path = out_dir / (stem + ".webp")
+    written = []
+    if store != "hash" or not png_path.is_file() or png_path.stat().st_size != len(png):
+        _write_file_atomic(png_path, png)
+        written.append(len(png))
+    if webp is not None and (store != "hash" or not webp_path.is_file()):
+        _write_file_atomic(webp_path, webp)
+        written.append(len(webp))
+    if counters is not None:
+        counters["files_written"] = counters.get("files_written", 0) + len(written)
+        counters["bytes_written"] = counters.get("bytes_written", 0) + sum(written)
+    if webp is not None:
+        return rel_dir + stem + ".png", rel_dir + stem + ".webp"
+    if store != "hash" and webp_path.is_file():
+        # 關閉 --webp 後移除上次殘留的同名 .webp；雜湊庫的殘檔由 _prune_asset_store 統一清
+        webp_path.unlink()
+    return rel_dir + stem + ".png", None
+
+
+# 裁切品質檢查：對每張裁切點陣算墨水比例、列 / 欄投影、墨水外框與四邊是否切到內容，並看答案標記處有沒有墨水。
+# 結果寫入 image_decisions 的 quality；blank_crop / edge_cut / answer_leak 另列入 mismatch_images（見 _crop_quality_mismatches）。
+CROP_QUALITY = {
+    "blank_ink_ratio": 0.002,   # 墨水像素比例低於此值視為空白圖
+    "edge_min_px": 2,           # 最外一列 / 一欄至少這麼多墨水像素才算切到內容（圖形或文字被截半）
+    # 左緣由答案標記位置決定，題幹、選項跨過左緣是預期的，只記錄 edge_ink.left 不報。
+    # 預設裁切框下緣延伸到頁底 / 下一題，切過下一題的文字是預期的：edge_sides_graphic 內的邊只在有圖元跨越該邊時才報
+    # （見 _crop_quality_settings）；--tight-crop 的框貼著本題內容，edge_sides 一律檢查
+    "edge_sides": ("top", "bottom", "right"),
+    "edge_sides_graphic": ("bottom", "right"),
+    "answer_leak_px": 4,        # 答案標記外框內的墨水像素達此數即視為露答案
+    "answer_gap_pt": 40,        # 題號框右緣到答案標記左緣的最大距離（pt）；更遠的 (1)~(4) 視為選項標籤
+    "projection_block": 128,    # 投影以 Image.reduce 每 N 像素併一格（N ≤ 255，單一墨水像素仍非 0）
+}
+
+
+def _answer_boxes_in_clip(session, page_idx, clip, zoom, heads):
+    """該頁落在 clip 內的答案標記外框，換算成裁切點陣座標 [(x0, y0, x1, y1), ...]（只含與 clip 有交集的部分）。
+    答案標記＝題號框（heads，見 QuestionIndex.by_page）同一行、右側 answer_gap_pt 內最近的「(1)」~「(4)」；
+    (1)~(4) 選項標籤不算。"""
+    ys, marks = session.answer_marks(page_idx)
+    gap = CROP_QUALITY["answer_gap_pt"]
+    boxes = []
+    for head in heads:
+        if head.y1 < clip.y0 - 30 or head.y0 > clip.y1:
+            continue
+        lo = bisect.bisect_left(ys, head.y0 - head.height)
+        hi = bisect.bisect_right(ys, head.y0 + head.height)
+        same_line = [m for m in marks[lo:hi] if head.x1 - 2 <= m[2] <= head.x1 + gap]
+        if not same_line:
+            continue
+        y0, x1, x0, y1 = min(same_line, key=lambda m: m[2])
+        bx0, by0, bx1, by1 = max(x0, clip.x0), max(y0, clip.y0), min(x1, clip.x1), min(y1, clip.y1)
+        if bx1 > bx0 and by1 > by0:
+            boxes.append((int((bx0 - clip.x0) * zoom), int((by0 - clip.y0) * zoom),
+                          int(round((bx1 - clip.x0) * zoom)), int(round((by1 - clip.y0) * zoom))))
+    return boxes
+
+
+def _blank_runs_max(profile, lo, hi):
+    """投影 profile[lo:hi] 中最長的連續 0 段長度（墨水外框內最大的空白帶）。"""
+    best = run = 0
+    for v in profile[lo:hi]:
+        run = run + 1 if not v else 0
+        best = max(best, run)
+    return best
+
+
+def _crop_quality_settings(crop_settings, graphic_edges=()):
+    """依裁切設定取品質檢查參數：緊貼裁切檢查全部 edge_sides；預設裁切的 edge_sides_graphic
+    只留 graphic_edges（PageGraphicIndex.crossed_edges，圖元跨越的邊）內的邊。"""
+    if crop_settings and crop_settings.get("tight"):
+        return CROP_QUALITY
+    sides = tuple(side for side in CROP_QUALITY["edge_sides"]
+                  if side not in CROP_QUALITY["edge_sides_graphic"] or side in graphic_edges)
+    return dict(CROP_QUALITY, edge_sides=sides)
+
+
+def _crop_quality(width, height, samples, white_point, answer_boxes=(), settings=None):
+    """裁切點陣品質：ink_ratio、ink_bbox（墨水外框，點陣座標）、whitespace_ratio（外框外的空白比例）、
+    row_gap_max / col_gap_max（外框內最大空白帶，列 / 欄投影）、edge_ink（四邊最外一列 / 一欄的墨水像素數）
+    與 issues（blank_crop / edge_cut:<邊> / answer_leak）。全部用 Pillow 的 C 實作運算，每張數毫秒；未安裝 Pillow 回傳 None。"""
+    try:
+        from PIL import Image
+    except ImportError:
+        _warn_no_pillow()
+        return None
+    settings = settings or CROP_QUALITY
+    ink = Image.frombytes("RGB", (width, height), samples).convert("L").point(
+        [255 if v < white_point else 0 for v in range(256)])
+    ink_px = ink.histogram()[255]
+    ink_ratio = float(ink_px) / (width * height) if width and height else 0.0
+    bbox = ink.getbbox()
+    edge_ink = {
+        "top": ink.crop((0, 0, width, 1)).histogram()[255],
+        "bottom": ink.crop((0, height - 1, width, height)).histogram()[255],
+        "left": ink.crop((0, 0, 1, height)).histogram()[255],
+        "right": ink.crop((width - 1, 0, width, height)).histogram()[255],
+    }
+    out = {
+        "size": [width, height],
+        "ink_ratio": round(ink_ratio, 4),
+        "ink_bbox": list(bbox) if bbox else None,
+        "whitespace_ratio": 1.0,
+        "row_gap_max": 0,
+        "col_gap_max": 0,
+        "edge_ink": edge_ink,
+        "issues": [],
+    }
+    if ink_ratio < settings["blank_ink_ratio"]:
+        out["issues"].append("blank_crop")
+    if bbox:
+        out["whitespace_ratio"] = round(1.0 - float((bbox[2] - bbox[0]) * (bbox[3] - bbox[1])) / (width * height), 4)
+        # 列 / 欄投影：reduce 把每 block 像素併成一格，某列（欄）有任一格非 0 即有墨水
+        block = settings["projection_block"]
+        cols_w = (width + block - 1) // block
+        rows_raw = ink.reduce((block, 1)).tobytes()
+        rows = [any(rows_raw[i:i + cols_w]) for i in range(0, len(rows_raw), cols_w)]
+        cols_raw = ink.reduce((1, block)).tobytes()
+        cols = [any(cols_raw[c::width]) for c in range(width)]
+        out["row_gap_max"] = _blank_runs_max(rows, bbox[1], bbox[3])
+        out["col_gap_max"] = _blank_runs_max(cols, bbox[0], bbox[2])
+    for side in settings["edge_sides"]:
+        if edge_ink[side] >= settings["edge_min_px"]:
+            out["issues"].append("edge_cut:" + side)
+    for box in answer_boxes:
+        if ink.crop(box).histogram()[255] >= settings["answer_leak_px"]:
+            out["issues"].append("answer_leak")
+            break
+    return out
 
 
-def _render_crop_question_image_v122(pdf_path, q_num, slug, assets_root, question_index, mismatch_list, question_text=None, force_image=False):
-    """v1.2.2: 題區間有圖元或 force_image（CNS/符號關鍵詞）時產圖；強制產圖時 x0 用 0.08 保留左側符號。"""
-    path = Path(pdf_path)
-    assets_dir = Path(assets_root) / "q" / slug
-    assets_dir.mkdir(parents=True, exist_ok=True)
+def _crop_quality_mismatches(slug, q_num, image_path, quality):
+    """品質檢查的問題轉成 mismatch_images 項目：blank_crop、edge_cut（source 為被切到的邊，逗號分隔）、answer_leak。"""
+    if not quality or not quality["issues"]:
+        return []
+    base = {"dataset_id": slug, "qno": q_num, "image_path": image_path}
+    out = []
+    if "blank_crop" in quality["issues"]:
+        out.append(dict(base, reason="blank_crop", source="ink_ratio={}".format(quality["ink_ratio"])))
+    edges = [i.split(":", 1)[1] for i in quality["issues"] if i.startswith("edge_cut:")]
+    if edges:
+        out.append(dict(base, reason="edge_cut", source=",".join(edges)))
+    if "answer_leak" in quality["issues"]:
+        out.append(dict(base, reason="answer_leak", source="answer_mark_in_crop"))
+    return out
+
+
+# 圖檔編碼管線：主執行緒渲染（MuPDF）後只取出原始 PNG 與點陣位元組，減色 / PNG 壓縮與寫檔交給執行緒池，
+# 與下一題的渲染重疊（Pillow 的點陣運算、zlib 壓縮與檔案 I/O 都會釋放 GIL）。
+# 未完成的圖檔超過 workers × ENCODE_QUEUE_PER_WORKER 張時，主執行緒先等最早的一張寫完（背壓，點陣不會無限堆積）。
+ENCODE_QUEUE_PER_WORKER = 2
+ENCODE_WORKERS_MAX = 4
+
+
+def default_encode_workers(jobs=1):
+    """--encode-workers 未指定時的執行緒數：每個行程分到的核心數扣掉渲染用的一核，最多 ENCODE_WORKERS_MAX；
+    單核（或 --jobs 已用滿核心）時為 0，即在主執行緒逐張編碼（與未加管線前相同）。"""
+    cores = (os.cpu_count() or 1) // max(1, jobs)
+    return max(0, min(ENCODE_WORKERS_MAX, cores - 1))
+
+
+class EncodePipeline(object):
+    """有界的「渲染 → 編碼 / 寫檔」生產者 / 消費者管線（見 ENCODE_QUEUE_PER_WORKER）。
+
+    submit() 交出一件工作並回傳 Future；佇列已滿時先等任一件完成。同一行程內寫入內容定址庫的檢查與寫檔
+    以鎖串行（寫檔本身很快），files_written 的計數與逐張處理相同。report() 為報表 encode_pipeline 欄位。"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.queue_size = workers * ENCODE_QUEUE_PER_WORKER
+        self.store_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._pending = deque()
+        self._first_submit = None
+        self._last_done = None
+        self.stats = {"jobs": 0, "queue_peak": 0, "backpressure_waits": 0, "wait_seconds": 0.0,
+                      "encode_seconds": 0.0, "write_seconds": 0.0}
+
+    def submit(self, fn, *args):
+        while self._pending and self._pending[0].done():
+            self._pending.popleft()
+        if len(self._pending) >= self.queue_size:
+            t0 = time.perf_counter()
+            wait(self._pending, return_when=FIRST_COMPLETED)
+            self.stats["backpressure_waits"] += 1
+            self.stats["wait_seconds"] += time.perf_counter() - t0
+            self._pending = deque(f for f in self._pending if not f.done())
+        if self._first_submit is None:
+            self._first_submit = time.perf_counter()
+        future = self._pool.submit(fn, *args)
+        self._pending.append(future)
+        self.stats["jobs"] += 1
+        self.stats["queue_peak"] = max(self.stats["queue_peak"], len(self._pending))
+        return future
+
+    def job_done(self, encode_seconds, write_seconds, done_at):
+        """PendingAsset.resolve 在主執行緒回報單件工作的秒數與完成時間。"""
+        self.stats["encode_seconds"] += encode_seconds
+        self.stats["write_seconds"] += write_seconds
+        self._last_done = done_at if self._last_done is None else max(self._last_done, done_at)
+
+    def report(self):
+        out = {"workers": self.workers, "queue_size": self.queue_size}
+        out.update(self.stats)
+        for k in ("wait_seconds", "encode_seconds", "write_seconds"):
+            out[k] = round(out[k], 4)
+        span = (self._last_done - self._first_submit) if self._last_done is not None else 0.0
+        out["images_per_second"] = round(self.stats["jobs"] / span, 2) if span > 0 else None
+        return out
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self._pending.clear()
+
+
+def _encode_crop_job(raw_png, width, height, samples, settings, assets_root, slug, out_name, store_lock, quality_boxes=None,
+                     quality_settings=None):
+    """編碼管線的工作：減色壓縮（optimize 時）後寫檔，quality_boxes 不為 None 時另以 quality_settings 跑 _crop_quality。
+    回傳 (src, webp_src, info, counters, encode_s, write_s, done_at, quality, quality_s)；info 為 None 表示未最佳化（直接寫 MuPDF 原始 PNG）。"""
+    quality, quality_s = None, 0.0
+    if quality_boxes is not None:
+        t0 = time.perf_counter()
+        quality = _crop_quality(width, height, samples, settings["white_point"], quality_boxes, quality_settings)
+        quality_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    if settings.get("optimize"):
+        png, webp, info = _optimize_crop_samples(raw_png, width, height, samples, settings)
+    else:
+        png, webp, info = raw_png, None, None
+    t1 = time.perf_counter()
+    counters = {}
+    with store_lock:
+        src, webp_src = _store_asset(assets_root, slug, out_name, png, webp, store=settings.get("store", "hash"), counters=counters)
+    t2 = time.perf_counter()
+    return src, webp_src, info, counters, t1 - t0, t2 - t1, t2, quality, quality_s
+
+
+class PendingAsset(object):
+    """還在編碼管線裡的裁切圖（_save_crop 開管線時回傳，取代 src 字串）。
+    resolve() 等這張寫完，並於主執行緒補上 _save_crop 原本當場做的 asset_stats / counters / decision_info 累計；
+    編碼或寫檔失敗時拋出原例外。placeholder 為產圖前的報表識別路徑。"""
+
+    def __init__(self, session, future, placeholder, decision_info):
+        self.session = session
+        self.future = future
+        self.placeholder = placeholder
+        self.decision_info = decision_info
+        self._src = None
+
+    def resolve(self):
+        if self._src is None:
+            src, webp_src, info, counters, encode_s, write_s, done_at, quality, quality_s = self.future.result()
+            session = self.session
+            session.encode_pipeline.job_done(encode_s, write_s, done_at)
+            for k, v in counters.items():
+                session.counters[k] = session.counters.get(k, 0) + v
+            if info is not None:
+                _record_crop_asset(session, info, webp_src, self.decision_info)
+            if quality is not None:
+                _record_crop_quality(session, quality, quality_s, self.decision_info)
+            self._src = src
+        return self._src
+
+
+def _record_crop_asset(session, info, webp_src, decision_info):
+    """累計 session.asset_stats，並把最佳化資訊（與 webp 路徑）寫進 decision_info。"""
+    stats = session.asset_stats
+    stats["images"] += 1
+    stats["bytes_before"] += info["bytes_before"]
+    stats["bytes_after"] += info["bytes_after"]
+    stats["webp_bytes"] += info.get("webp_bytes", 0)
+    stats["over_budget"] += 1 if info.get("over_budget") else 0
+    if decision_info is not None:
+        decision_info.update(info)
+        if webp_src:
+            decision_info["webp_path"] = webp_src
+
+
+def _record_crop_quality(session, quality, seconds, decision_info):
+    """累計 session.quality_stats（各問題張數與檢查秒數），並把 quality 寫進 decision_info。"""
+    stats = session.quality_stats
+    stats["images"] += 1
+    stats["seconds"] += seconds
+    for issue in quality["issues"]:
+        key = issue.split(":", 1)[0]
+        stats[key] = stats.get(key, 0) + 1
+    if decision_info is not None:
+        decision_info["quality"] = quality
+
+
+def _save_crop(session, pix, assets_root, slug, out_name, decision_info=None, quality_boxes=None, quality_settings=None):
+    """寫出裁切圖檔；session.asset_settings["optimize"] 時先經 _optimize_crop_image。
+    回傳 (src, webp_src)，並累計 session.asset_stats 與 encode / write 秒數。
+    quality_boxes（裁切內答案標記外框，可為空列表）不為 None 時另對點陣跑 _crop_quality，結果寫進 decision_info["quality"]；
+    quality_settings 未給時用 _crop_quality_settings(session.crop_settings)。
+    session.encode_pipeline 有開時只在主執行緒取出原始 PNG 與點陣（計入 encode），其餘交給管線，
+    回傳 (PendingAsset, None)；統計與 decision_info 於 PendingAsset.resolve() 時補上。"""
+    settings = session.asset_settings
+    store = settings.get("store", "hash")
+    timings = session.stage_seconds
+    t0 = time.perf_counter()
+    pipeline = session.encode_pipeline
+    if quality_boxes is not None and quality_settings is None:
+        quality_settings = _crop_quality_settings(session.crop_settings)
+    if pipeline is not None:
+        raw_png = pix.tobytes("png")
+        samples = pix.samples if settings.get("optimize") or quality_boxes is not None else None
+        t0 = _add_seconds(timings, "encode", t0)
+        future = pipeline.submit(_encode_crop_job, raw_png, pix.width, pix.height, samples, settings,
+                                 assets_root, slug, out_name, pipeline.store_lock, quality_boxes, quality_settings)
+        _add_seconds(timings, "encode_wait", t0)
+        return PendingAsset(session, future, "/assets/q/" + slug + "/" + out_name, decision_info), None
+    if not settings.get("optimize"):
+        png = pix.tobytes("png")
+        t0 = _add_seconds(timings, "encode", t0)
+        src, webp_src = _store_asset(assets_root, slug, out_name, png, store=store, counters=session.counters)
+        t0 = _add_seconds(timings, "write", t0)
+    else:
+        png, webp, info = _optimize_crop_image(pix, settings)
+        t0 = _add_seconds(timings, "encode", t0)
+        src, webp_src = _store_asset(assets_root, slug, out_name, png, webp, store=store, counters=session.counters)
+        t0 = _add_seconds(timings, "write", t0)
+        _record_crop_asset(session, info, webp_src, decision_info)
+    if quality_boxes is not None:
+        quality = _crop_quality(pix.width, pix.height, pix.samples, settings["white_point"], quality_boxes, quality_settings)
+        if quality is not None:
+            _record_crop_quality(session, quality, time.perf_counter() - t0, decision_info)
+        _add_seconds(timings, "quality", t0)
+    return src, webp_src
+
+
+def _asset_dedupe_stats(questions, public_root, seen):
+    """依序統計題目 assets 的共用情形：seen（跨題庫累積的 src 集合）中已出現者即為省下的檔案。"""
+    refs = 0
+    unique = 0
+    bytes_saved = 0
+    for q in questions:
+        for a in q.get("assets") or []:
+            for key in ("src", "webp"):
+                src = a.get(key)
+                if not src:
+                    continue
+                refs += 1
+                if src in seen:
+                    try:
+                        bytes_saved += (public_root / src.lstrip("/")).stat().st_size
+                    except OSError:
+                        pass
+                else:
+                    seen.add(src)
+                    unique += 1
+    return {"refs": refs, "new_files": unique, "shared_refs": refs - unique, "bytes_saved": bytes_saved}
+
+
+def _store_assets_referenced(data_dir):
+    """data_dir 內各 questions_*.json 引用的 public/assets/h 檔名集合。"""
+    referenced = set()
+    for q_file in data_dir.glob("questions_*.json"):
+        if q_file.name.endswith(".pack.json"):
+            continue
+        try:
+            questions = json.loads(read_text(q_file))
+        except ValueError:
+            continue
+        for q in questions if isinstance(questions, list) else []:
+            for a in q.get("assets") or []:
+                for key in ("src", "webp"):
+                    src = a.get(key) or ""
+                    if src.startswith("/assets/h/"):
+                        referenced.add(src[len("/assets/h/"):])
+    return referenced
+
+
+def _prune_asset_store(output_dir, assets_root, backup_root=None):
+    """刪除 public/assets/h 內已無任何 questions_*.json（含保留中的版本目錄）引用的檔案，回傳刪除數。
+    backup_root 有給時，保留的備份快照（manifest.json 的 assets）引用的檔案也不刪，快照複製回 public/data 即可用。"""
+    store_dir = Path(assets_root) / "h"
+    if not store_dir.is_dir():
+        return 0
+    referenced = _store_assets_referenced(output_dir)
+    for version_dir in _data_version_dirs(output_dir):
+        referenced.update(_store_assets_referenced(version_dir))
+    if backup_root is not None and backup_root.is_dir():
+        for d in backup_root.iterdir():
+            if d.is_dir() and _BACKUP_SNAPSHOT_NAME.match(d.name):
+                try:
+                    referenced.update(json.loads(read_text(d / "manifest.json")).get("assets", {}))
+                except (IOError, OSError, ValueError):
+                    continue
+    removed = 0
+    for f in store_dir.iterdir():
+        if f.is_file() and f.name not in referenced:
+            f.unlink()
+            removed += 1
+    return removed
+
+
+def _render_crop_question_image_v122(session, q_num, slug, assets_root, question_index, mismatch_list, question_text=None, force_image=False, decision_info=None):
+    """v1.2.2: 題區間有圖元或 force_image（CNS/符號關鍵詞）時產圖；強制產圖時 x0 用 0.08 保留左側符號。
+    decision_info（dict）若有傳入，會寫入 clip 內圖元統計（graphic_count / graphic_bbox_area / graphic_bbox_coverage）。"""
     qno_int = int(q_num) if str(q_num).isdigit() else 0
     num_str = str(q_num).zfill(3) if len(str(q_num)) <= 3 else str(q_num)
     out_name = "Q" + num_str + ".png"
-    out_path = assets_dir / out_name
-    rel_path = "/assets/q/" + slug + "/" + out_name
+    rel_path = "/assets/q/" + slug + "/" + out_name  # 產圖前的報表識別路徑；實際 src 見 _store_asset
 
-    try:
-        import fitz
-    except ImportError:
+    if fitz is None:
         mismatch_list.append({"dataset_id": slug, "qno": q_num, "reason": "no_fitz", "source": "", "image_path": rel_path, "image_decision": "failed"})
         return (None, False, "failed")
 
     try:
-        doc = fitz.open(str(path))
-        n_pages = len(doc)
-        info = None
-        page_idx = -1
-        for p in range(n_pages):
-            key = (p, qno_int)
-            if key in question_index:
-                info = question_index[key]
-                page_idx = p
-                break
-        if not info or page_idx < 0:
-            doc.close()
+        if session.fitz_doc() is None:
+            raise RuntimeError("PyMuPDF 無法開啟 {}".format(session.path.name))
+        hit = question_index.first_page(qno_int)
+        if hit is None:
             mismatch_list.append({"dataset_id": slug, "qno": q_num, "reason": "index_missing", "source": "", "image_path": rel_path, "image_decision": "failed"})
             return (None, False, "failed")
 
-        y0, y1, rect_qno = info
-        page = doc[page_idx]
+        page_idx, (y0, y1, rect_qno) = hit
+        page = session.page(page_idx)
         w = page.rect.width
         h = page.rect.height
+        settings = session.crop_settings
         # 強制產圖時用較保守 x0=0.08 保留左側符號區，仍與答案 bbox 取 max 防露答案
-        default_ratio = 0.08 if force_image else 0.14
-        x0 = _x0_after_answer(page, rect_qno, w, default_ratio=default_ratio)
-        y0_safe = max(0, y0 - 10)
-        y1_safe = min(h, y1 + 80)
+        default_ratio = settings["x0_ratio_forced"] if force_image else settings["x0_ratio"]
+        x0 = _x0_after_answer(session, page_idx, rect_qno, w, default_ratio=default_ratio)
+        y0_safe = max(0, y0 - settings["pad_top"])
+        y1_safe = min(h, y1 + settings["pad_bottom"])
         if y1_safe <= y0_safe:
-            y1_safe = min(h, y0_safe + 150)
+            y1_safe = min(h, y0_safe + settings["min_height"])
         clip = fitz.Rect(x0, y0_safe, w, y1_safe)
         if clip.x1 <= clip.x0:
             clip = fitz.Rect(w * default_ratio, 0, w, h)
 
-        has_graphic = _rect_has_graphic(page, clip)
+        timings = session.stage_seconds
+        t0 = time.perf_counter()
+        if decision_info is not None:
+            try:
+                stats = session.graphic_index(page_idx).stats(clip)
+                decision_info.update({k: stats[k] for k in ("graphic_count", "graphic_bbox_area", "graphic_bbox_coverage")})
+            except Exception:
+                pass
+        has_graphic = _rect_has_graphic(session, page_idx, clip)
+        t0 = _add_seconds(timings, "graphic_detect", t0)
         if not has_graphic and not force_image:
-            doc.close()
             return (None, True, "skipped_no_graphic")
 
-        zoom = 2.0
-        mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat, clip=clip, alpha=False)
-        pix.save(str(out_path))
+        if settings["tight"]:
+            # 圖元判斷沿用原 clip（產圖與否不變），只縮小實際渲染的範圍。下緣截在題號行之下的下一個題號
+            # （不用 span 的 y1：同一行可能另掃到「12.」裡的「2.」，y1 會等於本題 y0）
+            below = [hd.y0 for hd in question_index.by_page.get(page_idx, ()) if hd.y0 >= rect_qno.y1]
+            tight = _tight_clip(session, page_idx, clip, min(below) if below else h, settings)
+            if tight is not None:
+                before, after = clip.width * clip.height, tight.width * tight.height
+                session.tight_stats["crops"] += 1
+                session.tight_stats["area_before"] += before
+                session.tight_stats["area_after"] += after
+                if decision_info is not None:
+                    decision_info["tight_area_saved"] = round(1.0 - after / before, 4) if before else 0.0
+                clip = tight
+            t0 = _add_seconds(timings, "tight_probe", t0)
+        pix = _crop_pixmap(session, page_idx, clip, settings["zoom"])
+        _add_seconds(timings, "render", t0)
+        quality_boxes = _answer_boxes_in_clip(session, page_idx, clip, settings["zoom"], question_index.by_page.get(page_idx, ()))
+        graphic_edges = () if settings["tight"] else session.graphic_index(page_idx).crossed_edges(clip)
+        rel_path, _ = _save_crop(session, pix, assets_root, slug, out_name, decision_info, quality_boxes,
+                                 _crop_quality_settings(settings, graphic_edges))
 
         # 【必修3】校準驗證：用題幹 snippet（8~15 字）在 clip 回讀文字中檢查；不命中則 mismatch，報表含 expected_snippet
         if question_text:
+            t0 = time.perf_counter()
             try:
                 region_text = page.get_text("text", clip=clip) or ""
                 region_text = re.sub(r"\s+", "", region_text)
@@ -715,29 +2455,29 @@ def _render_crop_question_image_v122(pdf_path, q_num, slug, assets_root, questio
                             })
             except Exception:
                 pass
+            _add_seconds(timings, "calibrate", t0)
 
         decision = "forced_by_keywords" if (force_image and not has_graphic) else "rendered"
-        doc.close()
         return (rel_path, False, decision)
     except Exception as e:
         # 索引有但裁切失敗時，用防露答案底線（x0=0.14*w）再試一頁
         try:
-            import fitz
-            doc = fitz.open(str(path))
-            for page_idx in range(len(doc)):
-                key = (page_idx, qno_int)
-                if key not in question_index:
-                    continue
-                page = doc[page_idx]
+            hit = question_index.first_page(qno_int)
+            if hit is not None:
+                page_idx = hit[0]
+                page = session.page(page_idx)
                 w, h = page.rect.width, page.rect.height
-                clip = fitz.Rect(w * 0.14, 0, w, h)
-                zoom = 2.0
+                clip = fitz.Rect(w * session.crop_settings["x0_ratio"], 0, w, h)
+                zoom = session.crop_settings["zoom"]
                 mat = fitz.Matrix(zoom, zoom)
+                t0 = time.perf_counter()
                 pix = page.get_pixmap(matrix=mat, clip=clip, alpha=False)
-                pix.save(str(out_path))
-                doc.close()
+                _add_seconds(session.stage_seconds, "render", t0)
+                quality_boxes = _answer_boxes_in_clip(session, page_idx, clip, zoom, question_index.by_page.get(page_idx, ()))
+                graphic_edges = session.graphic_index(page_idx).crossed_edges(clip)
+                rel_path, _ = _save_crop(session, pix, assets_root, slug, out_name, decision_info, quality_boxes,
+                                         _crop_quality_settings(None, graphic_edges))
                 return (rel_path, False, "rendered")
-            doc.close()
         except Exception:
             pass
         try:
@@ -748,42 +2488,105 @@ def _render_crop_question_image_v122(pdf_path, q_num, slug, assets_root, questio
     return (None, False, "failed")
 
 
-def process_pdf(input_dir, output_dir, pdf_path, report, assets_root=None):
-    """處理單一 PDF，回傳 (slug, questions)。v1.2.2 使用 slug、question_index、mismatch_images。"""
-    raw_id = slug_from_filename(pdf_path.name)
-    slug = to_ascii_slug(raw_id)
-    print("    解析文字...", end=" ", flush=True)
-    pages_text = extract_text_from_pdf(pdf_path)
-    if not pages_text:
-        print("(無文字)", flush=True)
-        report.append({
-            "file": pdf_path.name,
-            "dataset_id": slug,
-            "parsed": 0,
-            "parse_failed_count": 0,
-            "parse_failed": [],
-            "cross_question_suspects_count": 0,
-            "cross_question_suspects": [],
-            "missing_explanation_count": 0,
-            "image_questions_count": 0,
-            "missing_image_count": 0,
-            "errors": [],
-            "mismatch_images": [],
-            "error": "PDF 引擎未安裝或無法擷取文字（請 pip install pdfplumber）",
-        })
-        return slug, []
-
+def process_pdf(input_dir, output_dir, pdf_path, report, assets_root=None, batch_render=True, asset_settings=None, stream_parse=False, text_cache=True, text_engine=None, profile=False, encode_workers=None, crop_settings=None):
+    """處理單一 PDF，回傳 (slug, questions)。v1.2.2 使用 slug、question_index、mismatch_images。
+    batch_render：同頁多題圖題時整頁渲染一次再切出各題（輸出與逐題渲染逐像素相同）。
+    asset_settings：圖檔最佳化參數，預設 ASSET_SETTINGS。
+    stream_parse：逐頁抽文字、逐頁切題，不組全文（輸出與整份解析相同）。
+    text_cache：經 scripts/.cache 抽字快取（同內容 PDF 不重抽文字）。
+    text_engine：抽字引擎 auto / pdfplumber / fitz，預設 PDF_ENGINE。
+    profile：以 cProfile 包住整份處理，寫出 scripts/profile/<檔名>.pstats 與前 30 名累計耗時 .txt。
+    encode_workers：圖檔編碼管線的執行緒數（0＝主執行緒逐張編碼），預設 default_encode_workers()；輸出與逐張處理相同。
+    crop_settings：裁切參數，預設 CROP_SETTINGS（--tight-crop 時 tight 為 True）。"""
+    if encode_workers is None:
+        encode_workers = default_encode_workers()
+    profiler = None
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with PdfSession(pdf_path, text_cache_dir=text_cache_dir() if text_cache else None, text_engine=text_engine) as session:
+            session.batch_render = batch_render
+            session.stream_parse = stream_parse
+            if asset_settings is not None:
+                session.asset_settings = dict(asset_settings)
+            if crop_settings is not None:
+                session.crop_settings = dict(crop_settings)
+            if assets_root and encode_workers > 0:
+                session.encode_pipeline = EncodePipeline(encode_workers)
+            return _process_pdf_session(session, report, assets_root=assets_root)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            path = _dump_profile(profiler, pdf_path)
+            if report:
+                report[-1]["profile"] = str(path.relative_to(ROOT))
+
+
+PROFILE_TOP = 30
+
+
+def _dump_profile(profiler, pdf_path):
+    """寫出 scripts/profile/<檔名>.pstats（可用 snakeviz / pstats 開）與依累計耗時排序的前 PROFILE_TOP 名文字摘要。"""
+    import pstats
+    profile_dir = ROOT / "scripts" / "profile"
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    safe_name = re.sub(r"[^\w\-.]", "_", Path(pdf_path).name)
+    stats_path = profile_dir / (safe_name + ".pstats")
+    profiler.dump_stats(str(stats_path))
+    buf = io.StringIO()
+    pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(PROFILE_TOP)
+    write_text(profile_dir / (safe_name + ".txt"), buf.getvalue())
+    return stats_path
+
+
+# 批次裁切門檻：該頁各題裁切區估計面積總和 ≥ 頁面面積 × 此比例時，整頁渲染一次比逐題渲染省
+BATCH_RENDER_MIN_COVERAGE = 0.75
+
+
+def _plan_batch_pages(session, questions, question_index):
+    """挑出值得整頁渲染的頁面：疑似圖題 ≥2 題，且裁切區（含上下留白，彼此常重疊）估計面積總和夠大。"""
+    area_per_page = {}
+    count_per_page = {}
+    for q in questions:
+        if not _is_suspected_image_question(q.get("question_text", ""), q.get("options") or []):
+            continue
+        qno = q["id"].split("_")[-1]
+        if not qno.isdigit():
+            continue
+        hit = question_index.first_page(int(qno))
+        if hit is None:
+            continue
+        page_idx, (y0, y1, _) = hit
+        h = session.page(page_idx).rect.height
+        crop_h = min(h, y1 + session.crop_settings["pad_bottom"]) - max(0, y0 - session.crop_settings["pad_top"])
+        area_per_page[page_idx] = area_per_page.get(page_idx, 0.0) + max(0.0, crop_h)
+        count_per_page[page_idx] = count_per_page.get(page_idx, 0) + 1
+    pages = set()
+    for page_idx, crop_h_total in area_per_page.items():
+        h = session.page(page_idx).rect.height
+        # 寬度各題相近（x0 至頁右緣），以高度比例估算面積比例
+        if count_per_page[page_idx] >= 2 and crop_h_total * (1 - session.crop_settings["x0_ratio_forced"]) >= h * BATCH_RENDER_MIN_COVERAGE:
+            pages.add(page_idx)
+    return pages
+
+
+def _parse_pages_whole(pages_text, slug, timings=None):
+    """解析整份文字（預設模式）。回傳 dict：pages_total、extracted_text_length_per_page、questions、parse_failed、
+    cross_suspects、drop_reasons、pattern_counts、block_spans、blocks_head（前 10 個題塊，105 預覽用）、layout_profile。
+    timings（dict）有傳入時累計 layout_profile / header_strip / block_split / block_parse 秒數。"""
     # 【必修1】多頁時用全文解析以撿齊題號邊界（單頁或 fallback 才用每頁解析）
     full_text = "\n".join(t for _, t in pages_text)
-    pages_total = len(pages_text)
-    extracted_text_length_per_page = [len(t) for _, t in pages_text]
     drop_reasons_merged = {}
     all_questions = []
     all_parse_failed = []
     all_cross_suspects = []
-    full_cleaned = _strip_header_footer(full_text)
+    t0 = time.perf_counter()
+    layout = detect_layout_profile(pages_text)
+    _add_seconds(timings, "layout_profile", t0)
     if len(pages_text) > 1:
-        qs, failed, cross = parse_questions_from_text(full_text, slug, None, drop_reasons_merged)
+        qs, failed, cross = parse_questions_from_text(full_text, slug, None, drop_reasons_merged, timings, layout)
         all_parse_failed.extend(failed)
         all_cross_suspects.extend(cross)
         for q in qs:
@@ -792,8 +2595,10 @@ def process_pdf(input_dir, output_dir, pdf_path, report, assets_root=None):
             all_questions.append(q)
     else:
         for page_no, text in pages_text:
+            t0 = time.perf_counter()
             text_cleaned = _strip_header_footer(text)
-            qs, failed, cross = parse_questions_from_text(text_cleaned, slug, page_no, drop_reasons_merged)
+            _add_seconds(timings, "header_strip", t0)
+            qs, failed, cross = parse_questions_from_text(text_cleaned, slug, page_no, drop_reasons_merged, timings, layout)
             all_parse_failed.extend(failed)
             all_cross_suspects.extend(cross)
             for q in qs:
@@ -801,30 +2606,264 @@ def process_pdf(input_dir, output_dir, pdf_path, report, assets_root=None):
                 q["_page_no"] = page_no
                 all_questions.append(q)
 
+    # 去頁首全文只在 fallback 或單頁時用到（單頁時與上面該頁的去頁首結果相同，由 _HEADER_STRIP_CACHE 直接取回）
+    full_cleaned = None
+    if len(all_questions) < 3 or len(pages_text) == 1:
+        t0 = time.perf_counter()
+        full_cleaned = _strip_header_footer(full_text)
+        _add_seconds(timings, "header_strip", t0)
     if len(all_questions) < 3 and len(pages_text) > 0:
-        qs, failed, cross = parse_questions_from_text(full_cleaned, slug, None, drop_reasons_merged)
+        qs, failed, cross = parse_questions_from_text(full_cleaned, slug, None, drop_reasons_merged, timings)
         all_parse_failed.extend(failed)
         all_cross_suspects.extend(cross)
-        seen = set()
-        all_questions = []
-        for q in qs:
-            uid = slug + "_" + q["id"]
-            if uid in seen:
-                continue
-            seen.add(uid)
-            q["id"] = uid
-            q["_page_no"] = 1
-            all_questions.append(q)
+        all_questions = _dedupe_fallback_questions(qs, slug)
 
-    full_cleaned = _strip_header_footer(full_text)
     text_for_blocks = full_text if len(pages_text) > 1 else full_cleaned
-    d_list_raw = _split_blocks_pattern_d(text_for_blocks)
+    t0 = time.perf_counter()
     blocks_full, pattern_counts, block_spans = _split_blocks_with_fallback(text_for_blocks)
-    detected_question_numbers = [qno for qno, _ in blocks_full]
+    _add_seconds(timings, "block_split", t0)
+    return {
+        "pages_total": len(pages_text),
+        "extracted_text_length_per_page": [len(t) for _, t in pages_text],
+        "questions": all_questions,
+        "parse_failed": all_parse_failed,
+        "cross_suspects": all_cross_suspects,
+        "drop_reasons": drop_reasons_merged,
+        "pattern_counts": pattern_counts,
+        "block_spans": block_spans,
+        "blocks_head": [(qno, text, start, end) for (qno, text), (_, start, end) in zip(blocks_full[:10], block_spans[:10])],
+        "layout_profile": layout,
+    }
+
+
+def _dedupe_fallback_questions(qs, slug):
+    """題數 < 3 的 fallback（去頁首全文）結果：補 slug 前綴，同題號只留第一筆。"""
+    seen = set()
+    out = []
+    for q in qs:
+        uid = slug + "_" + q["id"]
+        if uid in seen:
+            continue
+        seen.add(uid)
+        q["id"] = uid
+        q["_page_no"] = 1
+        out.append(q)
+    return out
+
+
+def _parse_pages_streaming(session, slug):
+    """--stream：逐頁抽文字（session.iter_pages_text）餵 _StreamingBlockSplitter，題塊一定案就解析成題目，
+    不組全文、不保留各頁文字，記憶體只跟最長題塊有關；回傳與 _parse_pages_whole 相同，抽不到文字回傳 None。
+
+    「題數 < 3 改解析去頁首全文」的 fallback：_strip_header_footer 逐行判斷，逐頁去頁首再相接等於全文去頁首，
+    因此同時餵第二個切分器，原文已解析出 3 題即停用；單頁 PDF 原本就逐頁解析，交回 _parse_pages_whole。
+    版面輪廓同樣由前 LAYOUT_PROFILE_PAGES 頁取樣並列入報表，但題塊定案時還看不到全文、無法驗證，不套用快速路徑。"""
+    raw = _StreamingBlockSplitter()
+    cleaned = _StreamingBlockSplitter()
+    result = {"questions": [], "parse_failed": [], "cross_suspects": [], "drop_reasons": {}}
+    fallback = {"questions": [], "parse_failed": [], "cross_suspects": [], "drop_reasons": {}}
+    blocks_head = []
+    lengths = []
+    first_page = None
+    sample_pages = []
+
+    timings = session.stage_seconds
+
+    def _drain(splitter, acc, head=None):
+        t0 = time.perf_counter()
+        for qno, block_text, start, end in splitter.take():
+            if head is not None and len(head) < 10:
+                head.append((qno, block_text, start, end))
+            q = _parse_question_block(qno, block_text, slug, None, acc["drop_reasons"], acc["cross_suspects"])
+            if q is not None:
+                acc["questions"].append(q)
+        _add_seconds(timings, "block_parse", t0)
+
+    def _feed(text):
+        t0 = time.perf_counter()
+        raw.feed(text)
+        _add_seconds(timings, "block_split", t0)
+        _drain(raw, result, blocks_head)
+        if cleaned is not None:
+            t0 = time.perf_counter()
+            text = _strip_header_footer(text)
+            t0 = _add_seconds(timings, "header_strip", t0)
+            cleaned.feed(text)
+            _add_seconds(timings, "block_split", t0)
+            _drain(cleaned, fallback)
+
+    for page_no, text in session.iter_pages_text():
+        lengths.append(len(text))
+        if len(sample_pages) < LAYOUT_PROFILE_PAGES:
+            sample_pages.append((page_no, text))
+        if len(lengths) == 1:
+            first_page = text
+            continue
+        if first_page is not None:
+            _feed(first_page)
+            first_page = None
+        _feed(text)
+        if len(result["questions"]) >= 3:
+            cleaned = None
+    if session.text_failed or not lengths:
+        return None
+    if first_page is not None:
+        return _parse_pages_whole([(1, first_page)], slug, timings)
+    t0 = time.perf_counter()
+    raw.finish()
+    _add_seconds(timings, "block_split", t0)
+    _drain(raw, result, blocks_head)
+    for q in result["questions"]:
+        q["id"] = slug + "_" + q["id"]
+        q["_page_no"] = 1
+    if len(result["questions"]) < 3:
+        t0 = time.perf_counter()
+        cleaned.finish()
+        _add_seconds(timings, "block_split", t0)
+        _drain(cleaned, fallback)
+        for k, v in fallback["drop_reasons"].items():
+            result["drop_reasons"][k] = result["drop_reasons"].get(k, 0) + v
+        result["parse_failed"].extend(fallback["parse_failed"])
+        result["cross_suspects"].extend(fallback["cross_suspects"])
+        result["questions"] = _dedupe_fallback_questions(fallback["questions"], slug)
+    t0 = time.perf_counter()
+    layout = detect_layout_profile(sample_pages)
+    _add_seconds(timings, "layout_profile", t0)
+    result.update({
+        "pages_total": len(lengths),
+        "extracted_text_length_per_page": lengths,
+        "pattern_counts": raw.pattern_counts(),
+        "block_spans": raw.spans,
+        "blocks_head": blocks_head,
+        "layout_profile": layout,
+    })
+    return result
+
+
+def _text_engine_report(session):
+    """報表用的抽字資訊：實際引擎、指定值、頁數、耗時（命中抽字快取時 seconds 為讀快取時間，extract_seconds 為當初抽字時間）。"""
+    out = dict(session.text_stats)
+    for k in ("seconds", "extract_seconds"):
+        if k in out:
+            out[k] = round(out[k], 4)
+    return out
+
+
+# 報表 timings 的階段順序（未經過的階段不列出）；total 為整份 PDF 的處理時間，各階段之外的部分歸在 other
+REPORT_STAGES = (
+    "engine_probe", "text_extract", "layout_profile", "header_strip", "block_split", "block_parse", "debug_write",
+    "question_index", "batch_plan", "graphic_detect", "tight_probe", "render", "encode", "write", "encode_wait", "quality", "calibrate",
+)
+
+
+def _stage_report(session, t_start, split_before):
+    """報表用的 (timings, counters)。text_extract 取自 text_stats（命中快取時為讀快取時間）；
+    split_passes / split_chars 為本份 PDF 期間題號 regex 實際掃描的次數與字數（不含快取命中）；
+    pages_loaded 為建索引與裁切實際載入的 fitz 頁數（渲染次數見報表 crop_render）。"""
+    total = time.perf_counter() - t_start
+    stages = dict(session.stage_seconds)
+    if "seconds" in session.text_stats:
+        stages["text_extract"] = session.text_stats["seconds"]
+    timings = {}
+    for k in REPORT_STAGES:
+        if k in stages:
+            timings[k] = round(stages[k], 4)
+    timings["other"] = round(max(0.0, total - sum(stages.get(k, 0.0) for k in REPORT_STAGES)), 4)
+    timings["total"] = round(total, 4)
+    counters = dict(session.counters)
+    counters.update({
+        "split_passes": _BLOCK_SPLIT_STATS["passes"] - split_before["passes"],
+        "split_cache_hits": _BLOCK_SPLIT_STATS["cache_hits"] - split_before["cache_hits"],
+        "split_chars": _BLOCK_SPLIT_STATS["chars"] - split_before["chars"],
+        "pages_loaded": len(session._pages),
+    })
+    return timings, counters
+
+
+def _tight_crop_report(session):
+    """報表 tight_crop：是否開啟、縮小的張數、裁切前後面積（pt²）與省下的比例。"""
+    if not session.crop_settings.get("tight"):
+        return {"enabled": False}
+    stats = session.tight_stats
+    before, after = stats["area_before"], stats["area_after"]
+    return {
+        "enabled": True,
+        "crops": stats["crops"],
+        "area_before": round(before, 1),
+        "area_after": round(after, 1),
+        "area_saved_ratio": round(1.0 - after / before, 4) if before else 0.0,
+    }
+
+
+def _resolve_crop_result(slug, q_num, result):
+    """等編碼管線寫完該題圖檔，把 crop 結果與其 mismatch 裡的 PendingAsset 換成實際 src。
+    編碼或寫檔失敗時比照裁切失敗：decision 為 failed，另記 render_error。"""
+    rel, skipped_no_graphic, decision, decision_info, mismatches = result
+    if not isinstance(rel, PendingAsset):
+        return result
+    try:
+        src = rel.resolve()
+    except Exception as e:
+        for m in mismatches:
+            if m.get("image_path") is rel:
+                m["image_path"] = rel.placeholder
+        mismatches.append({"dataset_id": slug, "qno": q_num, "reason": "render_error", "source": str(e)[:200], "image_path": rel.placeholder, "image_decision": "failed"})
+        return None, False, "failed", decision_info, mismatches
+    for m in mismatches:
+        if m.get("image_path") is rel:
+            m["image_path"] = src
+    return src, skipped_no_graphic, decision, decision_info, mismatches
+
+
+def _process_pdf_session(session, report, assets_root=None):
+    """process_pdf 本體：全程共用同一個 PdfSession（抽文字、建索引、圖元偵測、裁切皆不再重開檔）。
+    報表另記各階段秒數（timings）與計數（counters），見 _stage_report。"""
+    t_start = time.perf_counter()
+    split_before = dict(_BLOCK_SPLIT_STATS)
+    timings = session.stage_seconds
+    pdf_path = session.path
+    raw_id = slug_from_filename(pdf_path.name)
+    slug = to_ascii_slug(raw_id)
+    print("    解析文字...", end=" ", flush=True)
+    if session.stream_parse:
+        parsed = _parse_pages_streaming(session, slug)
+    else:
+        pages_text = session.pages_text()
+        parsed = _parse_pages_whole(pages_text, slug, timings) if pages_text else None
+    if parsed is None:
+        print("(無文字)", flush=True)
+        report.append({
+            "file": pdf_path.name,
+            "dataset_id": slug,
+            "parsed": 0,
+            "parse_failed_count": 0,
+            "parse_failed": [],
+            "cross_question_suspects_count": 0,
+            "cross_question_suspects": [],
+            "missing_explanation_count": 0,
+            "image_questions_count": 0,
+            "missing_image_count": 0,
+            "errors": [],
+            "mismatch_images": [],
+            "error": "PDF 引擎未安裝或無法擷取文字（請 pip install pdfplumber）",
+            "text_engine": _text_engine_report(session),
+        })
+        report[-1]["timings"], report[-1]["counters"] = _stage_report(session, t_start, split_before)
+        return slug, []
+
+    pages_total = parsed["pages_total"]
+    extracted_text_length_per_page = parsed["extracted_text_length_per_page"]
+    all_questions = parsed["questions"]
+    all_parse_failed = parsed["parse_failed"]
+    all_cross_suspects = parsed["cross_suspects"]
+    drop_reasons_merged = parsed["drop_reasons"]
+    pattern_counts = parsed["pattern_counts"]
+    block_spans = parsed["block_spans"]
+    detected_question_numbers = [qno for qno, _, _ in block_spans]
     detected_question_count = pattern_counts["detected_question_count"]
     # 位置級 debug：positions、block 字數分布、疑似合併塊
     detected_question_positions = [{"qno": qno, "start": start} for qno, start, _ in block_spans[:100]]
-    question_blocks_count = len(blocks_full)
+    question_blocks_count = len(block_spans)
     lengths = [end - start for _, start, end in block_spans]
     block_span_stats = {}
     if lengths:
@@ -833,6 +2872,7 @@ def process_pdf(input_dir, output_dir, pdf_path, report, assets_root=None):
     threshold = max(1200, int(median_len * 1.5))
     suspicious_merged_blocks = [{"qno": qno, "start": start, "end": end, "char_count": end - start} for qno, start, end in block_spans if (end - start) > threshold]
 
+    t0 = time.perf_counter()
     parser_debug_dir = ROOT / "scripts" / "parser_debug"
     parser_debug_dir.mkdir(parents=True, exist_ok=True)
     safe_name = re.sub(r"[^\w\-.]", "_", pdf_path.name)
@@ -853,7 +2893,7 @@ def process_pdf(input_dir, output_dir, pdf_path, report, assets_root=None):
         "detected_question_count_B": pattern_counts["detected_question_count_B"],
         "detected_question_count_C": pattern_counts["detected_question_count_C"],
         "detected_question_count_D": pattern_counts.get("detected_question_count_D", 0),
-        "pattern_D_on_full_cleaned_count": len(d_list_raw),
+        "pattern_D_on_full_cleaned_count": pattern_counts["detected_question_count_D"],
         "detection_method": pattern_counts["detection_method"],
         "parsed_questions_count": len(all_questions),
         "drop_reasons_top": drop_reasons_merged,
@@ -865,12 +2905,13 @@ def process_pdf(input_dir, output_dir, pdf_path, report, assets_root=None):
     # 105 單檔：產出題塊預覽，方便判斷是否一 block 多題
     if "105" in pdf_path.name or slug == "y105":
         preview_lines = ["# 105 前 10 個題塊預覽（start/end + 前 120 字）", ""]
-        for idx, ((qno, block_text), (_, start, end)) in enumerate(zip(blocks_full[:10], block_spans[:10])):
+        for idx, (qno, block_text, start, end) in enumerate(parsed["blocks_head"]):
             preview_lines.append("=== block {} (qno={}, start={}, end={}, len={}) ===".format(idx, qno, start, end, end - start))
             preview_lines.append(block_text[:120].replace("\n", " "))
             preview_lines.append("")
         preview_path = parser_debug_dir / "105_blocks_preview.txt"
         preview_path.write_text("\n".join(preview_lines), encoding="utf-8")
+    _add_seconds(timings, "debug_write", t0)
 
     missing_explanation = 0
     image_questions_count = 0
@@ -879,15 +2920,21 @@ def process_pdf(input_dir, output_dir, pdf_path, report, assets_root=None):
     image_decisions = []
 
     question_index = {}
-    if assets_root:
+    if assets_root and fitz is not None:
         try:
-            import fitz
             print("建題號索引...", end=" ", flush=True)
-            question_index = build_question_index(pdf_path)
+            t0 = time.perf_counter()
+            question_index = build_question_index(session)
+            _add_seconds(timings, "question_index", t0)
             print("產圖中...", end=" ", flush=True)
         except Exception:
             pass
+    if session.batch_render and question_index:
+        t0 = time.perf_counter()
+        session.batch_pages = _plan_batch_pages(session, all_questions, question_index)
+        _add_seconds(timings, "batch_plan", t0)
 
+    crop_jobs = []
     for q in all_questions:
         if not (q.get("explanation") or "").strip():
             missing_explanation += 1
@@ -896,19 +2943,50 @@ def process_pdf(input_dir, output_dir, pdf_path, report, assets_root=None):
         if _is_suspected_image_question(q.get("question_text", ""), q.get("options") or []):
             image_questions_count += 1
             if assets_root and question_index:
-                stem = (q.get("question_text") or "").strip()
-                stem_for_cal = stem[:30]
-                force_image = should_force_image(q.get("question_text") or "")
-                rel, skipped_no_graphic, decision = _render_crop_question_image_v122(
-                    pdf_path, q_num_short, slug, assets_root, question_index, mismatch_images,
-                    question_text=stem_for_cal,
-                    force_image=force_image,
-                )
-                image_decisions.append({"dataset_id": slug, "qno": q_num_short, "image_decision": decision, "image_path": rel or ""})
-                if rel:
-                    q["assets"] = [{"type": "image", "src": rel, "alt": "題目圖"}]
-                elif not skipped_no_graphic:
-                    missing_image_count += 1
+                crop_jobs.append((q, q_num_short))
+
+    # 圖題依所在頁排序後裁切（同頁各題連續處理，整頁點陣與頁面資料只載一次）；同頁內與找不到頁的題目維持原順序。
+    # 報表（image_decisions、mismatch_images）與題目 assets 仍依題目順序組出，與逐題處理相同
+    def _crop_page(job):
+        qno = job[1]
+        hit = question_index.first_page(int(qno)) if qno.isdigit() else None
+        return hit[0] if hit is not None else session.page_count()
+
+    crop_results = {}
+    for i in sorted(range(len(crop_jobs)), key=lambda i: _crop_page(crop_jobs[i])):
+        q, q_num_short = crop_jobs[i]
+        decision_info = {}
+        mismatches = []
+        rel, skipped_no_graphic, decision = _render_crop_question_image_v122(
+            session, q_num_short, slug, assets_root, question_index, mismatches,
+            question_text=(q.get("question_text") or "").strip()[:30],
+            force_image=should_force_image(q.get("question_text") or ""),
+            decision_info=decision_info,
+        )
+        crop_results[i] = (rel, skipped_no_graphic, decision, decision_info, mismatches)
+    session.counters["crop_pages"] = len(set(_crop_page(job) for job in crop_jobs) - {session.page_count()})
+    if session.encode_pipeline is not None:
+        t0 = time.perf_counter()
+        for i in range(len(crop_jobs)):
+            crop_results[i] = _resolve_crop_result(slug, crop_jobs[i][1], crop_results[i])
+        waited = time.perf_counter() - t0
+        _add_seconds(timings, "encode_wait", t0)
+        session.encode_pipeline.stats["wait_seconds"] += waited
+
+    for i, (q, q_num_short) in enumerate(crop_jobs):
+        rel, skipped_no_graphic, decision, decision_info, mismatches = crop_results[i]
+        mismatch_images.extend(mismatches)
+        mismatch_images.extend(_crop_quality_mismatches(slug, q_num_short, rel, decision_info.get("quality")))
+        entry = {"dataset_id": slug, "qno": q_num_short, "image_decision": decision, "image_path": rel or ""}
+        entry.update(decision_info)
+        image_decisions.append(entry)
+        if rel:
+            asset = {"type": "image", "src": rel, "alt": "題目圖"}
+            if decision_info.get("webp_path"):
+                asset["webp"] = decision_info["webp_path"]
+            q["assets"] = [asset]
+        elif not skipped_no_graphic:
+            missing_image_count += 1
 
     report.append({
         "file": pdf_path.name,
@@ -924,11 +3002,552 @@ def process_pdf(input_dir, output_dir, pdf_path, report, assets_root=None):
         "errors": [{"qno": m["qno"], "reason": m["reason"], "image_path": m.get("image_path", ""), "image_decision": m.get("image_decision", "")} for m in mismatch_images],
         "mismatch_images": mismatch_images,
         "image_decisions": image_decisions,
+        "crop_render": dict(session.render_stats, batch_render=session.batch_render),
+        "asset_bytes": dict(session.asset_stats, optimize=bool(session.asset_settings.get("optimize"))),
+        "tight_crop": _tight_crop_report(session),
+        "crop_quality": dict(session.quality_stats, seconds=round(session.quality_stats["seconds"], 4)),
+        "encode_pipeline": session.encode_pipeline.report() if session.encode_pipeline is not None else {"workers": 0},
+        "text_engine": _text_engine_report(session),
+        "layout_profile": parsed["layout_profile"],
+    })
+    session.counters.update({
+        "pages": pages_total,
+        "text_chars": sum(extracted_text_length_per_page),
+        "blocks": question_blocks_count,
+        "questions": len(all_questions),
+        "index_entries": len(question_index),
     })
+    report[-1]["timings"], report[-1]["counters"] = _stage_report(session, t_start, split_before)
     print("", flush=True)  # 換行，讓 main 的輸出另起一行
     return slug, all_questions
 
 
+# 壓縮題庫格式：questions_<slug>.pack.json，與 questions_<slug>.json 同內容。
+# 欄位導向（每個欄位一個陣列），重複值多的字串欄位改存共用字串表索引，不縮排；前端 fetchDatasetFile 直接解開。
+PACK_FORMAT = "mlh-questions-pack"
+PACK_VERSION = 1
+
+
+def pack_questions(questions):
+    """題目列表 → 欄位導向 dict。shapes 記錄各題的鍵順序（缺欄位的題目用另一個 shape），unpack 後與原 JSON 逐鍵同序。"""
+    shapes = []
+    shape_ids = {}
+    row_shapes = []
+    for q in questions:
+        keys = tuple(q.keys())
+        if keys not in shape_ids:
+            shape_ids[keys] = len(shapes)
+            shapes.append(list(keys))
+        row_shapes.append(shape_ids[keys])
+    columns_order = []
+    for shape in shapes:
+        for k in shape:
+            if k not in columns_order:
+                columns_order.append(k)
+
+    strings = []
+    string_ids = {}
+    columns = {}
+    n = len(questions)
+    for k in columns_order:
+        values = [q.get(k) for q in questions]
+        present = [v for q, v in zip(questions, values) if k in q]
+        # 全為字串且重複多（相異值 ≤ 半數）才字典編碼；缺欄位的列填 0，unpack 時依 shape 略過
+        if present and all(isinstance(v, str) for v in present) and len(set(present)) * 2 <= len(present):
+            idx = []
+            for q, v in zip(questions, values):
+                if k not in q:
+                    idx.append(0)
+                    continue
+                if v not in string_ids:
+                    string_ids[v] = len(strings)
+                    strings.append(v)
+                idx.append(string_ids[v])
+            columns[k] = {"s": idx}
+        else:
+            columns[k] = values
+    packed = {
+        "format": PACK_FORMAT,
+        "version": PACK_VERSION,
+        "count": n,
+        "shapes": shapes,
+        "strings": strings,
+        "columns": columns,
+    }
+    if len(shapes) > 1:
+        packed["shape"] = row_shapes
+    return packed
+
+
+def unpack_questions(packed):
+    """pack_questions 的反函式；格式或版本不符時 raise ValueError。"""
+    if not isinstance(packed, dict) or packed.get("format") != PACK_FORMAT:
+        raise ValueError("不是 {} 格式".format(PACK_FORMAT))
+    if packed.get("version") != PACK_VERSION:
+        raise ValueError("不支援的 pack 版本: {}".format(packed.get("version")))
+    n = packed["count"]
+    shapes = packed["shapes"]
+    row_shapes = packed.get("shape") or [0] * n
+    strings = packed["strings"]
+    columns = {}
+    for k, col in packed["columns"].items():
+        columns[k] = [strings[i] for i in col["s"]] if isinstance(col, dict) else col
+        if len(columns[k]) != n:
+            raise ValueError("欄位 {} 長度 {} 與 count {} 不符".format(k, len(columns[k]), n))
+    out = []
+    for i in range(n):
+        out.append({k: columns[k][i] for k in shapes[row_shapes[i]]})
+    return out
+
+
+def packed_file_name(questions_file):
+    return questions_file[:-len(".json")] + ".pack.json"
+
+
+# 「全部題庫」預先合併檔：前端冷啟動只抓一次，且每題帶好 dedupe_key / stratum，不必逐題雜湊。
+# 計算方式須與 app/lib/questions.ts 的 normalizeText / getDedupeKey / getStratumKey 完全一致。
+ALL_BUNDLE_FILE = "questions_all.pack.json"
+# JS 正規式 \s 的字元集合（與 Python 的 \s 略有不同，明列以免雜湊對不上）
+_JS_WHITESPACE = "\t\n\x0b\x0c\r \u00a0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+_JS_WS_RE = re.compile("[" + _JS_WHITESPACE + "]+")
+_JS_TRAILING_PERIOD_RE = re.compile("[。．.][" + _JS_WHITESPACE + "]*$")
+
+
+def _normalize_dedupe_text(s):
+    if not s or not isinstance(s, str):
+        return ""
+    s = _JS_WS_RE.sub(" ", s)
+    s = s.replace("\u3000", " ").replace("\u00a0", " ")
+    s = _JS_TRAILING_PERIOD_RE.sub("", s)
+    return s.strip(" ")
+
+
+def dedupe_key(q):
+    """同 getDedupeKey：題幹+選項正規化後以 UTF-16 code unit 做 31 進位雜湊（mod 2^32），回傳十進位字串。"""
+    text = _normalize_dedupe_text(q.get("question_text"))
+    opts = "|".join(_normalize_dedupe_text(o) for o in (q.get("options") or []))
+    raw = (text + "|" + opts).encode("utf-16-le")
+    h = 0
+    for i in range(0, len(raw), 2):
+        h = (h * 31 + (raw[i] | (raw[i + 1] << 8))) & 0xFFFFFFFF
+    return str(h)
+
+
+def stratum_key(q):
+    """同 getStratumKey：id 最後一個 "_" 之前（即題庫 slug）。"""
+    qid = q.get("id") or ""
+    idx = qid.rfind("_")
+    return qid[:idx] if idx >= 0 else qid
+
+
+def build_all_bundle(dataset_questions):
+    """依 index 順序合併各題庫（同 fetchAllQuestions("ALL")：只收 single、同 id 取第一筆），每題附 dedupe_key / stratum。
+    不依題幹去重：錯題本與結果頁以 id 查題，題幹重複的題目仍需保留，前端抽題時再用 dedupe_key 去重。"""
+    out = []
+    seen = set()
+    for questions in dataset_questions:
+        for q in questions:
+            if q.get("type") != "single" or q.get("id") in seen:
+                continue
+            seen.add(q.get("id"))
+            item = dict(q)
+            item["dedupe_key"] = dedupe_key(q)
+            item["stratum"] = stratum_key(q)
+            out.append(item)
+    return out
+
+
+# 增量匯入：PDF 內容 sha256 + 解析器版本 + 裁切參數皆未變時，沿用上次的 questions_<slug>.json、圖檔與報表
+PARSER_VERSION = "1.3.15"
+IMPORT_CACHE_VERSION = 1
+
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(str(path), "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _import_fingerprint(pdf_path, assets_enabled, asset_settings=None, text_engine=None, crop_settings=None, cache_dir=None):
+    """判斷能否沿用上次結果的鍵；未安裝 PyMuPDF 時 crop_settings / asset_settings 為 None（該次未產圖，裝上後需重跑）。
+    text_engine 記實際使用的引擎與版本（auto 先經 resolve_text_engine 挑選，試抽走 cache_dir 抽字快取），
+    auto 與直接指定同一引擎視為相同，換引擎則重新解析。"""
+    engine, _ = resolve_text_engine(pdf_path, text_engine or PDF_ENGINE, cache_dir)
+    return {
+        "sha256": _file_sha256(pdf_path),
+        "size": pdf_path.stat().st_size,
+        "parser_version": PARSER_VERSION,
+        "crop_settings": dict(crop_settings or CROP_SETTINGS) if assets_enabled else None,
+        "asset_settings": dict(asset_settings or ASSET_SETTINGS) if assets_enabled else None,
+        "text_engine": _text_engine_id(engine) if engine else None,
+    }
+
+
+def load_import_cache(cache_path):
+    """讀 scripts/import_cache.json；不存在或格式不符則回傳空快取。"""
+    empty = {"version": IMPORT_CACHE_VERSION, "items": {}}
+    try:
+        data = json.loads(read_text(cache_path))
+    except (IOError, OSError, ValueError):
+        return empty
+    if not isinstance(data, dict) or data.get("version") != IMPORT_CACHE_VERSION or not isinstance(data.get("items"), dict):
+        return empty
+    return data
+
+
+def _cached_result(entry, fingerprint, output_dir, public_root):
+    """快取命中且產物（題庫檔內容、圖檔）皆仍在時回傳 (slug, questions, report_entries)，否則 None。"""
+    if not entry:
+        return None
+    for key in ("sha256", "size", "parser_version", "crop_settings", "asset_settings", "text_engine"):
+        if entry.get(key) != fingerprint[key]:
+            return None
+    q_file = output_dir / entry.get("questions_file", "")
+    if not q_file.is_file() or _file_sha256(q_file) != entry.get("questions_sha256"):
+        return None
+    for src in entry.get("assets", []):
+        if not (public_root / src.lstrip("/")).is_file():
+            return None
+    try:
+        questions = json.loads(read_text(q_file))
+    except ValueError:
+        return None
+    return entry["slug"], questions, entry.get("report", [])
+
+
+# 發佈：題庫檔先寫進與輸出目錄同層的暫存目錄，全部寫完後整個目錄改名為版本目錄 public/data/v/<data_version>/
+# （一次 rename，原子），最後才換 meta.json，其 dir 指向該版本目錄。
+# 保證：前端先讀 meta.json、再從 dir 取 index.json 與題庫檔，讀到的一定是同一版。版本目錄發佈後不再修改，
+# 舊版目錄保留 DATA_VERSIONS_KEEP 份，先讀了舊 meta.json 的頁面仍取得到整套舊版；匯入途中或中斷時 public/data 維持上一版。
+# public/data 頂層另留目前版本的平面檔（版本目錄內同檔的硬連結，依 PUBLISH_LAST 順序逐檔 os.replace），
+# 供匯入快取、驗證腳本與尚未更新的舊版前端讀取；平面檔各自原子替換，但換檔途中整批可能新舊混合
+PUBLISH_MANIFEST = ".publish.json"
+# 平面檔換檔順序：題庫檔 → index.json → meta.json
+PUBLISH_LAST = ("index.json", "meta.json")
+# 版本目錄（相對 output_dir）與保留份數（含目前版本）
+DATA_VERSIONS_DIR = "v"
+DATA_VERSIONS_KEEP = 2
+_DATA_VERSION_NAME = re.compile(r"^(\d{4}-\d{2}-\d{2}-\d{4})(?:-(\d+))?$")
+# 備份保留份數（scripts/backup/<timestamp>/），--backup-keep 可調；0＝不備份
+BACKUP_KEEP = 10
+_BACKUP_SNAPSHOT_NAME = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2}(?:-\d+)?$")
+
+
+def staging_dir_for(output_dir):
+    """output_dir 的暫存目錄（同層，os.replace 不跨檔案系統）。"""
+    return output_dir.parent / ".{}.staging".format(output_dir.name)
+
+
+def new_data_version(output_dir):
+    """本次發佈的 data_version（到分鐘）；同一分鐘已有版本目錄時加 -2、-3…"""
+    base = datetime.now().strftime("%Y-%m-%d-%H%M")
+    version = base
+    n = 2
+    while (output_dir / DATA_VERSIONS_DIR / version).exists():
+        version = "{}-{}".format(base, n)
+        n += 1
+    return version
+
+
+def published_version_dir(output_dir):
+    """目前 meta.json 的 dir 指向、且含 index.json 的版本目錄；舊版平面發佈（無 dir）回傳 None。"""
+    try:
+        rel = json.loads(read_text(output_dir / PUBLISH_LAST[-1])).get("dir")
+    except (IOError, OSError, ValueError):
+        return None
+    if not rel or not (output_dir / rel / "index.json").is_file():
+        return None
+    return output_dir / rel
+
+
+def _link_replace(src, dest):
+    """以 src 的硬連結原子替換 dest（不支援硬連結時複製）。"""
+    tmp = dest.with_name(".{}.tmp".format(dest.name))
+    if tmp.exists():
+        tmp.unlink()
+    try:
+        os.link(str(src), str(tmp))
+    except OSError:
+        shutil.copyfile(str(src), str(tmp))
+    os.replace(str(tmp), str(dest))
+
+
+def _publish_flat(version_dir, output_dir):
+    """依版本目錄內的 PUBLISH_MANIFEST 逐檔換上 output_dir 頂層平面檔（meta.json 最後），完成後刪清單；回傳換上的檔數。"""
+    manifest = json.loads(read_text(version_dir / PUBLISH_MANIFEST))
+    published = 0
+    for name in manifest.get("files", []):
+        if (version_dir / name).is_file():
+            _link_replace(version_dir / name, output_dir / name)
+            published += 1
+    (version_dir / PUBLISH_MANIFEST).unlink()
+    return published
+
+
+def recover_staging(output_dir):
+    """處理上次匯入留下的暫存：暫存目錄已記發佈清單（PUBLISH_MANIFEST）者改名為版本目錄再補完，否則整個丟棄；
+    版本目錄內還留著清單者（換平面檔途中中斷）依清單補完，再刪除多餘的舊版本目錄。回傳補發佈的檔數。"""
+    staging = staging_dir_for(output_dir)
+    if staging.is_dir():
+        try:
+            manifest = json.loads(read_text(staging / PUBLISH_MANIFEST))
+        except (IOError, OSError, ValueError):
+            manifest = None
+        if manifest and manifest.get("dir") and not (output_dir / manifest["dir"]).exists():
+            (output_dir / manifest["dir"]).parent.mkdir(parents=True, exist_ok=True)
+            os.replace(str(staging), str(output_dir / manifest["dir"]))
+        else:
+            shutil.rmtree(str(staging), ignore_errors=True)
+    published = 0
+    for version_dir in _data_version_dirs(output_dir):
+        if (version_dir / PUBLISH_MANIFEST).is_file():
+            published += _publish_flat(version_dir, output_dir)
+    current = published_version_dir(output_dir)
+    if published and current is not None:
+        _prune_data_versions(output_dir, current)
+    return published
+
+
+def _data_version_dirs(output_dir):
+    """output_dir/v 下的版本目錄，依 data_version 由舊到新。"""
+    versions_root = output_dir / DATA_VERSIONS_DIR
+    dirs = []
+    for d in versions_root.iterdir() if versions_root.is_dir() else []:
+        m = _DATA_VERSION_NAME.match(d.name)
+        if m and d.is_dir():
+            dirs.append(((m.group(1), int(m.group(2) or 1)), d))
+    return [d for _, d in sorted(dirs)]
+
+
+def _prune_data_versions(output_dir, current):
+    """只留最新 DATA_VERSIONS_KEEP 份版本目錄（current 一定保留）；回傳刪除數。"""
+    older = [d for d in _data_version_dirs(output_dir) if d != current]
+    removed = older[:max(0, len(older) - (DATA_VERSIONS_KEEP - 1))]
+    for d in removed:
+        shutil.rmtree(str(d), ignore_errors=True)
+    return len(removed)
+
+
+def _same_bytes(a, b):
+    if not b.is_file() or a.stat().st_size != b.stat().st_size:
+        return False
+    with open(str(a), "rb") as fa, open(str(b), "rb") as fb:
+        return fa.read() == fb.read()
+
+
+def publish_staged(staging, output_dir, backup_root=None, keep=BACKUP_KEEP, assets_root=None):
+    """把暫存目錄發佈成 staging 內 meta.json 的 dir 所指的版本目錄，回傳統計 dict（data_version 為發佈後 meta.json 的版本）。
+    與現行平面檔比對：meta.json 每次都帶新 data_version，不算變更；其餘檔都沒變且已有版本目錄時沿用現行 meta.json，
+    不發佈新版本、不做快照，前端快取也不失效。有變更時：keep > 0 先對現行 output_dir（與其引用的 assets_root/h 圖檔）做備份快照；
+    內容沒變的檔換成現行平面檔的硬連結（版本目錄不重複佔空間）；記下 PUBLISH_MANIFEST 後整個暫存目錄改名為版本目錄，
+    再依清單換平面檔（meta.json 最後），途中中斷時下次 recover_staging 補完；最後刪除超過 DATA_VERSIONS_KEEP 的舊版本目錄。"""
+    meta_name = PUBLISH_LAST[-1]
+    names = sorted(f.name for f in staging.iterdir() if f.is_file() and f.name != PUBLISH_MANIFEST)
+    changed = []
+    unchanged = []
+    for name in names:
+        if _same_bytes(staging / name, output_dir / name):
+            unchanged.append(name)
+        else:
+            changed.append(name)
+    if changed == [meta_name] and published_version_dir(output_dir) is not None:
+        changed = []
+        unchanged.append(meta_name)
+    changed.sort(key=lambda n: (PUBLISH_LAST.index(n) + 1 if n in PUBLISH_LAST else 0, n))
+    stats = {
+        "changed": len(changed),
+        "unchanged": len(unchanged),
+        "bytes_published": sum((staging / n).stat().st_size for n in changed),
+        "backup": None,
+        "version_dir": None,
+        "pruned_versions": 0,
+    }
+    if changed:
+        if backup_root is not None and keep > 0 and any(f.is_file() for f in output_dir.iterdir()):
+            stats["backup"] = snapshot_backup(output_dir, backup_root, keep, assets_root)
+        for name in unchanged:
+            _link_replace(output_dir / name, staging / name)
+        rel = json.loads(read_text(staging / meta_name))["dir"]
+        write_text(staging / PUBLISH_MANIFEST, json.dumps({"dir": rel, "files": changed}, ensure_ascii=False))
+        version_dir = output_dir / rel
+        version_dir.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(str(staging), str(version_dir))
+        _publish_flat(version_dir, output_dir)
+        stats["version_dir"] = str(version_dir)
+        stats["pruned_versions"] = _prune_data_versions(output_dir, version_dir)
+    else:
+        shutil.rmtree(str(staging), ignore_errors=True)
+    try:
+        stats["data_version"] = json.loads(read_text(output_dir / meta_name)).get("data_version")
+    except (IOError, OSError, ValueError):
+        stats["data_version"] = None
+    return stats
+
+
+def _backup_object(objects, path, data=None):
+    """把 path 的內容存進 objects/<sha256 前 2 碼>/<sha256>，回傳 (sha256, 新增位元組數)。
+    data 為 None 時（圖檔）以硬連結收進 objects（不佔新空間，新增 0），不支援時才複製；已有同內容的 object 則不動。"""
+    if data is None:
+        with open(str(path), "rb") as fh:
+            sha = hashlib.sha256(fh.read()).hexdigest()
+    else:
+        sha = hashlib.sha256(data).hexdigest()
+    obj = objects / sha[:2] / sha
+    if obj.is_file():
+        return sha, 0
+    obj.parent.mkdir(parents=True, exist_ok=True)
+    if data is not None:
+        _write_file_atomic(obj, data)
+        return sha, len(data)
+    try:
+        os.link(str(path), str(obj))
+        return sha, 0
+    except OSError:
+        shutil.copyfile(str(path), str(obj))
+    return sha, obj.stat().st_size
+
+
+def _link_backup_object(obj, dest):
+    try:
+        os.link(str(obj), str(dest))
+    except OSError:
+        shutil.copyfile(str(obj), str(dest))
+
+
+def snapshot_backup(output_dir, backup_root, keep=BACKUP_KEEP, assets_root=None):
+    """備份 output_dir 現有平面檔與 meta.json 所指的版本目錄至 backup_root/<timestamp>/public_data/（可直接整包複製回去）。
+    檔案內容存一份在 backup_root/objects/<sha256 前 2 碼>/<sha256>，快照內各檔為其硬連結（不支援時才複製），
+    內容沒變的檔不再佔空間；<timestamp>/manifest.json 記檔名 → sha256。
+    assets_root 有給時，題庫引用的 assets_root/h 圖檔也收進 objects，並連結到 <timestamp>/public_assets_h/，manifest 的 assets 記檔名 → sha256
+    （_prune_asset_store 不會刪保留快照引用的圖，這份是 public/assets/h 被手動清掉時的備援）。之後只留最新 keep 份，並刪除已無快照引用的 objects。"""
+    objects = backup_root / "objects"
+    ts = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+    snap_root = backup_root / ts
+    n = 2
+    while snap_root.exists():
+        snap_root = backup_root / "{}-{}".format(ts, n)
+        n += 1
+    snap_dir = snap_root / "public_data"
+    snap_dir.mkdir(parents=True)
+    manifest = {}
+    new_bytes = 0
+    for f in sorted(output_dir.iterdir()):
+        if not f.is_file():
+            continue
+        with open(str(f), "rb") as fh:
+            sha, added = _backup_object(objects, f, fh.read())
+        new_bytes += added
+        _link_backup_object(objects / sha[:2] / sha, snap_dir / f.name)
+        manifest[f.name] = sha
+    version_dir = published_version_dir(output_dir)
+    if version_dir is not None:
+        rel = version_dir.relative_to(output_dir).as_posix()
+        (snap_dir / rel).mkdir(parents=True)
+        for f in sorted(version_dir.iterdir()):
+            if not f.is_file():
+                continue
+            with open(str(f), "rb") as fh:
+                sha, added = _backup_object(objects, f, fh.read())
+            new_bytes += added
+            _link_backup_object(objects / sha[:2] / sha, snap_dir / rel / f.name)
+            manifest[rel + "/" + f.name] = sha
+    assets = {}
+    if assets_root is not None:
+        store_dir = Path(assets_root) / "h"
+        names = sorted(n for n in _store_assets_referenced(output_dir) if (store_dir / n).is_file())
+        if names:
+            assets_dir = snap_root / "public_assets_h"
+            assets_dir.mkdir()
+            for name in names:
+                sha, added = _backup_object(objects, store_dir / name)
+                new_bytes += added
+                _link_backup_object(objects / sha[:2] / sha, assets_dir / name)
+                assets[name] = sha
+    write_text(snap_root / "manifest.json", json.dumps({"files": manifest, "assets": assets}, ensure_ascii=False, indent=2))
+    pruned = _prune_backups(backup_root, keep)
+    return {"path": str(snap_dir), "files": len(manifest), "assets": len(assets), "new_bytes": new_bytes, "pruned": pruned}
+
+
+def _prune_backups(backup_root, keep):
+    """只留最新 keep 份快照（含舊版整包複製的備份），再刪除沒有任何快照 manifest 引用的 objects；回傳刪除的快照數。"""
+    snaps = sorted(d for d in backup_root.iterdir() if d.is_dir() and _BACKUP_SNAPSHOT_NAME.match(d.name))
+    removed = snaps[:-keep] if keep > 0 else []
+    for d in removed:
+        shutil.rmtree(str(d), ignore_errors=True)
+    referenced = set()
+    for d in snaps[len(removed):]:
+        try:
+            manifest = json.loads(read_text(d / "manifest.json"))
+        except (IOError, OSError, ValueError):
+            continue
+        referenced.update(manifest.get("files", {}).values())
+        referenced.update(manifest.get("assets", {}).values())
+    objects = backup_root / "objects"
+    if objects.is_dir():
+        for sub in objects.iterdir():
+            for obj in sub.iterdir() if sub.is_dir() else []:
+                if obj.name not in referenced:
+                    obj.unlink()
+    return len(removed)
+
+
+def _process_pdf_group(root, pdf_paths, assets_root, batch_render=True, asset_settings=None, stream_parse=False, text_cache=True, text_engine=None, profile=False, encode_workers=None, crop_settings=None):
+    """--jobs worker：依序處理同一 slug 的一組 PDF，回傳 [(slug, questions, report_entries), ...]。
+    同 slug 的 PDF 會寫同一個資產資料夾，放在同一個 worker 內依原順序處理才與逐份執行一致。"""
+    global ROOT
+    ROOT = Path(root)  # spawn 模式下子行程會重新 import，需帶回 --root
+    out = []
+    for pdf_path in pdf_paths:
+        report = []
+        slug, questions = process_pdf(None, None, Path(pdf_path), report, assets_root=assets_root, batch_render=batch_render, asset_settings=asset_settings, stream_parse=stream_parse, text_cache=text_cache, text_engine=text_engine, profile=profile, encode_workers=encode_workers, crop_settings=crop_settings)
+        out.append((slug, questions, report))
+    return out
+
+
+def _iter_processed_pdfs(pdf_files, assets_root, jobs, cached=None, batch_render=True, asset_settings=None, stream_parse=False, text_cache=True, text_engine=None, profile=False, encode_workers=None, crop_settings=None):
+    """依 pdf_files 順序逐份產出 (pdf_path, slug, questions, report_entries)。
+    cached（檔名 -> 上次結果）命中者直接沿用不重新解析。
+    jobs > 1 時以 ProcessPoolExecutor 平行處理，但仍按原順序回傳，合併結果與逐份執行逐位元相同。"""
+    cached = cached or {}
+    n_total = len(pdf_files)
+    todo = [p for p in pdf_files if p.name not in cached]
+    if jobs <= 1 or len(todo) <= 1:
+        for idx, pdf_path in enumerate(pdf_files, 1):
+            if pdf_path.name in cached:
+                print("略過 ({}/{}): {}（未變更，沿用上次結果）".format(idx, n_total, pdf_path.name), flush=True)
+                slug, questions, report = cached[pdf_path.name]
+                yield pdf_path, slug, questions, report
+                continue
+            print("處理中 ({}/{}): {} ...".format(idx, n_total, pdf_path.name), flush=True)
+            report = []
+            slug, questions = process_pdf(None, None, pdf_path, report, assets_root=assets_root, batch_render=batch_render, asset_settings=asset_settings, stream_parse=stream_parse, text_cache=text_cache, text_engine=text_engine, profile=profile, encode_workers=encode_workers, crop_settings=crop_settings)
+            yield pdf_path, slug, questions, report
+        return
+    groups = {}
+    for pdf_path in todo:
+        slug = to_ascii_slug(slug_from_filename(pdf_path.name))
+        groups.setdefault(slug, []).append(pdf_path)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        for slug, paths in groups.items():
+            futures[slug] = pool.submit(_process_pdf_group, str(ROOT), [str(p) for p in paths], assets_root, batch_render, asset_settings, stream_parse, text_cache, text_engine, profile, encode_workers, crop_settings)
+        done = {}
+        for idx, pdf_path in enumerate(pdf_files, 1):
+            if pdf_path.name in cached:
+                print("略過 ({}/{}): {}（未變更，沿用上次結果）".format(idx, n_total, pdf_path.name), flush=True)
+                slug, questions, report = cached[pdf_path.name]
+                yield pdf_path, slug, questions, report
+                continue
+            slug = to_ascii_slug(slug_from_filename(pdf_path.name))
+            if slug not in done:
+                done[slug] = list(futures[slug].result())
+            print("完成 ({}/{}): {}".format(idx, n_total, pdf_path.name), flush=True)
+            got_slug, questions, report = done[slug].pop(0)
+            yield pdf_path, got_slug, questions, report
+
+
 def main():
     global ROOT
     parser = argparse.ArgumentParser(description="MLH Quiz: PDF → JSON 題庫")
@@ -937,6 +3556,21 @@ def main():
     parser.add_argument("--root", default=None, help="專案根目錄（供 Colab 指定，如 /content/mlh）")
     parser.add_argument("--debug", action="store_true", help="僅輸出第一份 PDF 前兩頁文字到 scripts/debug_pdf_sample.txt，不寫入題庫")
     parser.add_argument("--pdf", default=None, help="只處理指定檔名的單一 PDF（例如 105-126002工程管理學科.pdf）")
+    parser.add_argument("--force", action="store_true", help="忽略 scripts/import_cache.json，所有 PDF 一律重新解析與產圖")
+    parser.add_argument("--only", action="append", default=[], metavar="SLUG", help="強制重新匯入指定 slug（可重複，例如 --only y105 --only zonghe_a）；其餘照增量規則")
+    parser.add_argument("--no-batch-render", action="store_true", help="停用批次裁切（每題各自 clip 渲染）；輸出相同，僅供比對/除錯")
+    parser.add_argument("--no-optimize-assets", action="store_true", help="停用圖檔最佳化（直接寫 MuPDF 原始 PNG）")
+    parser.add_argument("--webp", action="store_true", help="圖題另存無損 WebP（題目 assets 帶 webp 欄位，前端優先載入）")
+    parser.add_argument("--tight-crop", action="store_true", help="緊貼裁切：先低解析探測題區，依墨水投影只渲染本題實際內容框（不含下一題與多餘留白）；報表 tight_crop 記省下的面積")
+    parser.add_argument("--asset-store", choices=("hash", "slug"), default=ASSET_SETTINGS["store"], help="圖檔存放：hash＝public/assets/h/<內容雜湊>.png 跨題庫去重（預設）；slug＝舊版 public/assets/q/<slug>/Qxxx.png")
+    parser.add_argument("--asset-max-kb", type=int, default=None, help="單張圖檔位元組上限（KB，預設 {}）；超過先減色再縮圖".format(ASSET_SETTINGS["max_bytes"] // 1024))
+    parser.add_argument("--stream", action="store_true", help="串流解析：逐頁抽文字、逐頁切題並產出題目，不組全文（大型彙編 PDF 省記憶體）；輸出與預設相同")
+    parser.add_argument("--engine", choices=("auto",) + TEXT_ENGINES, default=None, help="抽字引擎：預設 pdfplumber（未安裝時 fitz，與舊版輸出相同）；auto＝各引擎試抽前 {} 頁，取題號密度合格中最快者（抽出的文字可能與 pdfplumber 不同）".format(ENGINE_PROBE_PAGES))
+    parser.add_argument("--no-text-cache", action="store_true", help="不讀寫 scripts/.cache 抽字快取（每份 PDF 重新抽文字）")
+    parser.add_argument("--profile", action="store_true", help="以 cProfile 分析每份重新解析的 PDF，寫出 scripts/profile/<檔名>.pstats 與 .txt 摘要（報表 profile 欄位記路徑）")
+    parser.add_argument("--backup-keep", type=int, default=BACKUP_KEEP, help="scripts/backup 保留的快照份數（預設 {}；0＝不備份）".format(BACKUP_KEEP))
+    parser.add_argument("--jobs", type=int, default=1, help="平行處理 PDF 的行程數（預設 1＝逐份處理；0＝CPU 核心數），輸出與逐份處理相同")
+    parser.add_argument("--encode-workers", type=int, default=None, help="每個行程壓縮 / 寫入圖檔的執行緒數，與渲染重疊（預設依核心數與 --jobs 自動決定，最多 {}；0＝主執行緒逐張處理），輸出相同".format(ENCODE_WORKERS_MAX))
     args = parser.parse_args()
 
     if args.root:
@@ -944,6 +3578,10 @@ def main():
     input_dir = ROOT / args.input_dir
     output_dir = ROOT / args.output_dir
     output_dir.mkdir(parents=True, exist_ok=True)
+    # 上次匯入留下的暫存目錄：發佈途中中斷者補完，其餘丟棄（增量快取比對的是已發佈的檔案）
+    recovered = recover_staging(output_dir)
+    if recovered:
+        print("上次匯入於發佈途中中斷，已補完 {} 個檔案".format(recovered), flush=True)
 
     if PDF_ENGINE is None:
         print("請先安裝 PDF 套件（擇一）：")
@@ -951,6 +3589,10 @@ def main():
         print("  pip install pymupdf       # 需 Python 3.7+ 且可編譯")
         return 1
 
+    if args.engine not in (None, "auto") and args.engine not in available_text_engines():
+        print("指定的抽字引擎 {} 未安裝（已安裝：{}）".format(args.engine, ", ".join(available_text_engines())))
+        return 1
+
     if not input_dir.is_dir():
         print("找不到輸入目錄: {}".format(input_dir))
         return 1
@@ -968,7 +3610,7 @@ def main():
 
     if args.debug:
         sample_path = pdf_files[0]
-        pages_text = extract_text_from_pdf(sample_path)
+        pages_text = extract_text_from_pdf(sample_path, None if args.no_text_cache else text_cache_dir(), args.engine)
         out_path = ROOT / "scripts" / "debug_pdf_sample.txt"
         lines = ["=== {} (共 {} 頁) ===\n".format(sample_path.name, len(pages_text))]
         for page_no, text in pages_text[:2]:
@@ -985,58 +3627,138 @@ def main():
 
     assets_root = ROOT / "public" / "assets"
     assets_root.mkdir(parents=True, exist_ok=True)
-    try:
-        import fitz
+    assets_enabled = fitz is not None
+    if assets_enabled:
         print("（已偵測到 PyMuPDF，將為圖題產出 PNG）", flush=True)
-    except ImportError:
+    else:
         print("（未安裝 PyMuPDF，圖題將無法產圖；請在 Colab 或 Python 3.7+ 環境執行以產圖）", flush=True)
 
+    asset_settings = dict(ASSET_SETTINGS)
+    asset_settings["optimize"] = not args.no_optimize_assets
+    asset_settings["webp"] = bool(args.webp)
+    asset_settings["store"] = args.asset_store
+    if args.asset_max_kb:
+        asset_settings["max_bytes"] = args.asset_max_kb * 1024
+    crop_settings = dict(CROP_SETTINGS)
+    crop_settings["tight"] = bool(args.tight_crop)
+
     n_total = len(pdf_files)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    jobs = min(jobs, n_total)
     print("共 {} 份 PDF，預估需 10～20 分鐘，請勿中斷。".format(n_total), flush=True)
+    if jobs > 1:
+        print("平行模式：{} 個行程".format(jobs), flush=True)
+    encode_workers = args.encode_workers if args.encode_workers is not None else default_encode_workers(jobs)
+    encode_workers = max(0, encode_workers)
+
+    # 增量匯入：內容/解析器/裁切參數皆未變的 PDF 直接沿用上次產物；--force 全部重跑，--only 指定 slug 重跑
+    cache_path = ROOT / "scripts" / "import_cache.json"
+    import_cache = load_import_cache(cache_path)
+    only = set(args.only)
+    fingerprints = {}
+    cached = {}
+    for pdf_path in pdf_files:
+        fingerprints[pdf_path.name] = _import_fingerprint(
+            pdf_path, assets_enabled, asset_settings, args.engine, crop_settings,
+            None if args.no_text_cache else text_cache_dir())
+        if args.force or to_ascii_slug(slug_from_filename(pdf_path.name)) in only:
+            continue
+        hit = _cached_result(import_cache["items"].get(pdf_path.name), fingerprints[pdf_path.name], output_dir, ROOT / "public")
+        if hit:
+            cached[pdf_path.name] = hit
+    if cached:
+        print("增量匯入：{} 份未變更沿用上次結果，{} 份重新解析（--force 可全部重跑）".format(len(cached), n_total - len(cached)), flush=True)
 
-    # 匯入會覆蓋 public/data，先備份至 scripts/backup/<timestamp>/public_data/ 以利回滾
-    if output_dir.exists() and any(output_dir.iterdir()):
-        backup_root = ROOT / "scripts" / "backup"
-        backup_root.mkdir(parents=True, exist_ok=True)
-        ts = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
-        backup_dir = backup_root / ts / "public_data"
-        try:
-            shutil.copytree(output_dir, backup_dir)
-            print("已備份 {} -> {}".format(output_dir, backup_dir), flush=True)
-        except Exception as e:
-            print("備份警告: {}（繼續匯入）".format(e), flush=True)
+    # 題庫檔先寫進暫存目錄，全部完成後才發佈到 public/data（見 publish_staged）
+    staging_dir = staging_dir_for(output_dir)
+    staging_dir.mkdir(parents=True)
 
     wrote_question_files = []
     total_written_questions = 0
-    for idx, pdf_path in enumerate(pdf_files, 1):
-        print("處理中 ({}/{}): {} ...".format(idx, n_total, pdf_path.name), flush=True)
-        slug, questions = process_pdf(
-            input_dir, output_dir, pdf_path, report, assets_root=str(assets_root)
-        )
-        out_file = output_dir / ("questions_" + slug + ".json")
-        with open(out_file, "w", encoding="utf-8") as f:
-            json.dump(questions, f, ensure_ascii=False, indent=2)
-        wrote_question_files.append(str(out_file.resolve()))
+    seen_assets = set()
+    all_dataset_questions = []
+    dedupe_total = {"refs": 0, "new_files": 0, "shared_refs": 0, "bytes_saved": 0}
+    for pdf_path, slug, questions, report_entries in _iter_processed_pdfs(pdf_files, str(assets_root), jobs, cached, batch_render=not args.no_batch_render, asset_settings=asset_settings, stream_parse=args.stream, text_cache=not args.no_text_cache, text_engine=args.engine, profile=args.profile, encode_workers=encode_workers, crop_settings=crop_settings):
+        t0 = time.perf_counter()
+        out_file = staging_dir / ("questions_" + slug + ".json")
+        write_text(out_file, json.dumps(questions, ensure_ascii=False, indent=2))
+        pack_file = staging_dir / packed_file_name(out_file.name)
+        write_text(pack_file, json.dumps(pack_questions(questions), ensure_ascii=False, separators=(",", ":")))
+        write_json_seconds = round(time.perf_counter() - t0, 4)
+        # 去重統計依 PDF 順序累計（與 --jobs、快取命中無關），只加在報表副本上，不寫入快取；
+        # 題庫 JSON 寫檔秒數同樣只記在副本的 timings.write_json（沿用快取時為本次寫檔時間，其餘階段為當初匯入的數字）
+        dedupe = _asset_dedupe_stats(questions, ROOT / "public", seen_assets)
+        for k in dedupe_total:
+            dedupe_total[k] += dedupe[k]
+        for r in report_entries:
+            entry = dict(r, asset_dedupe=dedupe)
+            if "timings" in r:
+                entry["timings"] = dict(r["timings"], write_json=write_json_seconds)
+            report.append(entry)
+        entry = dict(fingerprints[pdf_path.name])
+        entry.update({
+            "slug": slug,
+            "questions_file": out_file.name,
+            "questions_sha256": _file_sha256(out_file),
+            "assets": [a[k] for q in questions for a in (q.get("assets") or []) for k in ("src", "webp") if a.get(k)],
+            "report": report_entries,
+        })
+        import_cache["items"][pdf_path.name] = entry
+        all_dataset_questions.append(questions)
+        wrote_question_files.append(str((output_dir / out_file.name).resolve()))
         total_written_questions += len(questions)
         label = slug_to_label(slug)
-        datasets.append({"id": slug, "label": label, "file": "questions_" + slug + ".json"})
+        datasets.append({"id": slug, "label": label, "file": "questions_" + slug + ".json", "packed": pack_file.name})
         print("  {} -> {} ({} 題)".format(pdf_path.name, out_file.name, len(questions)), flush=True)
 
-    index = {"datasets": datasets, "default_dataset": "ALL"}
-    index_path = output_dir / "index.json"
-    write_text(index_path, json.dumps(index, ensure_ascii=False, indent=2))
+    bundle = build_all_bundle(all_dataset_questions)
+    write_text(staging_dir / ALL_BUNDLE_FILE, json.dumps(pack_questions(bundle), ensure_ascii=False, separators=(",", ":")))
+    print("{} 已寫入（{} 題）".format(ALL_BUNDLE_FILE, len(bundle)), flush=True)
 
-    # 原子版本號：前端用 data_version 對所有 /data/* 與 /assets/* 請求加 ?v= 避免 PWA 吃到舊快取
-    data_version = datetime.now().strftime("%Y-%m-%d-%H%M")
+    index = {
+        "datasets": datasets,
+        "default_dataset": "ALL",
+        "bundle": {"file": ALL_BUNDLE_FILE, "count": len(bundle), "datasets": [d["id"] for d in datasets]},
+    }
+    index_path = output_dir / "index.json"
+    write_text(staging_dir / index_path.name, json.dumps(index, ensure_ascii=False, indent=2))
+    if dedupe_total["refs"]:
+        print("圖檔去重：{} 個引用共用 {} 個檔案，省下 {:.1f} KB".format(
+            dedupe_total["refs"], dedupe_total["new_files"], dedupe_total["bytes_saved"] / 1024.0), flush=True)
+
+    # 原子版本號：前端用 data_version 對所有 /data/* 與 /assets/* 請求加 ?v= 避免 PWA 吃到舊快取；
+    # dir 為本版的版本目錄，前端從這裡讀 index.json 與題庫檔（見 publish_staged）
+    data_version = new_data_version(output_dir)
     generated_at = datetime.now().isoformat()
-    meta = {"data_version": data_version, "generated_at": generated_at}
-    write_text(output_dir / "meta.json", json.dumps(meta, ensure_ascii=False, indent=2))
-    print("meta.json (data_version={}) 已寫入 {}".format(data_version, output_dir))
+    meta = {"data_version": data_version, "generated_at": generated_at, "dir": DATA_VERSIONS_DIR + "/" + data_version}
+    write_text(staging_dir / "meta.json", json.dumps(meta, ensure_ascii=False, indent=2))
+
+    # 發佈前先備份現行 public/data（內容定址硬連結快照，只有變更的檔案佔空間），再把暫存目錄改名為版本目錄、換平面檔，meta.json 最後
+    backup_root = ROOT / "scripts" / "backup"
+    published = publish_staged(staging_dir, output_dir, backup_root, max(0, args.backup_keep), assets_root)
+    backup = published["backup"]
+    if backup:
+        print("已備份 {}（{} 個檔案、{} 張圖，新增 {:.1f} KB{}）".format(
+            backup["path"], backup["files"], backup["assets"], backup["new_bytes"] / 1024.0,
+            "，移除 {} 份舊備份".format(backup["pruned"]) if backup["pruned"] else ""), flush=True)
+    print("已發佈 {} 個變更檔案（{:.1f} KB），{} 個內容未變沿用".format(
+        published["changed"], published["bytes_published"] / 1024.0, published["unchanged"]), flush=True)
+    if published["changed"]:
+        print("meta.json (data_version={}) 已寫入 {}，版本目錄 {}{}".format(
+            published["data_version"], output_dir, published["version_dir"],
+            "（移除 {} 個舊版本目錄）".format(published["pruned_versions"]) if published["pruned_versions"] else ""), flush=True)
+    else:
+        print("題庫內容未變，沿用 data_version={}".format(published["data_version"]), flush=True)
+    # 發佈後才清圖檔：依已發佈的題庫判斷引用，不會刪到新題庫要用的圖；保留的備份快照引用的圖也留著
+    pruned = _prune_asset_store(output_dir, assets_root, backup_root)
+    if pruned:
+        print("已移除 {} 個不再被引用的 public/assets/h 圖檔".format(pruned), flush=True)
 
     report_path = ROOT / "scripts" / "import_report.json"
     write_text(report_path, json.dumps(report, ensure_ascii=False, indent=2))
     print("index.json、各 questions_*.json 已寫入 {}".format(output_dir))
     print("import_report.json 已寫入 {}".format(report_path))
+    write_text(cache_path, json.dumps(import_cache, ensure_ascii=False, indent=2))
 
     # 匯出寫入路徑與總題數，供質檢 / CI 驗證（應等於 Imported）
     output_root = str(output_dir.resolve())
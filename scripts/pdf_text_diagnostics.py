@@ -3,17 +3,22 @@
 """
 對 raw_pdfs 內每份 PDF 做「可抽題信號」檢測：有文字頁數、題號模式，寫入 scripts/pdf_text_diagnostics.json。
 用於判斷是否為掃描圖（無文字）或題號版式不符導致解析僅 239 題。
+各頁文字經 scripts/.cache 抽字快取（與匯入腳本共用），匯入後再跑不需重新抽字。
+
+執行：
+  python3 scripts/pdf_text_diagnostics.py [--engine auto|pdfplumber|fitz]
 """
 from __future__ import print_function, unicode_literals
 
+import argparse
 import json
 import re
 import sys
 from pathlib import Path
 
-try:
-    import pdfplumber
-except ImportError:
+from import_pdfs_to_datasets import TEXT_ENGINES, available_text_engines, cached_pages_text, text_cache_dir
+
+if not available_text_engines():
     print('{"error": "pip install pdfplumber"}', file=sys.stderr)
     sys.exit(1)
 
@@ -32,31 +37,36 @@ def get_pdf_dir():
 # 題號模式：行首數字. 或 （數字）
 QUESTION_NUMBER_PATTERN = re.compile(r"(?:^\s*\d+\.\s*|\(\d+\))", re.MULTILINE)
 
-def diagnose_one(pdf_path):
+def diagnose_one(pdf_path, engine=None):
     out = {
         "file": pdf_path.name,
+        "engine": None,
         "pages_total": 0,
         "pages_with_text": 0,
         "sample_text_snippet": "",
         "has_question_number_pattern": False,
     }
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            out["pages_total"] = len(pdf.pages)
-            all_text = []
-            for page in pdf.pages:
-                t = page.extract_text()
-                if t and t.strip():
-                    out["pages_with_text"] += 1
-                    all_text.append(t)
-            combined = "\n".join(all_text)
-            out["sample_text_snippet"] = (combined[:200] + "…") if len(combined) > 200 else combined
-            out["has_question_number_pattern"] = bool(QUESTION_NUMBER_PATTERN.search(combined))
+        stats = {}
+        pages_text = cached_pages_text(pdf_path, cache_dir=text_cache_dir(ROOT), engine=engine, stats=stats)
+        out["engine"] = stats.get("engine")
+        out["pages_total"] = len(pages_text)
+        all_text = []
+        for _, t in pages_text:
+            if t and t.strip():
+                out["pages_with_text"] += 1
+                all_text.append(t)
+        combined = "\n".join(all_text)
+        out["sample_text_snippet"] = (combined[:200] + "…") if len(combined) > 200 else combined
+        out["has_question_number_pattern"] = bool(QUESTION_NUMBER_PATTERN.search(combined))
     except Exception as e:
         out["error"] = str(e)
     return out
 
 def main():
+    parser = argparse.ArgumentParser(description="PDF 可抽題信號檢測")
+    parser.add_argument("--engine", choices=("auto",) + TEXT_ENGINES, default=None, help="抽字引擎（預設 pdfplumber，未安裝時 fitz，同匯入腳本；auto＝逐份試抽挑最快的合格引擎）")
+    args = parser.parse_args()
     pdf_dir = get_pdf_dir()
     if not pdf_dir:
         print('{"error": "raw_pdfs dir not found"}', file=sys.stderr)
@@ -65,7 +75,7 @@ def main():
     if not pdf_files:
         print('{"error": "no PDFs in raw_pdfs"}', file=sys.stderr)
         sys.exit(1)
-    items = [diagnose_one(p) for p in pdf_files]
+    items = [diagnose_one(p, args.engine) for p in pdf_files]
     result = {
         "generatedAt": __import__("datetime").datetime.now().isoformat(),
         "count": len(items),
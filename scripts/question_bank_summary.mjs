@@ -16,7 +16,7 @@ function countQuestions(json) {
 
 const dir = path.join(process.cwd(), "public", "data");
 const files = fs.existsSync(dir)
-  ? fs.readdirSync(dir).filter((f) => /^questions_.*\.json$/i.test(f))
+  ? fs.readdirSync(dir).filter((f) => /^questions_.*\.json$/i.test(f) && !/\.pack\.json$/i.test(f))
   : [];
 
 const summary = [];
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成考卷 PDF：依匯入腳本能處理的版面產生可重現（固定 seed）的題庫 PDF，供 benchmark 與回歸比對使用，不需 raw_pdfs。
+版面：「題號. (答案) 題幹」題首；選項 ①②③④（circled）、(1)~(4)（paren）、A~D 各佔一行（letter），mixed 每回輪替；
+部分題目附「解析：」段落；每頁有頁首（年度 科目 乙 x-y(序 nnn )）與頁碼頁尾；圖題（題幹含「如圖」「符號」）在題區右側畫向量符號。
+每 section_size 題為一回，題號自 1 重新起算（同實際彙編 PDF），每回開新頁並印回次標題。
+
+執行：
+  python3 scripts/synth_exam_pdf.py out.pdf [--questions 1000] [--layout mixed] [--seed 1]
+需 PyMuPDF（pip install pymupdf）。
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import random
+import sys
+
+try:
+    import pymupdf as fitz  # 舊名 fitz 在新版匯入時會把棄用警告印到 stdout
+except ImportError:
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+
+LAYOUTS = ("circled", "paren", "letter")
+PAGE_W, PAGE_H = 595, 842
+MARGIN_X, TOP_Y, BOTTOM_Y = 40, 60, 790
+FONT = "china-t"
+FONT_SIZE = 10
+LINE_H = 15
+WRAP_CHARS = 38
+
+STEMS = (
+    "室內裝修施工之規定下列何者正確",
+    "依建築物室內裝修管理辦法，下列敘述何者錯誤",
+    "有關防火區劃之構造，下列何者不符合規定",
+    "工程契約中關於估驗計價之約定，下列何者為是",
+    "施工中之勞工安全衛生管理，下列何者應優先辦理",
+    "有關木作天花板之施工順序，下列何者最適當",
+)
+IMAGE_STEMS = (
+    "如圖所示之符號代表何者",
+    "下圖之設備符號為何",
+    "依CNS 圖例，此符號表示",
+)
+OPTIONS = (
+    "木作工程", "油漆工程", "水電工程", "泥作工程", "防水工程", "鋁窗工程",
+    "應經主管機關核准", "應由專業技術人員簽證", "得免申請審查", "應於竣工後辦理",
+    "不燃材料", "耐燃一級材料", "耐燃二級材料", "耐燃三級材料",
+)
+EXPLANATIONS = (
+    "依建築技術規則建築設計施工編規定辦理。",
+    "室內裝修材料應符合耐燃等級之要求，並於施工前送審。",
+    "本題考防火區劃之基本觀念，重點在區劃面積與開口部之防火設備。",
+)
+
+
+def _wrap(text, width=WRAP_CHARS):
+    return [text[i:i + width] for i in range(0, len(text), width)] or [""]
+
+
+def _question_lines(rng, qno, answer, layout, image):
+    """回傳 (lines, stem, options)；lines 為該題各行 [(x, text)]，第一行為題首。"""
+    stem = rng.choice(IMAGE_STEMS if image else STEMS)
+    if rng.random() < 0.3:
+        # 長題幹會折行，讓題塊跨多行
+        stem = stem + "，" + rng.choice(STEMS) + "，並說明其依據"
+    stem += "？"
+    opts = rng.sample(OPTIONS, 4)
+    head = _wrap("{}. ({}) {}".format(qno, answer, stem))
+    lines = [(MARGIN_X, head[0])] + [(MARGIN_X + 20, t) for t in head[1:]]
+    if layout == "circled":
+        lines.extend((MARGIN_X + 20, t) for t in _wrap("".join("①②③④"[i] + o for i, o in enumerate(opts))))
+    elif layout == "paren":
+        lines.extend((MARGIN_X + 20, t) for t in _wrap(" ".join("({}){}".format(i + 1, o) for i, o in enumerate(opts))))
+    else:
+        lines.extend((MARGIN_X + 20, "{}. {}".format("ABCD"[i], o)) for i, o in enumerate(opts))
+    return lines, stem, opts
+
+
+def _draw_symbol(page, rng, y_top, y_bottom):
+    """題區右側畫一個向量符號（框 + 斜線 / 圓 / 十字），模擬 CNS 設備符號。"""
+    cy = (y_top + y_bottom) / 2.0
+    x0, x1 = 440, 500
+    kind = rng.randrange(3)
+    if kind == 0:
+        page.draw_rect(fitz.Rect(x0, cy - 20, x1, cy + 20), color=(0, 0, 0))
+        page.draw_line((x0, cy - 20), (x1, cy + 20))
+    elif kind == 1:
+        page.draw_circle((x0 + 30, cy), 18, color=(0, 0, 0))
+        page.draw_line((x0 + 12, cy), (x0 + 48, cy))
+    else:
+        page.draw_line((x0 + 30, cy - 20), (x0 + 30, cy + 20), width=2)
+        page.draw_line((x0 + 10, cy), (x0 + 50, cy), width=2)
+
+
+def build_exam_pdf(path, n_questions, layout="mixed", seed=0, image_ratio=0.3, explanation_ratio=0.25, section_size=80):
+    """產生合成考卷 PDF 至 path，回傳答案表 [{"section", "qno", "answer", "layout", "image", "page", "stem", "options"}, ...]
+    （answer 為 1~4，page 為 1-based 題首所在頁）。同參數同 seed 產出的 PDF 內容相同。"""
+    if layout != "mixed" and layout not in LAYOUTS:
+        raise ValueError("未知版面: {}".format(layout))
+    rng = random.Random(seed)
+    doc = fitz.open()
+    key = []
+    page = None
+    y = BOTTOM_Y
+
+    def new_page():
+        p = doc.new_page(width=PAGE_W, height=PAGE_H)
+        p.insert_text((MARGIN_X, 30), "105 建築物室內裝修工程管理 乙 4-{}(序 {:03d} )".format(len(doc), seed % 1000),
+                      fontname=FONT, fontsize=9)
+        return p, TOP_Y
+
+    for i in range(n_questions):
+        section = i // section_size
+        qno = i % section_size + 1
+        q_layout = LAYOUTS[section % len(LAYOUTS)] if layout == "mixed" else layout
+        if qno == 1:
+            page, y = new_page()
+            page.insert_text((MARGIN_X, y), "第 {} 回 單選題 共 {} 題".format(section + 1, min(section_size, n_questions - i)),
+                             fontname=FONT, fontsize=FONT_SIZE)
+            y += LINE_H * 2
+        answer = rng.randint(1, 4)
+        image = rng.random() < image_ratio
+        lines, stem, opts = _question_lines(rng, qno, answer, q_layout, image)
+        if rng.random() < explanation_ratio:
+            lines.extend((MARGIN_X + 20, t) for t in _wrap("解析：" + rng.choice(EXPLANATIONS)))
+        height = LINE_H * len(lines) + (30 if image else 10)
+        if y + height > BOTTOM_Y:
+            page, y = new_page()
+        y_top = y
+        for x, text in lines:
+            page.insert_text((x, y), text, fontname=FONT, fontsize=FONT_SIZE)
+            y += LINE_H
+        if image:
+            _draw_symbol(page, rng, y_top - LINE_H, y)
+            y += 20
+        y += 10
+        key.append({
+            "section": section + 1, "qno": qno, "answer": answer, "layout": q_layout, "image": image,
+            "page": len(doc), "stem": stem, "options": opts,
+        })
+
+    for idx, p in enumerate(doc, 1):
+        p.insert_text((PAGE_W / 2 - 10, PAGE_H - 12), str(idx), fontsize=9)
+    doc.save(str(path), garbage=3, deflate=True)
+    doc.close()
+    return key
+
+
+def main():
+    parser = argparse.ArgumentParser(description="產生合成考卷 PDF（benchmark / 回歸比對用）")
+    parser.add_argument("out", help="輸出 PDF 路徑")
+    parser.add_argument("--questions", type=int, default=100, help="題數（預設 100）")
+    parser.add_argument("--layout", choices=("mixed",) + LAYOUTS, default="mixed", help="選項版面（預設 mixed：每回輪替）")
+    parser.add_argument("--seed", type=int, default=1, help="亂數種子（預設 1）")
+    parser.add_argument("--key", default=None, help="另寫答案表 JSON 至此路徑")
+    args = parser.parse_args()
+    if fitz is None:
+        print("需要 PyMuPDF：pip install pymupdf", file=sys.stderr)
+        return 1
+    key = build_exam_pdf(args.out, args.questions, layout=args.layout, seed=args.seed)
+    if args.key:
+        with open(args.key, "w", encoding="utf-8") as f:
+            json.dump(key, f, ensure_ascii=False, indent=2)
+    print("Wrote: {}（{} 題，{} 頁）".format(args.out, len(key), key[-1]["page"] if key else 0))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
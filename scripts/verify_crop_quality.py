@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+裁切點陣品質檢查（_crop_quality）的回歸檢查，不需 raw_pdfs：
+1. 以 Pillow 畫的點陣驗證各判定：內容在框內的好圖不報問題；預設裁切下緣碰到內容時，只有圖元跨越下緣才報 edge_cut，
+   --tight-crop 一律報；上緣切到內容、幾乎空白、答案標記外框內有墨水分別報 edge_cut:top / blank_crop / answer_leak。
+2. 以 synth_exam_pdf 產生小型合成考卷，預設與 --tight-crop 各跑一次 process_pdf：--tight-crop 所有圖題都不應有品質問題；
+   預設裁切框延伸到下一題，切過下一題的圖會報 edge_cut:bottom / right（記在 graphic_cuts），此外不應有其他問題。
+結果寫入 scripts/verify_crop_quality.json，任一項不符時 exit 1。
+
+執行：
+  python3 scripts/verify_crop_quality.py [--questions 40]
+需 Pillow；第 2 項另需 PyMuPDF（未安裝時略過並註明）。
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import io
+import json
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+import import_pdfs_to_datasets as importer
+
+ROOT = Path(__file__).resolve().parent.parent
+OUT_PATH = ROOT / "scripts" / "verify_crop_quality.json"
+WHITE_POINT = importer.ASSET_SETTINGS["white_point"]
+QUALITY_REASONS = ("blank_crop", "edge_cut", "answer_leak")
+
+
+def _canvas(boxes, size=(400, 200)):
+    """白底點陣，boxes 內各矩形塗黑；回傳 (width, height, RGB samples)。"""
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", size, (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    for box in boxes:
+        draw.rectangle(box, fill=(0, 0, 0))
+    return size[0], size[1], img.tobytes()
+
+
+# (名稱, 墨水矩形, 答案標記外框, 是否緊貼裁切, 圖元跨越的邊, 預期 issues)
+BITMAP_CASES = (
+    ("good", [(20, 20, 300, 40), (40, 60, 200, 160)], [], False, (), []),
+    ("good_tight", [(20, 20, 300, 40), (40, 60, 200, 160)], [], True, (), []),
+    ("bottom_default", [(20, 20, 300, 40), (40, 150, 200, 199)], [], False, (), []),
+    ("bottom_default_graphic", [(20, 20, 300, 40), (40, 150, 200, 199)], [], False, ("bottom",), ["edge_cut:bottom"]),
+    ("bottom_tight", [(20, 20, 300, 40), (40, 150, 200, 199)], [], True, (), ["edge_cut:bottom"]),
+    ("right_default", [(20, 20, 399, 40)], [], False, (), []),
+    ("right_default_graphic", [(20, 20, 399, 40)], [], False, ("right",), ["edge_cut:right"]),
+    ("top_cut", [(40, 0, 200, 30)], [], False, (), ["edge_cut:top"]),
+    ("blank", [], [], False, (), ["blank_crop"]),
+    ("answer_leak", [(20, 20, 300, 40), (320, 20, 340, 40)], [(318, 18, 342, 42)], False, (), ["answer_leak"]),
+    ("answer_clear", [(20, 20, 300, 40)], [(318, 18, 342, 42)], False, (), []),
+)
+
+
+def verify_bitmaps():
+    items = []
+    for name, boxes, answer_boxes, tight, graphic_edges, expected in BITMAP_CASES:
+        width, height, samples = _canvas(boxes)
+        settings = importer._crop_quality_settings({"tight": tight}, graphic_edges)
+        quality = importer._crop_quality(width, height, samples, WHITE_POINT, answer_boxes, settings)
+        got = quality["issues"] if quality else None
+        items.append({"case": name, "tight": tight, "expected": expected, "issues": got, "ok": got == expected})
+    return items
+
+
+def verify_synth(n_questions):
+    """合成考卷的圖題：緊貼裁切應全部通過品質檢查；預設裁切只容許圖被下 / 右緣切到的 edge_cut。"""
+    from synth_exam_pdf import build_exam_pdf
+    items = []
+    saved_root = importer.ROOT
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = Path(tmp) / "synth_{}.pdf".format(n_questions)
+        build_exam_pdf(pdf_path, n_questions, layout="mixed", seed=1)
+        for tight in (False, True):
+            importer.ROOT = Path(tmp)
+            try:
+                report = []
+                with redirect_stdout(io.StringIO()):
+                    importer.process_pdf(None, None, pdf_path, report, assets_root=str(Path(tmp) / "assets"), text_cache=False,
+                                         crop_settings=dict(importer.CROP_SETTINGS, tight=tight))
+            finally:
+                importer.ROOT = saved_root
+            entry = report[0]
+            flagged = [m for m in entry.get("mismatch_images", []) if m.get("reason") in QUALITY_REASONS]
+            graphic_cuts = [] if tight else [m for m in flagged
+                                             if m["reason"] == "edge_cut" and m.get("source") in ("bottom", "right")]
+            flagged = [m for m in flagged if m not in graphic_cuts]
+            items.append({
+                "case": "synth_{}{}".format(n_questions, "_tight" if tight else ""),
+                "tight": tight,
+                "images": entry.get("crop_quality", {}).get("images", 0),
+                "graphic_cuts": len(graphic_cuts),
+                "flagged": flagged[:20],
+                "ok": bool(entry.get("crop_quality", {}).get("images")) and not flagged,
+            })
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="裁切點陣品質檢查的回歸檢查（好圖不報、切到內容才報）")
+    parser.add_argument("--questions", type=int, default=40, help="合成考卷題數（預設 40）")
+    args = parser.parse_args()
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("需要 Pillow：pip install Pillow", file=sys.stderr)
+        return 1
+
+    items = verify_bitmaps()
+    skipped = None
+    if importer.fitz is None:
+        skipped = "未安裝 PyMuPDF，略過合成考卷裁切"
+    else:
+        items.extend(verify_synth(max(1, args.questions)))
+    for item in items:
+        detail = "{} 張圖".format(item["images"]) if "images" in item else "issues={}".format(item["issues"])
+        print("  {}: {} {}".format(item["case"], detail, "OK" if item["ok"] else "FAIL"), flush=True)
+    if skipped:
+        print("  " + skipped)
+
+    result = {
+        "generatedAt": datetime.now().isoformat(),
+        "parser_version": importer.PARSER_VERSION,
+        "count": len(items),
+        "skipped": skipped,
+        "all_ok": all(i["ok"] for i in items),
+        "items": items,
+    }
+    OUT_PATH.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print("Wrote:", str(OUT_PATH))
+    return 0 if result["all_ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
@@ -42,24 +42,30 @@ if (!meta || typeof meta.data_version !== "string") {
   fail("public/data/meta.json 缺少 data_version");
 }
 const dataVersion = meta.data_version;
+// 前端從 meta.json 的 dir（版本目錄）讀其餘檔；舊資料無 dir 時讀 public/data 平面檔
+const DIR = meta.dir ? path.join(DATA, meta.dir) : DATA;
+const DIR_LABEL = meta.dir ? `public/data/${meta.dir}` : "public/data";
+if (meta.dir && !exists(DIR)) fail(`meta.json 的版本目錄不存在: ${DIR_LABEL}`);
 
 // 2) index.json 必須存在且含 datasets
-const indexPath = path.join(DATA, "index.json");
-if (!exists(indexPath)) fail("public/data/index.json 不存在");
+const indexPath = path.join(DIR, "index.json");
+if (!exists(indexPath)) fail(`${DIR_LABEL}/index.json 不存在`);
 const index = readJson(indexPath, "index.json");
 if (!index || !Array.isArray(index.datasets)) {
-  fail("public/data/index.json 格式錯誤（需有 datasets 陣列）");
+  fail(`${DIR_LABEL}/index.json 格式錯誤（需有 datasets 陣列）`);
 }
 
 const datasets = index.datasets;
+if (index.bundle && !exists(path.join(DIR, index.bundle.file))) fail(`全部題庫合併檔不存在: ${index.bundle.file}`);
 let totalQuestions = 0;
 const requiredQuestionFields = ["id", "question_text", "options", "answer_index", "type"];
 
 for (const ds of datasets) {
   const file = ds.file;
   if (!file || typeof file !== "string") fail(`index.json 內 dataset 缺少 file: ${JSON.stringify(ds)}`);
-  const filePath = path.join(DATA, file);
+  const filePath = path.join(DIR, file);
   if (!exists(filePath)) fail(`題庫檔案不存在: ${file}`);
+  if (ds.packed && !exists(path.join(DIR, ds.packed))) fail(`壓縮題庫檔案不存在: ${ds.packed}`);
   const list = readJson(filePath, file);
   if (!Array.isArray(list)) fail(`${file}: 根必須為陣列`);
   for (let i = 0; i < list.length; i++) {
@@ -87,6 +93,12 @@ for (const ds of datasets) {
           if (!exists(absPath)) {
             fail(`圖檔不存在: ${a.src}（題目 ${q.id}，檔案 ${file}）`);
           }
+          if (typeof a.webp === "string" && a.webp) {
+            const webpPath = path.join(PUBLIC, a.webp.startsWith("/") ? a.webp.slice(1) : a.webp);
+            if (!exists(webpPath)) {
+              fail(`WebP 圖檔不存在: ${a.webp}（題目 ${q.id}，檔案 ${file}）`);
+            }
+          }
         }
       }
     }
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+驗證壓縮題庫：對 public/data/index.json 內每個 dataset，把 packed（questions_<slug>.pack.json）解開後
+與 file（questions_<slug>.json）逐題、逐鍵（含鍵順序）比對，並記錄兩者大小；
+index.json 有 bundle（questions_all.pack.json）時，另以各題庫 JSON 重建合併檔比對。結果寫入 scripts/verify_packed_questions.json。
+
+執行：
+  python3 scripts/verify_packed_questions.py [--data-dir public/data]
+任一 dataset 不一致或缺檔時 exit 1。
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from import_pdfs_to_datasets import build_all_bundle, pack_questions, packed_file_name, unpack_questions
+
+ROOT = Path(__file__).resolve().parent.parent
+OUT_PATH = ROOT / "scripts" / "verify_packed_questions.json"
+
+
+def _read_json(path):
+    with open(str(path), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _canonical(questions):
+    """與匯入腳本寫檔同樣的序列化，鍵順序不同也會判為不一致。"""
+    return json.dumps(questions, ensure_ascii=False, indent=2)
+
+
+def verify_one(data_dir, ds):
+    json_path = data_dir / ds["file"]
+    packed_name = ds.get("packed") or packed_file_name(ds["file"])
+    packed_path = data_dir / packed_name
+    item = {"id": ds.get("id"), "file": ds["file"], "packed": packed_name}
+    if not ds.get("packed") and not packed_path.is_file():
+        # v1.3 之前匯入的題庫沒有壓縮檔，前端會直接讀 JSON
+        item.update({"ok": True, "skipped": True})
+        return item
+    if not json_path.is_file() or not packed_path.is_file():
+        item.update({"ok": False, "error": "缺檔：{}".format(json_path.name if not json_path.is_file() else packed_name)})
+        return item
+    questions = _read_json(json_path)
+    try:
+        unpacked = unpack_questions(_read_json(packed_path))
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        item.update({"ok": False, "error": "無法解開：{}".format(e)})
+        return item
+    first_diff = None
+    for i, (a, b) in enumerate(zip(questions, unpacked)):
+        if _canonical(a) != _canonical(b):
+            first_diff = {"index": i, "id": a.get("id")}
+            break
+    ok = len(questions) == len(unpacked) and first_diff is None
+    # 重新 pack 應與檔案相同，確認檔案是由目前版本的 pack_questions 產出
+    repacked = json.dumps(pack_questions(questions), ensure_ascii=False, separators=(",", ":"))
+    item.update({
+        "ok": ok,
+        "questions": len(questions),
+        "unpacked": len(unpacked),
+        "first_diff": first_diff,
+        "repack_identical": repacked == packed_path.read_text(encoding="utf-8"),
+        "json_bytes": json_path.stat().st_size,
+        "packed_bytes": packed_path.stat().st_size,
+    })
+    return item
+
+
+def verify_bundle(data_dir, index):
+    """合併檔須等於依 bundle.datasets 順序重建的結果（含 dedupe_key / stratum）。"""
+    bundle = index["bundle"]
+    item = {"id": "ALL", "file": None, "packed": bundle["file"]}
+    bundle_path = data_dir / bundle["file"]
+    by_id = {ds["id"]: ds for ds in index.get("datasets") or []}
+    try:
+        sources = [_read_json(data_dir / by_id[ds_id]["file"]) for ds_id in bundle["datasets"]]
+        unpacked = unpack_questions(_read_json(bundle_path))
+    except (IOError, OSError, KeyError, ValueError) as e:
+        item.update({"ok": False, "error": "無法驗證合併檔：{}".format(e)})
+        return item
+    expected = build_all_bundle(sources)
+    first_diff = None
+    for i, (a, b) in enumerate(zip(expected, unpacked)):
+        if _canonical(a) != _canonical(b):
+            first_diff = {"index": i, "id": a.get("id")}
+            break
+    item.update({
+        "ok": len(expected) == len(unpacked) == bundle.get("count") and first_diff is None,
+        "questions": len(unpacked),
+        "unpacked": len(unpacked),
+        "first_diff": first_diff,
+        "json_bytes": sum((data_dir / by_id[ds_id]["file"]).stat().st_size for ds_id in bundle["datasets"]),
+        "packed_bytes": bundle_path.stat().st_size,
+    })
+    return item
+
+
+def main():
+    parser = argparse.ArgumentParser(description="壓縮題庫（.pack.json）與 JSON 題庫逐題比對")
+    parser.add_argument("--data-dir", default="public/data", help="題庫目錄（相對專案根，預設 public/data）")
+    args = parser.parse_args()
+
+    data_dir = ROOT / args.data_dir
+    index_path = data_dir / "index.json"
+    if not index_path.is_file():
+        print("找不到 {}".format(index_path), file=sys.stderr)
+        return 1
+    index = _read_json(index_path)
+    datasets = index.get("datasets") or []
+
+    items = []
+    checks = [lambda ds=ds: verify_one(data_dir, ds) for ds in datasets]
+    if index.get("bundle"):
+        checks.append(lambda: verify_bundle(data_dir, index))
+    for check in checks:
+        item = check()
+        items.append(item)
+        if item.get("skipped"):
+            print("  {}: 無壓縮檔，略過".format(item["id"]), flush=True)
+        elif item.get("error"):
+            print("  {}: {}".format(item["id"], item["error"]), flush=True)
+        else:
+            print("  {}: {} 題 {} -> {} bytes {}".format(
+                item["id"], item["questions"], item["json_bytes"], item["packed_bytes"],
+                "OK" if item["ok"] else "DIFF(第 {} 題)".format(item["first_diff"]["index"] if item["first_diff"] else "?"),
+            ), flush=True)
+
+    json_total = sum(i.get("json_bytes", 0) for i in items)
+    packed_total = sum(i.get("packed_bytes", 0) for i in items)
+    result = {
+        "generatedAt": datetime.now().isoformat(),
+        "count": len(items),
+        "json_bytes_total": json_total,
+        "packed_bytes_total": packed_total,
+        "ratio": round(packed_total / float(json_total), 3) if json_total else None,
+        "all_ok": all(i["ok"] for i in items),
+        "items": items,
+    }
+    OUT_PATH.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print("Wrote:", str(OUT_PATH))
+    return 0 if result["all_ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
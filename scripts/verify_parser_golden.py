@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解析器黃金快照：把每份 PDF 抽出的逐頁文字與「文字 → 題目」階段的完整輸出（題目、parse_failed、cross_suspects、
+drop_reasons、pattern_counts、block_spans）存成 scripts/golden/<slug>.json；之後不需 PDF、不開 PyMuPDF，
+只重跑 _parse_pages_whole 與 --stream 的 _parse_pages_streaming，與快照逐項比對。
+改 _split_blocks_with_fallback、_strip_header_footer、parse_questions_from_text 等熱點後跑一次即可確認題數與內容未變。
+比對結果寫入 scripts/verify_parser_golden.json。
+
+執行：
+  python3 scripts/verify_parser_golden.py --update [--input-dir "raw_pdfs:"] [--pdf 綜合A.pdf]   # 由 PDF 產生 / 更新快照
+  python3 scripts/verify_parser_golden.py --update --synth 400                                   # 沒有 raw_pdfs 時錄合成考卷
+  python3 scripts/verify_parser_golden.py                                                       # 比對（預設）
+任一快照不一致時 exit 1。快照是「目前行為」的紀錄：解析規則刻意變更後須以 --update 重錄並在 PR 說明題數差異。
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import import_pdfs_to_datasets as importer
+
+ROOT = Path(__file__).resolve().parent.parent
+GOLDEN_DIR = ROOT / "scripts" / "golden"
+OUT_PATH = ROOT / "scripts" / "verify_parser_golden.json"
+GOLDEN_FORMAT = "mlh-parser-golden"
+GOLDEN_VERSION = 1
+# _parse_pages_whole / _parse_pages_streaming 回傳值中納入比對的鍵（blocks_head 只供 105 預覽，不比）
+EXPECTED_KEYS = (
+    "pages_total", "extracted_text_length_per_page", "questions", "parse_failed",
+    "cross_suspects", "drop_reasons", "pattern_counts", "block_spans",
+)
+
+
+def get_pdf_dir(input_dir=None):
+    if input_dir:
+        d = ROOT / input_dir
+        return d if d.is_dir() else None
+    for name in ("raw_pdfs", "raw_pdfs:"):
+        d = ROOT / name
+        if d.is_dir():
+            return d
+    return None
+
+
+class _FixturePages(object):
+    """_parse_pages_streaming 需要的 session 介面（iter_pages_text / text_failed / stage_seconds），改由快照文字供應。"""
+
+    def __init__(self, pages_text):
+        self._pages_text = pages_text
+        self.text_failed = False
+        self.stage_seconds = {}
+
+    def iter_pages_text(self):
+        for page_no, text in self._pages_text:
+            yield page_no, text
+
+
+def _expected(parsed):
+    """只取比對鍵，並經 JSON 來回一次（tuple → list），與讀回的快照同型別。"""
+    if parsed is None:
+        return None
+    return json.loads(json.dumps({k: parsed[k] for k in EXPECTED_KEYS}, ensure_ascii=False))
+
+
+def run_parse(pages_text, slug, stream=False):
+    """只跑文字 → 題目階段；每次先清題塊切分快取，確保真的重切。"""
+    importer._BLOCK_SPLIT_CACHE.clear()
+    if stream:
+        return _expected(importer._parse_pages_streaming(_FixturePages(pages_text), slug))
+    return _expected(importer._parse_pages_whole(pages_text, slug) if pages_text else None)
+
+
+def record_one(pdf_path, engine, text_cache):
+    """由 PDF 抽字（經抽字快取）並以目前解析器產生快照，回傳 (slug, fixture)。"""
+    slug = importer.to_ascii_slug(importer.slug_from_filename(pdf_path.name))
+    stats = {}
+    pages_text = importer.cached_pages_text(
+        pdf_path, cache_dir=importer.text_cache_dir() if text_cache else None, engine=engine, stats=stats)
+    fixture = {
+        "format": GOLDEN_FORMAT,
+        "version": GOLDEN_VERSION,
+        "file": pdf_path.name,
+        "slug": slug,
+        "sha256": importer._file_sha256(pdf_path),
+        "engine": importer._text_engine_id(stats["engine"]) if stats.get("engine") else None,
+        "parser_version": importer.PARSER_VERSION,
+        "recordedAt": datetime.now().isoformat(),
+        "pages": [[page_no, text] for page_no, text in pages_text],
+        "expected": run_parse(pages_text, slug),
+    }
+    return slug, fixture
+
+
+def _first_diff(expected, got):
+    """回傳第一個不同處的簡短描述；相同回傳 None。"""
+    if expected == got:
+        return None
+    if expected is None or got is None:
+        return {"key": None, "expected": expected is not None, "got": got is not None}
+    for k in EXPECTED_KEYS:
+        a, b = expected.get(k), got.get(k)
+        if a == b:
+            continue
+        if k == "questions":
+            for i, (qa, qb) in enumerate(zip(a, b)):
+                if qa != qb:
+                    fields = sorted(f for f in set(qa) | set(qb) if qa.get(f) != qb.get(f))
+                    return {"key": k, "index": i, "id": qa.get("id"), "fields": fields}
+            return {"key": k, "index": min(len(a), len(b)), "expected_count": len(a), "got_count": len(b)}
+        return {"key": k}
+    return {"key": None}
+
+
+def verify_one(path):
+    with open(str(path), "r", encoding="utf-8") as f:
+        fixture = json.load(f)
+    item = {"fixture": path.name, "file": fixture.get("file"), "slug": fixture.get("slug")}
+    if fixture.get("format") != GOLDEN_FORMAT or fixture.get("version") != GOLDEN_VERSION:
+        item.update({"ok": False, "error": "快照格式不符（請以 --update 重錄）"})
+        return item
+    pages_text = [(page_no, text) for page_no, text in fixture["pages"]]
+    expected = fixture["expected"]
+    t0 = time.perf_counter()
+    whole = run_parse(pages_text, fixture["slug"])
+    t1 = time.perf_counter()
+    stream = run_parse(pages_text, fixture["slug"], stream=True)
+    t2 = time.perf_counter()
+    whole_diff = _first_diff(expected, whole)
+    stream_diff = _first_diff(expected, stream)
+    item.update({
+        "ok": whole_diff is None and stream_diff is None,
+        "expected_questions": len(expected["questions"]) if expected else 0,
+        "questions": len(whole["questions"]) if whole else 0,
+        "stream_questions": len(stream["questions"]) if stream else 0,
+        "whole_diff": whole_diff,
+        "stream_diff": stream_diff,
+        "whole_seconds": round(t1 - t0, 4),
+        "stream_seconds": round(t2 - t1, 4),
+        "recorded_parser_version": fixture.get("parser_version"),
+    })
+    return item
+
+
+def update_synth(args):
+    """沒有 raw_pdfs 時，以 synth_exam_pdf 的合成考卷（mixed 版面、固定 seed）錄一份快照 synth_<題數>.json。"""
+    import tempfile
+    from synth_exam_pdf import build_exam_pdf
+    GOLDEN_DIR.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = Path(tmp) / "synth_{}.pdf".format(args.synth)
+        build_exam_pdf(pdf_path, args.synth, layout="mixed", seed=1)
+        _, fixture = record_one(pdf_path, args.engine, False)
+    fixture["slug"] = "synth_{}".format(args.synth)
+    fixture["expected"] = run_parse([tuple(p) for p in fixture["pages"]], fixture["slug"])
+    out = GOLDEN_DIR / (fixture["slug"] + ".json")
+    importer.write_text(out, json.dumps(fixture, ensure_ascii=False, indent=1))
+    print("  合成考卷 -> {}（{} 頁，{} 題）".format(out.name, len(fixture["pages"]), len(fixture["expected"]["questions"])), flush=True)
+    return 0
+
+
+def update(args):
+    if args.synth:
+        return update_synth(args)
+    pdf_dir = get_pdf_dir(args.input_dir)
+    if not pdf_dir:
+        print("找不到 PDF 目錄（raw_pdfs 或 raw_pdfs:）", file=sys.stderr)
+        return 1
+    pdf_files = sorted(pdf_dir.glob("*.pdf"))
+    if args.pdf:
+        pdf_files = [p for p in pdf_files if p.name == args.pdf]
+    if not pdf_files:
+        print("在 {} 下沒有找到 .pdf 檔案".format(pdf_dir), file=sys.stderr)
+        return 1
+    GOLDEN_DIR.mkdir(parents=True, exist_ok=True)
+    written = set()
+    for pdf_path in pdf_files:
+        slug, fixture = record_one(pdf_path, args.engine, not args.no_cache)
+        out = GOLDEN_DIR / (slug + ".json")
+        # 同 slug 的多份 PDF（匯入時會合併成同一題庫）各自存檔，檔名加上序號
+        n = 2
+        while out.name in written:
+            out = GOLDEN_DIR / ("{}.{}.json".format(slug, n))
+            n += 1
+        written.add(out.name)
+        importer.write_text(out, json.dumps(fixture, ensure_ascii=False, indent=1))
+        expected = fixture["expected"]
+        print("  {} -> {}（{} 頁，{} 題，{}）".format(
+            pdf_path.name, out.name, len(fixture["pages"]),
+            len(expected["questions"]) if expected else 0, fixture["engine"]), flush=True)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解析器黃金快照：由快照文字重跑文字 → 題目階段並比對")
+    parser.add_argument("--update", action="store_true", help="由 PDF 重新錄製快照（寫入 scripts/golden/）")
+    parser.add_argument("--input-dir", default=None, help="--update 的 PDF 目錄（相對專案根，預設 raw_pdfs 或 raw_pdfs:）")
+    parser.add_argument("--pdf", default=None, help="--update 只錄指定檔名的單一 PDF")
+    parser.add_argument("--engine", choices=("auto",) + importer.TEXT_ENGINES, default=None, help="--update 的抽字引擎（預設 pdfplumber，未安裝時 fitz，同匯入腳本）")
+    parser.add_argument("--no-cache", action="store_true", help="--update 不讀寫 scripts/.cache 抽字快取")
+    parser.add_argument("--synth", type=int, default=0, metavar="N", help="--update 改錄 N 題合成考卷（synth_exam_pdf，不需 raw_pdfs）")
+    parser.add_argument("--golden-dir", default=None, help="快照目錄（相對專案根，預設 scripts/golden）")
+    args = parser.parse_args()
+
+    global GOLDEN_DIR
+    if args.golden_dir:
+        GOLDEN_DIR = ROOT / args.golden_dir
+    if args.update:
+        return update(args)
+
+    fixtures = sorted(GOLDEN_DIR.glob("*.json")) if GOLDEN_DIR.is_dir() else []
+    if not fixtures:
+        print("{} 下沒有快照，請先執行 --update".format(GOLDEN_DIR), file=sys.stderr)
+        return 1
+    t0 = time.perf_counter()
+    items = []
+    for path in fixtures:
+        item = verify_one(path)
+        items.append(item)
+        if item.get("error"):
+            print("  {}: {}".format(item["fixture"], item["error"]), flush=True)
+            continue
+        status = "OK"
+        if not item["ok"]:
+            diff = item["whole_diff"] or item["stream_diff"]
+            status = "DIFF（{}{}）".format(
+                "stream " if item["whole_diff"] is None else "", json.dumps(diff, ensure_ascii=False))
+        print("  {}: {} -> {} 題 {}".format(item["fixture"], item["expected_questions"], item["questions"], status), flush=True)
+    elapsed = time.perf_counter() - t0
+
+    result = {
+        "generatedAt": datetime.now().isoformat(),
+        "parser_version": importer.PARSER_VERSION,
+        "count": len(items),
+        "seconds": round(elapsed, 4),
+        "expected_questions_total": sum(i.get("expected_questions", 0) for i in items),
+        "questions_total": sum(i.get("questions", 0) for i in items),
+        "all_ok": all(i["ok"] for i in items),
+        "items": items,
+    }
+    OUT_PATH.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print("{} 份快照，{:.3f}s，題數 {} -> {}".format(len(items), elapsed, result["expected_questions_total"], result["questions_total"]))
+    print("Wrote:", str(OUT_PATH))
+    return 0 if result["all_ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)